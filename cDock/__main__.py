@@ -1,4 +1,39 @@
-from cDock.outputs.rich_stdout import cDockStandalone
+import argparse
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="cDock", description="Monitor and manage docker containers")
+    parser.add_argument("--exporter", action="store_true",
+                        help="run headless and serve the containers' stats as Prometheus metrics")
+    parser.add_argument("--record", metavar="PATH", help="record container lists and stats samples to a file")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recording instead of connecting to the daemon")
+    parser.add_argument("--replay-speed", metavar="FACTOR", type=float, help="speed up or slow down the replay")
+    parser.add_argument("--once", action="store_true", help="print a single snapshot of the containers and exit")
+    parser.add_argument("--format", choices=["table", "json", "csv"], default="table",
+                        help="output format of --once (default: table)")
+    args = parser.parse_args()
+
+    from cDock.config import Config
+    config = Config.load_env_from_file()
+    if args.record:
+        config.record_file = args.record
+    if args.replay:
+        config.replay_file = args.replay
+    if args.replay_speed:
+        config.replay_speed = args.replay_speed
+
+    if args.once:
+        # Imports only the collector, and rich only for the table
+        from cDock.outputs.once import run_once
+        sys.exit(run_once(config, args.format))
+    elif args.exporter:
+        from cDock.outputs.exporter import cDockExporter
+        cDockExporter(config).run()
+    else:
+        from cDock.outputs.rich_stdout import cDockStandalone
+        cDockStandalone(config).run()
+
 
 if __name__ == '__main__':
-    cDockStandalone().run()
+    main()
@@ -0,0 +1,373 @@
+import logging
+import os
+import re
+import subprocess
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from cDock.snapshot import ContainerSnapshot
+
+# Metric -> its value in a container view, None if unavailable
+METRICS = {
+    'cpu': lambda v: v.cpu_stats.usage if v.cpu_stats else None,
+    'mem': lambda v: v.memory_stats.usage if v.memory_stats else None,
+    'mem_percent': lambda v: v.memory_stats.usage / v.memory_stats.limit * 100
+    if v.memory_stats and v.memory_stats.usage is not None and v.memory_stats.limit else None,
+    'rx': lambda v: v.net_io_stats.rx_rate if v.net_io_stats else None,
+    'tx': lambda v: v.net_io_stats.tx_rate if v.net_io_stats else None,
+    'ior': lambda v: v.disk_io_stats.ior_rate if v.disk_io_stats else None,
+    'iow': lambda v: v.disk_io_stats.iow_rate if v.disk_io_stats else None,
+}
+# Metrics whose values are percentages, a threshold in `%` only applies to them. `mem` in `%` means `mem_percent`.
+PERCENT_METRICS = ['cpu', 'mem_percent']
+PERCENT_ALIASES = {'mem': 'mem_percent'}
+# Counted over a window rather than sampled: the number of times a container was (re)started
+RESTARTS = 'restarts'
+DEFAULT_RESTARTS_WINDOW = 300
+
+AGGREGATES = ['avg', 'min', 'max', 'sum']
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+RULE_PATTERN = re.compile(
+    r'^(?:(?P<name>[\w-]+)\s*:)?\s*'
+    r'(?:(?P<aggregate>\w+)\(\s*(?P<aggregate_metric>\w+)\s*,\s*(?P<window>\d+[smh]?)\s*\)|(?P<metric>\w+))\s*'
+    r'(?P<operator>>=|<=|>|<)\s*(?P<threshold>\d+(?:\.\d+)?)(?P<unit>[KMGT]?)\s*(?P<percent>%?)'
+    r'(?:\s+in\s+(?P<count_window>\d+[smh]?))?'
+    r'(?:\s+for\s+(?P<duration>\d+[smh]?))?'
+    r'(?:\s+clear\s+(?P<clear>\d+(?:\.\d+)?)(?P<clear_unit>[KMGT]?)\s*(?P<clear_percent>%?))?\s*$')
+
+
+def parse_duration(duration: Optional[str]) -> float:
+    """
+    Parses `30`, `30s`, `5m` or `1h` into seconds, 0 if not given
+    """
+    if not duration:
+        return 0
+    number, unit = re.match(r'^(\d+)([smh]?)$', duration).groups()
+    return int(number) * DURATION_UNITS[unit]
+
+
+class SlidingWindow:
+    """
+    Aggregates the values pushed during the last `duration` seconds. Every value is pushed and expired once, the sum
+    is kept running and the minimum and maximum are kept at the front of monotonic deques, so pushing, expiring and
+    reading the aggregate cost O(1) amortized whatever the length of the window.
+    """
+    __slots__ = ('duration', 'aggregate', 'values', 'total', 'extremes')
+
+    def __init__(self, duration: float, aggregate: str):
+        """
+        :param duration: The length of the window in seconds
+        :param aggregate: One of AGGREGATES
+        """
+        self.duration = duration
+        self.aggregate = aggregate
+        self.values: Deque[Tuple[float, float]] = deque()
+        self.total = 0.0
+        # The candidates for the minimum (or maximum), in order of time and of value
+        self.extremes: Deque[Tuple[float, float]] = deque()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def push(self, timestamp: float, value: float) -> None:
+        self.values.append((timestamp, value))
+        self.total += value
+        if self.aggregate in ('min', 'max'):
+            extremes = self.extremes
+            if self.aggregate == 'min':
+                while extremes and extremes[-1][1] >= value:
+                    extremes.pop()
+            else:
+                while extremes and extremes[-1][1] <= value:
+                    extremes.pop()
+            extremes.append((timestamp, value))
+
+    def expire(self, now: float) -> None:
+        oldest = now - self.duration
+        values, extremes = self.values, self.extremes
+        while values and values[0][0] <= oldest:
+            self.total -= values.popleft()[1]
+        while extremes and extremes[0][0] <= oldest:
+            extremes.popleft()
+        if not values:
+            # No drift of the running sum
+            self.total = 0.0
+
+    def get(self) -> Optional[float]:
+        """
+        Returns the aggregate of the values in the window, None if it is empty (0 for `sum`)
+        """
+        if self.aggregate == 'sum':
+            return self.total
+        if not self.values:
+            return None
+        if self.aggregate == 'avg':
+            return self.total / len(self.values)
+        return self.extremes[0][1]
+
+
+class AlertRule:
+    """
+    A threshold on a metric of a container, ie: `cpu > 90 for 30s`, `mem_percent > 95`, `restarts > 3 in 5m` or
+    `avg(cpu, 5m) > 80`. The rule fires once its condition held for `duration` seconds, and with hysteresis, only
+    clears once the value crossed back the `clear` threshold (by default DEFAULT_HYSTERESIS of the threshold below
+    it, or above for `<` rules).
+
+    Rule syntax: `[name:] metric|aggregate(metric, window) operator threshold [in window] [for duration] [clear value]`
+    where metric is one of METRICS or `restarts`, aggregate one of AGGREGATES, thresholds accept the K, M, G and T
+    units (powers of 1024) and durations the s, m and h units. A threshold in `%` is only valid on percentages (cpu and
+    mem_percent), `mem > 95%` compares mem_percent.
+    """
+    DEFAULT_HYSTERESIS = 0.1
+
+    def __init__(self, name: str, metric: str, operator: str, threshold: float, duration: float = 0,
+                 aggregate: Optional[str] = None, window: float = 0, clear: Optional[float] = None):
+        if metric not in METRICS and metric != RESTARTS:
+            raise Exception(f"AlertRule - Unknown metric `{metric}`")
+        if aggregate is not None and aggregate not in AGGREGATES:
+            raise Exception(f"AlertRule - Unknown aggregate `{aggregate}`")
+        if metric == RESTARTS:
+            # Restarts are events, their count over the window is compared
+            aggregate, window = 'sum', window or DEFAULT_RESTARTS_WINDOW
+        elif aggregate is None and window:
+            raise Exception(f"AlertRule - `in` only applies to restarts, use an aggregate for `{name}`")
+        if aggregate is not None and window <= 0:
+            raise Exception(f"AlertRule - The window of `{name}` must be positive")
+
+        self.name = name
+        self.metric = metric
+        self.operator = operator
+        self.threshold = threshold
+        self.duration = duration
+        self.aggregate = aggregate
+        self.window = window
+        self.is_above = operator in ('>', '>=')
+        if clear is None:
+            margin = abs(threshold) * self.DEFAULT_HYSTERESIS
+            clear = threshold - margin if self.is_above else threshold + margin
+        self.clear = clear
+
+        # Rules on the same aggregate share the window
+        self.source: Tuple[str, Optional[str], float] = (metric, aggregate, window)
+
+    def __repr__(self):
+        return f"AlertRule({self.name})"
+
+    @staticmethod
+    def parse(text: str) -> 'AlertRule':
+        """
+        Parses a rule, see the class documentation for the syntax
+
+        :raises: Exception - If the rule is invalid
+        """
+        match = RULE_PATTERN.match(text.strip())
+        if not match:
+            raise Exception(f"AlertRule - Invalid rule `{text.strip()}`")
+        groups = match.groupdict()
+        metric = groups['aggregate_metric'] or groups['metric']
+        if groups['percent'] or groups['clear_percent']:
+            metric = PERCENT_ALIASES.get(metric, metric)
+            if metric not in PERCENT_METRICS or groups['unit'] or groups['clear_unit']:
+                raise Exception(f"AlertRule - `%` only applies to {' and '.join(PERCENT_METRICS)} in "
+                                f"`{text.strip()}`")
+        clear = float(groups['clear']) * UNITS[groups['clear_unit']] if groups['clear'] else None
+        return AlertRule(
+            name=groups['name'] or re.sub(r'\s+', ' ', text.strip()),
+            metric=metric,
+            operator=groups['operator'],
+            threshold=float(groups['threshold']) * UNITS[groups['unit']],
+            duration=parse_duration(groups['duration']),
+            aggregate=groups['aggregate'],
+            window=parse_duration(groups['window'] or groups['count_window']),
+            clear=clear,
+        )
+
+    def matches(self, value: float) -> bool:
+        if self.operator == '>':
+            return value > self.threshold
+        if self.operator == '>=':
+            return value >= self.threshold
+        if self.operator == '<':
+            return value < self.threshold
+        return value <= self.threshold
+
+    def is_cleared(self, value: float) -> bool:
+        return value <= self.clear if self.is_above else value >= self.clear
+
+
+def parse_rules(rules: Optional[str]) -> List[AlertRule]:
+    """
+    Parses the `;` separated rules of the ALERT_RULES option
+
+    :raises: Exception - If a rule is invalid
+    """
+    return [AlertRule.parse(rule) for rule in (rules or '').split(';') if rule.strip()]
+
+
+class AlertEvent:
+    FIRING = 'firing'
+    RESOLVED = 'resolved'
+
+    __slots__ = ('state', 'rule', 'container_id', 'container_name', 'host', 'value', 'timestamp')
+
+    def __init__(self, state: str, rule: AlertRule, view: ContainerSnapshot, value: Optional[float],
+                 timestamp: float):
+        self.state = state
+        self.rule = rule
+        self.container_id = view.id
+        self.container_name = view.name
+        self.host = view.host
+        self.value = value
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"AlertEvent({self.state}, {self.rule.name}, {self.container_name}, {self.value})"
+
+
+class ContainerAlertState:
+    """
+    The windows and rule states of one container
+    """
+    __slots__ = ('sample_key', 'started_at', 'windows', 'since', 'firing', 'active')
+
+    def __init__(self, rule_count: int):
+        self.sample_key = None
+        self.started_at = None
+        # Source -> SlidingWindow
+        self.windows: Dict[Tuple, SlidingWindow] = {}
+        # Per rule: since when its condition holds (None if it does not), and whether it fires
+        self.since: List[Optional[float]] = [None] * rule_count
+        self.firing: List[bool] = [False] * rule_count
+        # Some rule is pending or firing, or a window holds values, so the container is evaluated on every update
+        self.active = False
+
+
+class AlertEngine:
+    """
+    Evaluates the alert rules against the stream of container views. A container is only evaluated when it has a
+    new stats sample or was restarted, or while one of its rules is pending or firing or one of its windows holds
+    values, so the idle containers cost a dict lookup per update. Windowed aggregates are kept incrementally by
+    SlidingWindow, and shared by the rules on the same aggregate.
+
+    The firing and resolved transitions are returned by `update`, and passed to `command` if set: the command runs
+    in a shell, in the background, with the CDOCK_ALERT_* environment variables describing the transition.
+    """
+
+    def __init__(self, rules: List[AlertRule], command: Optional[str] = None):
+        self.rules = rules
+        self.command = command
+        self.__sources = list(dict.fromkeys(rule.source for rule in rules))
+        self.__states: Dict[str, ContainerAlertState] = {}
+        # The containers with at least one firing rule
+        self.__firing_ids: Set[str] = set()
+        self.__commands: List[subprocess.Popen] = []
+
+    def update(self, views: Iterable[ContainerSnapshot], now: Optional[float] = None) -> List[AlertEvent]:
+        """
+        Evaluates the rules against the latest views. Containers missing from `views` are forgotten, without
+        resolved events.
+
+        :param views: The views of all containers
+        :param now: The current time, for tests
+        :return: The transitions of the rules
+        """
+        if not self.rules:
+            return []
+        now = time.time() if now is None else now
+        events = []
+        seen = set()
+        for view in views:
+            seen.add(view.id)
+            state = self.__states.get(view.id)
+            if state is None:
+                state = self.__states[view.id] = ContainerAlertState(len(self.rules))
+
+            restarted = False
+            if view.started_at is not None and view.started_at != state.started_at:
+                # The first start seen is not counted, the container may have started long ago
+                restarted = state.started_at is not None
+                state.started_at = view.started_at
+            sample_key = view.history.last_sample_key if view.history else None
+            has_sample = sample_key is not None and sample_key != state.sample_key
+            if not (has_sample or restarted or state.active):
+                continue
+            state.sample_key = sample_key
+            events += self.__evaluate(view, state, now, has_sample, restarted)
+            if any(state.firing):
+                self.__firing_ids.add(view.id)
+            else:
+                self.__firing_ids.discard(view.id)
+
+        for container_id in [i for i in self.__states if i not in seen]:
+            self.__states.pop(container_id)
+            self.__firing_ids.discard(container_id)
+
+        if events and self.command:
+            self.__run_command(events)
+        return events
+
+    def __evaluate(self, view: ContainerSnapshot, state: ContainerAlertState, now: float, has_sample: bool,
+                   restarted: bool) -> List[AlertEvent]:
+        values: Dict[Tuple, Optional[float]] = {}
+        for source in self.__sources:
+            metric, aggregate, window_duration = source
+            if aggregate is None:
+                values[source] = METRICS[metric](view) if has_sample else None
+                continue
+            window = state.windows.get(source)
+            if window is None:
+                window = state.windows[source] = SlidingWindow(window_duration, aggregate)
+            if metric == RESTARTS:
+                if restarted:
+                    window.push(now, 1.0)
+            elif has_sample:
+                value = METRICS[metric](view)
+                if value is not None:
+                    window.push(now, value)
+            window.expire(now)
+            values[source] = window.get()
+
+        events = []
+        active = any(len(window) for window in state.windows.values())
+        for i, rule in enumerate(self.rules):
+            value = values[rule.source]
+            if value is not None:
+                if state.firing[i]:
+                    if rule.is_cleared(value):
+                        state.firing[i], state.since[i] = False, None
+                        events.append(AlertEvent(AlertEvent.RESOLVED, rule, view, value, now))
+                elif rule.matches(value):
+                    if state.since[i] is None:
+                        state.since[i] = now
+                    if now - state.since[i] >= rule.duration:
+                        state.firing[i] = True
+                        events.append(AlertEvent(AlertEvent.FIRING, rule, view, value, now))
+                else:
+                    state.since[i] = None
+            active = active or state.firing[i] or state.since[i] is not None
+        state.active = active
+        return events
+
+    def __run_command(self, events: List[AlertEvent]) -> None:
+        # Reaping the finished commands
+        self.__commands = [process for process in self.__commands if process.poll() is None]
+        for event in events:
+            env = dict(os.environ, CDOCK_ALERT_STATE=event.state, CDOCK_ALERT_RULE=event.rule.name,
+                       CDOCK_ALERT_VALUE='' if event.value is None else f"{event.value:g}",
+                       CDOCK_ALERT_CONTAINER_ID=event.container_id, CDOCK_ALERT_CONTAINER_NAME=event.container_name,
+                       CDOCK_ALERT_HOST=event.host or '')
+            try:
+                self.__commands.append(subprocess.Popen(self.command, shell=True, env=env, stdin=subprocess.DEVNULL,
+                                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            except Exception as e:
+                logging.error(f"AlertEngine - Failed to run the alert command ({e})")
+
+    def get_firing(self) -> Dict[str, List[str]]:
+        """
+        Returns the names of the firing rules of every container with at least one
+        """
+        return {container_id: [rule.name for rule, is_firing in zip(self.rules, self.__states[container_id].firing)
+                               if is_firing] for container_id in self.__firing_ids}
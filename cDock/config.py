@@ -4,8 +4,17 @@ from dotenv import load_dotenv
 
 
 class Config:
-    def __init__(self, docker_socket_url, docker_cert_path, docker_tls_verify_path, docker_config_path,
-                 client_list_all_containers, tui_header_color, default_style, selected_row_style, selected_col_style,
+    def __init__(self, docker_socket_url, docker_cert_path, docker_tls_verify_path, docker_config_path, docker_hosts,
+                 docker_hosts_timeout, client_list_all_containers, client_inventory_mode, client_pool_size,
+                 client_stream_pool_size, action_workers, action_timeout, image_cache_size, image_cache_ttl,
+                 stats_backend, stats_poll_interval, stats_poll_workers, stream_stale_after, stream_restart_backoff,
+                 stream_restart_backoff_max, stream_max_reconnects, cgroup_root, proc_root, history_size,
+                 history_db_path, history_db_flush_interval, history_db_raw_retention, history_db_minute_retention,
+                 history_db_hour_retention, metrics_smoothing, logs_buffer_size, logs_spool_dir,
+                 logs_spool_segment_size, logs_spool_max_segments, record_file, replay_file, replay_speed,
+                 exporter_host, exporter_port, once_workers, once_timeout, alert_rules, alert_command, instrumentation,
+                 instrumentation_dump_path, tui_refresh_interval, tui_max_fps, tui_header_color, default_style,
+                 selected_row_style, selected_col_style, marked_row_style, alert_row_style, stale_row_style,
                  container_created_style, container_restarting_style, container_running_style, container_paused_style,
                  container_exited_style, container_dead_style, priority_attributes):
         # Docker daemon options
@@ -13,15 +22,70 @@ class Config:
         self.docker_cert_path = docker_cert_path
         self.docker_tls_verify_path = docker_tls_verify_path
         self.docker_config_path = docker_config_path
+        self.docker_hosts = docker_hosts
+        self.docker_hosts_timeout = docker_hosts_timeout
 
         # Docker API Client options
         self.client_list_all_containers = client_list_all_containers
+        self.client_inventory_mode = client_inventory_mode
+        self.client_pool_size = client_pool_size
+        self.client_stream_pool_size = client_stream_pool_size
+        self.action_workers = action_workers
+        self.action_timeout = action_timeout
+        self.image_cache_size = image_cache_size
+        self.image_cache_ttl = image_cache_ttl
+        self.stats_backend = stats_backend
+        self.stats_poll_interval = stats_poll_interval
+        self.stats_poll_workers = stats_poll_workers
+        self.stream_stale_after = stream_stale_after
+        self.stream_restart_backoff = stream_restart_backoff
+        self.stream_restart_backoff_max = stream_restart_backoff_max
+        self.stream_max_reconnects = stream_max_reconnects
+        self.cgroup_root = cgroup_root
+        self.proc_root = proc_root
+        self.history_size = history_size
+        self.history_db_path = history_db_path
+        self.history_db_flush_interval = history_db_flush_interval
+        self.history_db_raw_retention = history_db_raw_retention
+        self.history_db_minute_retention = history_db_minute_retention
+        self.history_db_hour_retention = history_db_hour_retention
+        self.metrics_smoothing = metrics_smoothing
+        self.logs_buffer_size = logs_buffer_size
+        self.logs_spool_dir = logs_spool_dir
+        self.logs_spool_segment_size = logs_spool_segment_size
+        self.logs_spool_max_segments = logs_spool_max_segments
+
+        # Recording options
+        self.record_file = record_file
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+
+        # Exporter options
+        self.exporter_host = exporter_host
+        self.exporter_port = exporter_port
+
+        # One-shot options
+        self.once_workers = once_workers
+        self.once_timeout = once_timeout
+
+        # Alert options
+        self.alert_rules = alert_rules
+        self.alert_command = alert_command
+
+        # Instrumentation options
+        self.instrumentation = instrumentation
+        self.instrumentation_dump_path = instrumentation_dump_path
 
         # TUI options
+        self.tui_refresh_interval = tui_refresh_interval
+        self.tui_max_fps = tui_max_fps
         self.tui_header_color = tui_header_color
         self.default_style = default_style
         self.selected_row_style = selected_row_style
         self.selected_col_style = selected_col_style
+        self.marked_row_style = marked_row_style
+        self.alert_row_style = alert_row_style
+        self.stale_row_style = stale_row_style
         self.container_created_style = container_created_style
         self.container_restarting_style = container_restarting_style
         self.container_running_style = container_running_style
@@ -43,15 +107,70 @@ class Config:
             'docker_cert_path': os.getenv("DOCKER_CERT_PATH"),
             'docker_tls_verify_path': os.getenv("DOCKER_TLS_VERIFY_PATH"),
             'docker_config_path': os.getenv("DOCKER_CONFIG_PATH"),
+            'docker_hosts': os.getenv("DOCKER_HOSTS"),
+            'docker_hosts_timeout': float(os.getenv("DOCKER_HOSTS_TIMEOUT", 2)),
 
             # Docker API Client options
             'client_list_all_containers': os.getenv("DOCKER_API_LIST_ALL_CONTAINERS", False) == "True",
+            'client_inventory_mode': os.getenv("DOCKER_API_INVENTORY_MODE", "poll"),
+            'client_pool_size': int(os.getenv("DOCKER_API_POOL_SIZE", 10)),
+            'client_stream_pool_size': int(os.getenv("DOCKER_API_STREAM_POOL_SIZE", 256)),
+            'action_workers': int(os.getenv("DOCKER_API_ACTION_WORKERS", 8)),
+            'action_timeout': float(os.getenv("DOCKER_API_ACTION_TIMEOUT", 30)),
+            'image_cache_size': int(os.getenv("DOCKER_API_IMAGE_CACHE_SIZE", 256)),
+            'image_cache_ttl': float(os.getenv("DOCKER_API_IMAGE_CACHE_TTL", 300)),
+            'stats_backend': os.getenv("STATS_BACKEND", "api"),
+            'stats_poll_interval': float(os.getenv("STATS_POLL_INTERVAL", 10)),
+            'stats_poll_workers': int(os.getenv("STATS_POLL_WORKERS", 4)),
+            'stream_stale_after': float(os.getenv("STREAM_STALE_AFTER", 5)),
+            'stream_restart_backoff': float(os.getenv("STREAM_RESTART_BACKOFF", 1)),
+            'stream_restart_backoff_max': float(os.getenv("STREAM_RESTART_BACKOFF_MAX", 60)),
+            'stream_max_reconnects': int(os.getenv("STREAM_MAX_RECONNECTS", 8)),
+            'cgroup_root': os.getenv("CGROUP_ROOT", "/sys/fs/cgroup"),
+            'proc_root': os.getenv("PROC_ROOT", "/proc"),
+            'history_size': int(os.getenv("HISTORY_SIZE", 120)),
+            'history_db_path': os.getenv("HISTORY_DB_PATH"),
+            'history_db_flush_interval': float(os.getenv("HISTORY_DB_FLUSH_INTERVAL", 5)),
+            'history_db_raw_retention': float(os.getenv("HISTORY_DB_RAW_RETENTION", 3600)),
+            'history_db_minute_retention': float(os.getenv("HISTORY_DB_MINUTE_RETENTION", 2 * 86400)),
+            'history_db_hour_retention': float(os.getenv("HISTORY_DB_HOUR_RETENTION", 30 * 86400)),
+            'metrics_smoothing': float(os.getenv("METRICS_SMOOTHING", 0)),
+            'logs_buffer_size': int(os.getenv("LOGS_BUFFER_SIZE", 4 * 1024 * 1024)),
+            'logs_spool_dir': os.getenv("LOGS_SPOOL_DIR"),
+            'logs_spool_segment_size': int(os.getenv("LOGS_SPOOL_SEGMENT_SIZE", 16 * 1024 * 1024)),
+            'logs_spool_max_segments': int(os.getenv("LOGS_SPOOL_MAX_SEGMENTS", 64)),
+
+            # Recording options
+            'record_file': os.getenv("RECORD_FILE"),
+            'replay_file': os.getenv("REPLAY_FILE"),
+            'replay_speed': float(os.getenv("REPLAY_SPEED", 1)),
+
+            # Exporter options
+            'exporter_host': os.getenv("EXPORTER_HOST", "127.0.0.1"),
+            'exporter_port': int(os.getenv("EXPORTER_PORT", 9324)),
+
+            # One-shot options
+            'once_workers': int(os.getenv("ONCE_WORKERS", 256)),
+            'once_timeout': float(os.getenv("ONCE_TIMEOUT", 30)),
+
+            # Alert options
+            'alert_rules': os.getenv("ALERT_RULES"),
+            'alert_command': os.getenv("ALERT_COMMAND"),
+
+            # Instrumentation options
+            'instrumentation': os.getenv("INSTRUMENTATION", False) == "True",
+            'instrumentation_dump_path': os.getenv("INSTRUMENTATION_DUMP_PATH", "cdock-perf.json"),
 
             # TUI options
+            'tui_refresh_interval': float(os.getenv("TUI_REFRESH_INTERVAL", 0.5)),
+            'tui_max_fps': float(os.getenv("TUI_MAX_FPS", 30)),
             'tui_header_color': os.getenv("TUI_HEADER_COLOR"),
             'default_style': os.getenv("DEFAULT_STYLE"),
             'selected_row_style': os.getenv("SELECTED_ROW_STYLE"),
             'selected_col_style': os.getenv("SELECTED_COL_STYLE"),
+            'marked_row_style': os.getenv("MARKED_ROW_STYLE"),
+            'alert_row_style': os.getenv("ALERT_ROW_STYLE"),
+            'stale_row_style': os.getenv("STALE_ROW_STYLE"),
             'container_created_style': os.getenv("CONTAINER_CREATED_STYLE"),
             'container_restarting_style': os.getenv("CONTAINER_RESTARTING_STYLE"),
             'container_running_style': os.getenv("CONTAINER_RUNNING_STYLE"),
@@ -1 +1,16 @@
-from .docker_daemon_client import DockerDaemonClient
+# The clients are imported on first use, so the lighter modules of this package (ie: the one-shot collector) can be
+# imported without docker-py's transport and the streaming machinery
+LAZY_EXPORTS = {
+    'DockerDaemonClient': 'cDock.docker_client.docker_daemon_client',
+    'MultiDaemonClient': 'cDock.docker_client.multi_daemon_client',
+    'create_client': 'cDock.docker_client.multi_daemon_client',
+}
+
+__all__ = list(LAZY_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(LAZY_EXPORTS[name]), name)
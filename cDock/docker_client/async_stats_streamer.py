@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import Future
+from typing import AsyncIterator, Optional
+
+from docker.models.containers import Container
+
+from cDock.docker_client.stats_streamer import StatsStreamer
+from cDock.metrics_history import DEFAULT_HISTORY_SIZE
+
+UNIX_SOCKET_SCHEMES = ['unix://', 'http+unix://']
+
+
+def get_unix_socket_path(socket_url: str) -> Optional[str]:
+    """
+    A utility method to get the filesystem path of the daemon's unix socket from a Docker base url.
+    :param socket_url: The base url of the daemon, eg: unix://var/run/docker.sock
+    :return: The absolute path of the socket, None if the url is not a unix socket url
+    """
+    for scheme in UNIX_SOCKET_SCHEMES:
+        if socket_url.startswith(scheme):
+            return '/' + socket_url[len(scheme):].lstrip('/')
+    return None
+
+
+class AsyncStatsStreamer(StatsStreamer):
+    """
+    A StatsStreamer which reads the container's stats stream straight from the daemon's unix socket with non-blocking
+    asyncio streams. All AsyncStatsStreamers are read on the shared InfoStreamer event loop, so no executor thread or
+    docker-py connection pool slot is held per container.
+    """
+
+    def __init__(self, container: Container, socket_path: str, history_size: int = DEFAULT_HISTORY_SIZE):
+        super().__init__(container, history_size)
+        self.socket_path = socket_path
+
+        self.__stream_task: Optional[Future] = None
+
+    async def __read_chunks(self, reader: asyncio.StreamReader, chunked: bool) -> AsyncIterator[bytes]:
+        """
+        Yields the body of the HTTP response as it arrives, decoding the chunked transfer encoding if used.
+        """
+        while True:
+            if not chunked:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                yield chunk
+                continue
+
+            size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                return
+            chunk = await reader.readexactly(size)
+            await reader.readexactly(2)  # CRLF after every chunk
+            yield chunk
+
+    async def __stream_stats(self) -> None:
+        """
+        Requests the stats stream of the container and passes every decoded sample to the stream handler.
+        """
+        writer = None
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            writer.write(f"GET /containers/{self.container.id}/stats?stream=1 HTTP/1.1\r\n"
+                         f"Host: docker\r\n\r\n".encode())
+            await writer.drain()
+
+            status = (await reader.readline()).split(b' ', 2)
+            if len(status) < 2 or status[1] != b'200':
+                raise Exception(f"Unexpected response `{b' '.join(status).strip().decode()}`")
+
+            chunked = False
+            while (header := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = header.decode('latin-1').partition(':')
+                if name.strip().lower() == 'transfer-encoding' and 'chunked' in value.lower():
+                    chunked = True
+
+            buffer = b''
+            async for chunk in self.__read_chunks(reader, chunked):
+                buffer += chunk
+                *samples, buffer = buffer.split(b'\n')
+                for sample in samples:
+                    if sample.strip():
+                        self.stream_handler(json.loads(sample))
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"{self.__class__.__name__} - Exiting. {type(e)} while streaming: ({e})")
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def start_stream(self, use_private_executor: bool = False) -> None:
+        """
+        Schedules the stats stream on the shared event loop, if its not already running.
+
+        :param use_private_executor: Unused, the stream does not need an executor
+        :raise Exception: if the stream task is already in progress
+        """
+        if self.__stream_task and not self.__stream_task.done():
+            raise Exception("Already streaming!")
+
+        self.__stream_task = asyncio.run_coroutine_threadsafe(self.__stream_stats(), self.get_event_loop())
+
+    def stop_stream(self) -> None:
+        """
+        Cancels the stats stream, which closes the connection to the daemon.
+
+        :raise Exception: if streaming was never started
+        """
+        if not isinstance(self.__stream_task, Future):
+            raise Exception("Streaming was never started!")
+        self.__stream_task.cancel()
+
+    def is_streaming(self) -> bool:
+        return self.__stream_task is not None and not self.__stream_task.done()
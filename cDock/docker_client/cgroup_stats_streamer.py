@@ -0,0 +1,174 @@
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+from docker.models.containers import Container
+
+from cDock.docker_client.stats_streamer import StatsStreamer
+from cDock.metrics_history import DEFAULT_HISTORY_SIZE
+
+# Relative paths of a container's cgroup, for the cgroupfs and systemd cgroup drivers
+CGROUP_V2_PATHS = ['system.slice/docker-{id}.scope', 'docker/{id}']
+CGROUP_V1_PATHS = ['docker/{id}', 'system.slice/docker-{id}.scope']
+CGROUP_V1_CONTROLLERS = {
+    'cpuacct': ['cpuacct', 'cpu,cpuacct', 'cpuacct,cpu'],
+    'memory': ['memory'],
+    'blkio': ['blkio'],
+}
+# Memory limits above this value mean the container has no limit
+CGROUP_V1_NO_MEMORY_LIMIT = 2 ** 62
+
+
+class CgroupStatsStreamer(StatsStreamer):
+    """
+    A StatsStreamer which reads the container's cgroup (v1 or v2) and `/proc/<pid>/net/dev` directly instead of using
+    the Docker stats API. The samples are built in the same format as the Docker API, so all accessors of
+    StatsStreamer work unchanged.
+    """
+
+    def __init__(self, container: Container, cgroup_root: str = '/sys/fs/cgroup', proc_root: str = '/proc',
+                 history_size: int = DEFAULT_HISTORY_SIZE):
+        super().__init__(container, history_size)
+        self.cgroup_root = cgroup_root
+        self.proc_root = proc_root
+        self.cgroup_version = 2 if os.path.exists(os.path.join(cgroup_root, 'cgroup.controllers')) else 1
+
+    def is_readable(self) -> bool:
+        """
+        Checks if the container's cgroup can be read, the API should be used for the container otherwise
+
+        :return: True if stats can be read from cgroupfs
+        """
+        try:
+            self.read_stats()
+        except (OSError, ValueError, KeyError) as e:
+            logging.debug(f"CgroupStatsStreamer - cgroup of `{self.container.id}` is not readable ({e})")
+            return False
+        return True
+
+    def __find_cgroup(self, controller: Optional[str] = None) -> str:
+        """
+        Returns the path of the container's cgroup, for the given controller in case of cgroup v1
+
+        :raises: FileNotFoundError - If no cgroup exists for the container
+        """
+        if self.cgroup_version == 2:
+            roots, paths = [self.cgroup_root], CGROUP_V2_PATHS
+        else:
+            roots = [os.path.join(self.cgroup_root, c) for c in CGROUP_V1_CONTROLLERS[controller]]
+            paths = CGROUP_V1_PATHS
+
+        for root in roots:
+            for path in paths:
+                cgroup = os.path.join(root, path.format(id=self.container.id))
+                if os.path.isdir(cgroup):
+                    return cgroup
+        raise FileNotFoundError(f"No {controller or 'unified'} cgroup for `{self.container.id}`")
+
+    def __read(self, *path: str) -> str:
+        with open(os.path.join(*path)) as f:
+            return f.read()
+
+    def __read_host_cpu(self) -> Dict:
+        """
+        Returns the host's CPU time in nanoseconds (like `system_cpu_usage`) and its online CPU count from /proc/stat
+        """
+        lines = self.__read(self.proc_root, 'stat').splitlines()
+        # user, nice, system, idle, iowait, irq, softirq and steal time in clock ticks
+        ticks = sum(int(v) for v in lines[0].split()[1:9])
+        return {
+            'system_cpu_usage': ticks * 10 ** 9 // os.sysconf('SC_CLK_TCK'),
+            'online_cpus': len([line for line in lines[1:] if line.startswith('cpu')]),
+        }
+
+    def __read_host_memory(self) -> int:
+        for line in self.__read(self.proc_root, 'meminfo').splitlines():
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) * 1024
+        raise ValueError("MemTotal missing in meminfo")
+
+    def __read_cpu_usage(self) -> int:
+        if self.cgroup_version == 2:
+            for line in self.__read(self.__find_cgroup(), 'cpu.stat').splitlines():
+                key, value = line.split()
+                if key == 'usage_usec':
+                    return int(value) * 1000
+            raise ValueError("usage_usec missing in cpu.stat")
+        return int(self.__read(self.__find_cgroup('cpuacct'), 'cpuacct.usage'))
+
+    def __read_memory(self) -> Dict:
+        if self.cgroup_version == 2:
+            cgroup = self.__find_cgroup()
+            usage = int(self.__read(cgroup, 'memory.current'))
+            limit = self.__read(cgroup, 'memory.max').strip()
+            limit = self.__read_host_memory() if limit == 'max' else int(limit)
+        else:
+            cgroup = self.__find_cgroup('memory')
+            usage = int(self.__read(cgroup, 'memory.usage_in_bytes'))
+            limit = int(self.__read(cgroup, 'memory.limit_in_bytes'))
+            if limit >= CGROUP_V1_NO_MEMORY_LIMIT:
+                limit = self.__read_host_memory()
+
+        return {'usage': usage, 'limit': limit}
+
+    def __read_blkio(self) -> Dict:
+        totals = {'read': 0, 'write': 0}
+        if self.cgroup_version == 2:
+            for line in self.__read(self.__find_cgroup(), 'io.stat').splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition('=')
+                    if key in ('rbytes', 'wbytes'):
+                        totals['read' if key == 'rbytes' else 'write'] += int(value)
+        else:
+            cgroup = self.__find_cgroup('blkio')
+            for line in self.__read(cgroup, 'blkio.throttle.io_service_bytes').splitlines():
+                fields = line.split()
+                if len(fields) == 3 and fields[1].lower() in totals:
+                    totals[fields[1].lower()] += int(fields[2])
+
+        return {'io_service_bytes_recursive': [{'op': op, 'value': value} for op, value in totals.items()]}
+
+    def __read_networks(self) -> Dict:
+        networks = {}
+        pid = self.container.attrs['State']['Pid']
+        # Skipping the 2 header lines
+        for line in self.__read(self.proc_root, str(pid), 'net', 'dev').splitlines()[2:]:
+            interface, _, counters = line.partition(':')
+            counters = counters.split()
+            networks[interface.strip()] = {'rx_bytes': int(counters[0]), 'tx_bytes': int(counters[8])}
+        networks.pop('lo', None)
+        return networks
+
+    def read_stats(self, precpu_stats: Dict = None) -> Dict:
+        """
+        Reads a sample of the container's stats from cgroupfs and procfs in the format of the Docker stats API
+
+        :param precpu_stats: The `cpu_stats` of the previous sample, to calculate the CPU usage
+        :return: A dict with the same structure as a Docker API stats sample
+        """
+        cpu_stats = {'cpu_usage': {'total_usage': self.__read_cpu_usage()}} | self.__read_host_cpu()
+        stats = {
+            'read': datetime.utcnow().isoformat() + 'Z',
+            'cpu_stats': cpu_stats,
+            'precpu_stats': precpu_stats or {},
+            'memory_stats': self.__read_memory(),
+            'blkio_stats': self.__read_blkio(),
+        }
+
+        try:
+            stats['networks'] = self.__read_networks()
+        except (OSError, KeyError, IndexError) as e:
+            logging.debug(f"CgroupStatsStreamer - Failed to read network stats for `{self.container.id}` ({e})")
+
+        return stats
+
+    def get_stream_generator(self) -> Iterator[Dict]:
+        precpu_stats = None
+        while True:
+            stats = self.read_stats(precpu_stats)
+            precpu_stats = stats['cpu_stats']
+            yield stats
+
+    def poll_stats(self) -> None:
+        self.stream_handler(self.read_stats(self.stats.get('cpu_stats')))
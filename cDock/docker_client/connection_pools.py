@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional
+
+from docker import DockerClient
+from docker.tls import TLSConfig
+from docker.transport.unixconn import UnixHTTPAdapter
+
+
+class SharedPoolUnixHTTPAdapter(UnixHTTPAdapter):
+    """
+    docker-py keys the connection pools of a unix socket by request url, so every container endpoint gets a pool of
+    its own, and with more endpoints than pools, a new connection for almost every request. All requests to the
+    socket share one pool here.
+    """
+    POOL_KEY = 'localhost'
+
+    def get_connection(self, url, proxies=None):
+        return super().get_connection(self.POOL_KEY, proxies)
+
+
+def create_docker_client(base_url: str, tls: Optional[TLSConfig], pool_size: int, version: Optional[str] = None,
+                         timeout: Optional[float] = None) -> DockerClient:
+    """
+    Creates a DockerClient keeping up to `pool_size` connections to the daemon in a single pool. docker-py only
+    applies `max_pool_size` to unix sockets (and npipe, ssh), the HTTP(S) adapters used for TCP daemons are resized
+    here.
+
+    :param base_url: The url of the daemon
+    :param tls: The TLS options, if any
+    :param pool_size: The number of connections kept per pool
+    :param version: The API version, detected by a request to the daemon if not given
+    :param timeout: The timeout of every request in seconds, docker-py's default if not given
+    :return: A DockerClient
+    """
+    options = {} if timeout is None else {'timeout': timeout}
+    client = DockerClient(base_url=base_url, tls=tls, max_pool_size=pool_size, version=version, **options)
+    adapter = getattr(client.api, '_custom_adapter', None)
+    if type(adapter) is UnixHTTPAdapter:
+        shared_adapter = SharedPoolUnixHTTPAdapter(adapter.socket_path, adapter.timeout, pool_connections=1,
+                                                   max_pool_size=pool_size)
+        client.api.mount('http+docker://', shared_adapter)
+        client.api._custom_adapter = shared_adapter
+        adapter.close()
+    for prefix in ('http://', 'https://'):
+        adapter = client.api.adapters.get(prefix)
+        if adapter is not None and hasattr(adapter, 'init_poolmanager') and adapter._pool_maxsize != pool_size:
+            adapter._pool_maxsize = pool_size
+            adapter.init_poolmanager(adapter._pool_connections, pool_size, block=adapter._pool_block)
+    return client
+
+
+def get_connection_pools(client: DockerClient) -> List:
+    """
+    Returns the urllib3 connection pools created so far by the client's transport adapters
+    """
+    pools = []
+    api = getattr(client, 'api', None)
+    for adapter in set(getattr(api, 'adapters', {}).values()):
+        container = getattr(adapter, 'pools', None)
+        if container is None and getattr(adapter, 'poolmanager', None) is not None:
+            container = adapter.poolmanager.pools
+        if container is not None:
+            pools.extend(container[key] for key in container.keys())
+    return pools
+
+
+def get_pool_stats(client: DockerClient) -> Dict[str, int]:
+    """
+    Returns the usage of the client's connection pools: their number, the maximum number of connections kept, the
+    connections currently idle and in use (up to the maximum), and the requests made over the pools' lifetime.
+
+    :param client: A DockerClient, clients without HTTP pools (ie: a replay) report zeros
+    :return: A dict of counters
+    """
+    stats = {'pools': 0, 'max_size': 0, 'idle': 0, 'in_use': 0, 'requests': 0}
+    for pool in get_connection_pools(client):
+        stats['pools'] += 1
+        stats['requests'] += pool.num_requests
+        if pool.pool is not None:
+            # The queue holds the idle connections and a None per slot never filled, checked out ones are missing
+            queued = list(pool.pool.queue)
+            stats['max_size'] += pool.pool.maxsize
+            stats['idle'] += sum(1 for connection in queued if connection is not None)
+            stats['in_use'] += pool.pool.maxsize - len(queued)
+    return stats
@@ -0,0 +1,89 @@
+import time
+from threading import Lock
+from typing import Dict, List, Optional
+
+# User facing action names -> the APIClient methods performing them
+CONTAINER_ACTIONS = {
+    'start': 'start',
+    'stop': 'stop',
+    'restart': 'restart',
+    'kill': 'kill',
+    'pause': 'pause',
+    'resume': 'unpause',
+}
+
+
+class ActionBatch:
+    """
+    Tracks the progress of an action submitted for one or more containers at once. Updated from the action workers,
+    read from the UI, all accesses are guarded by a lock.
+    """
+
+    def __init__(self, action_name: str, total: int):
+        """
+        :param action_name: One of CONTAINER_ACTIONS
+        :param total: The number of containers the action is submitted for
+        """
+        self.action_name = action_name
+        self.started_at = time.monotonic()
+        self.__lock = Lock()
+        self.__total = total
+        self.__latencies: List[float] = []
+        # Container key -> error of the failed actions
+        self.__errors: Dict[str, str] = {}
+        self.__finished_at: Optional[float] = None if total else self.started_at
+
+    def succeeded(self, latency: float) -> None:
+        with self.__lock:
+            self.__latencies.append(latency)
+            self.__update_finished()
+
+    def failed(self, container_key: str, error: str) -> None:
+        with self.__lock:
+            self.__errors[container_key] = error
+            self.__update_finished()
+
+    def __update_finished(self) -> None:
+        if len(self.__latencies) + len(self.__errors) >= self.__total:
+            self.__finished_at = time.monotonic()
+
+    @property
+    def total(self) -> int:
+        return self.__total
+
+    @property
+    def done(self) -> int:
+        with self.__lock:
+            return len(self.__latencies) + len(self.__errors)
+
+    @property
+    def errors(self) -> Dict[str, str]:
+        with self.__lock:
+            return dict(self.__errors)
+
+    @property
+    def finished_at(self) -> Optional[float]:
+        return self.__finished_at
+
+    def is_finished(self) -> bool:
+        return self.__finished_at is not None
+
+    def get_latencies(self) -> Dict[str, Optional[float]]:
+        """
+        Returns the median and maximum latency in seconds of the succeeded actions, None if there is none yet
+        """
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+        if not latencies:
+            return {'p50': None, 'max': None}
+        return {'p50': latencies[len(latencies) // 2], 'max': latencies[-1]}
+
+    def __str__(self):
+        latencies = self.get_latencies()
+        text = f"{self.action_name} {self.done}/{self.total}"
+        errors = len(self.errors)
+        if errors:
+            text += f", {errors} failed"
+        if latencies['p50'] is not None:
+            text += f", p50 {latencies['p50']:.1f}s max {latencies['max']:.1f}s"
+        return text
@@ -0,0 +1,61 @@
+import os
+from typing import Dict, Optional, Union
+
+from docker.tls import TLSConfig
+
+from cDock.config import Config
+
+
+def create_tls_config(config: Config, base_url: str) -> Optional[TLSConfig]:
+    """
+    Builds the TLS options for a daemon reached over TCP. `docker_cert_path` is a directory holding cert.pem and
+    key.pem, and optionally ca.pem, like DOCKER_CERT_PATH of the docker CLI. `docker_tls_verify_path` is the CA
+    certificate to verify the daemon with, ca.pem of `docker_cert_path` is used if it is not set.
+
+    :param config: The Config with the certificate options
+    :param base_url: The url of the daemon
+    :return: A TLSConfig, None for unix sockets or if no certificate option is set
+    """
+    if not base_url.startswith(('tcp://', 'https://')) or not (config.docker_cert_path or
+                                                                 config.docker_tls_verify_path):
+        return None
+
+    client_cert, ca_cert = None, config.docker_tls_verify_path
+    if config.docker_cert_path:
+        cert, key = (os.path.join(config.docker_cert_path, name) for name in ('cert.pem', 'key.pem'))
+        if os.path.isfile(cert) and os.path.isfile(key):
+            client_cert = (cert, key)
+        if not ca_cert and os.path.isfile(os.path.join(config.docker_cert_path, 'ca.pem')):
+            ca_cert = os.path.join(config.docker_cert_path, 'ca.pem')
+
+    return TLSConfig(client_cert=client_cert, ca_cert=ca_cert, verify=bool(ca_cert))
+
+
+def parse_docker_hosts(docker_hosts: str) -> Dict[str, str]:
+    """
+    Parses a comma separated list of `name=url` or `url` entries. Entries without a name are named after the url,
+    without its scheme.
+
+    :param docker_hosts: The DOCKER_HOSTS option, ie: `web=tcp://10.0.0.2:2376,unix:///var/run/docker.sock`
+    :return: An ordered dict of host name -> url
+    """
+    hosts = {}
+    for entry in (entry.strip() for entry in (docker_hosts or '').split(',')):
+        if not entry:
+            continue
+        name, _, url = entry.partition('=') if '=' in entry.split('://')[0] else ('', '', entry)
+        hosts[name.strip() or url.split('://')[-1]] = url.strip()
+    return hosts
+
+
+def merge_versions(versions: Dict[str, Optional[Dict]]) -> Dict[str, Union[str, Dict]]:
+    """
+    Merges the versions of several daemons into one, holding the version of every host under `Hosts`
+
+    :param versions: Host name -> the daemon's version, None if unknown
+    :return: A version dict
+    """
+    def join(field: str) -> str:
+        return ", ".join(dict.fromkeys(str(v.get(field, '')) for v in versions.values() if v))
+
+    return {'Version': join('Version'), 'ApiVersion': join('ApiVersion'), 'Hosts': versions}
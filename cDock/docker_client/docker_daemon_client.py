@@ -1,14 +1,31 @@
 import logging
-from threading import Thread
-from typing import Dict, Optional
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, RLock, Thread, current_thread
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from docker import DockerClient
+from docker.errors import NotFound
 from docker.models.containers import Container
 
 from cDock.config import Config
+from cDock.docker_client.async_stats_streamer import AsyncStatsStreamer, get_unix_socket_path
+from cDock.docker_client.cgroup_stats_streamer import CgroupStatsStreamer
+from cDock.docker_client.connection_pools import create_docker_client, get_pool_stats
+from cDock.docker_client.container_actions import CONTAINER_ACTIONS, ActionBatch
+from cDock.docker_client.daemon_hosts import create_tls_config
+from cDock.docker_client.image_cache import ImageCache
+from cDock.docker_client.log_spool import LogSpool
+from cDock.docker_client.recording import ReplayDockerClient, StreamRecorder
 from cDock.docker_client.logs_streamer import LogsStreamer
+from cDock.docker_client.metrics_engine import MetricsEngine
+from cDock.docker_client.stats_poller import StatsPoller
 from cDock.docker_client.stats_streamer import StatsStreamer
-from cDock.models import ContainerView
+from cDock.docker_client.stream_supervisor import StreamSupervisor
+from cDock.history_store import HistoryStore
+from cDock.instrumentation import instruments
+from cDock.snapshot import ContainerDetails, ContainerSnapshot, Snapshot
 
 
 class DockerDaemonClient:
@@ -18,42 +35,204 @@ class DockerDaemonClient:
     """
 
     STREAMING_STATUS = ['running', 'paused']
-
-    def __init__(self, config: Config):
+    # Statuses returned by `containers.list` when `all` is not set
+    LISTED_STATUS = ['running', 'paused', 'restarting']
+
+    INVENTORY_MODE_POLL = 'poll'
+    INVENTORY_MODE_EVENTS = 'events'
+    # Container events which change the inventory or the state of a container
+    INVENTORY_EVENTS = ['create', 'start', 'die', 'pause', 'unpause', 'destroy', 'rename']
+    # Image events which change the tags of an image
+    IMAGE_EVENTS = ['tag', 'untag', 'delete']
+
+    STATS_BACKEND_API = 'api'
+    STATS_BACKEND_ASYNC = 'async'
+    STATS_BACKEND_CGROUP = 'cgroup'
+
+    # How the stats of a container are sampled: streamed at full rate, polled at a lower rate, or not at all
+    SAMPLING_STREAM = 'stream'
+    SAMPLING_POLL = 'poll'
+    SAMPLING_PARKED = 'parked'
+
+    def __init__(self, config: Config, host_name: Optional[str] = None, history_store: Optional[HistoryStore] = None):
         self.__config = config
+        # Tags the container views, when several daemons are shown together
+        self.host_name = host_name
         self.__client: DockerClient = None
+        # Long-lived streams (stats, logs and events) use their own connection pool, so requests never wait behind
+        # them for a connection
+        self.__stream_client: DockerClient = None
+        # Container actions use a client of their own, with a timeout, sized for the action workers
+        self.__action_client: DockerClient = None
         self.__containers: Dict[str, Container] = {}
         self.__container_stats_streams: Dict[str, StatsStreamer] = {}
-
-        # For cleaning up executing container actions
-        self.__container_action_map: Dict[str, Thread] = {}
+        self.__container_details: Dict[str, ContainerDetails] = {}
+        # Spool directory -> LogSpool, shared by the logs sessions of a container so a segment has a single writer
+        self.__log_spools: Dict[str, LogSpool] = {}
+        self.__metrics_engine = MetricsEngine(config.metrics_smoothing)
+        # Adaptive sampling, only the visible containers are streamed once `set_visible_containers` was called
+        self.__visible_keys: Optional[Set[str]] = None
+        self.__sampling_modes: Dict[str, str] = {}
+        self.__stats_poller = StatsPoller(config.stats_poll_interval, config.stats_poll_workers)
+        # Restarts the stats streams which died or went stale on every refresh. Not for a replay, whose streams end
+        # with the recording.
+        self.__stream_supervisor: Optional[StreamSupervisor] = None
+        if config.stream_stale_after > 0 and not config.replay_file:
+            self.__stream_supervisor = StreamSupervisor(config.stream_stale_after, config.stream_restart_backoff,
+                                                        config.stream_restart_backoff_max, config.stream_max_reconnects)
+        # The containers whose stream is stale, their views are flagged
+        self.__stale_keys: Set[str] = set()
+        # The last complete refresh, replaced as a whole
+        self.__snapshot: Optional[Snapshot] = None
+        self.__image_cache = ImageCache(lambda image_id: self.__client.images.get(image_id).tags,
+                                        config.image_cache_size, config.image_cache_ttl)
+
+        # For the events inventory mode. The lock guards both container maps, as the events listener thread updates
+        # them while views are being generated.
+        self.__lock = RLock()
+        self.__version: Optional[Dict] = None
+        self.__needs_resync = True
+        self.__events_stream = None
+        self.__events_thread: Optional[Thread] = None
+        self.__change_listeners: List[Callable[[], None]] = []
+
+        # Records what is received from the daemon, if enabled
+        self.__recorder: Optional[StreamRecorder] = None
+
+        # Container actions run on a bounded pool. The map of actions in progress is shared with the workers.
+        self.__action_executor = ThreadPoolExecutor(config.action_workers, thread_name_prefix='cDock-action')
+        self.__action_lock = Lock()
+        self.__container_action_map: Dict[str, Future] = {}
+
+        # The samples are also stored on disk if enabled, in a store shared by all hosts when given. Replayed samples
+        # are not stored.
+        self.__owns_history_store = history_store is None and bool(config.history_db_path) and not config.replay_file
+        if self.__owns_history_store:
+            history_store = HistoryStore(config.history_db_path, config.history_db_flush_interval,
+                                         config.history_db_raw_retention, config.history_db_minute_retention,
+                                         config.history_db_hour_retention)
+        self.__history_store: Optional[HistoryStore] = history_store
 
     def __get_key(self, container: Container) -> str:
         return container.id
 
-    def __action_executor(self, key: str, action, args, kwargs):
+    def __execute_action(self, key: str, container_key: str, action_name: str, batch: ActionBatch,
+                         submitted_at: float) -> None:
+        """
+        Runs on an action worker. The latency reported to the batch includes the time spent waiting for a worker.
+        """
         try:
-            action(*args, **kwargs)
+            getattr(self.__action_client.api, CONTAINER_ACTIONS[action_name])(container_key)
+            batch.succeeded(time.monotonic() - submitted_at)
             logging.debug(f"DockerDaemonClient - Executed: ({key})")
         except Exception as e:
+            batch.failed(container_key, str(e))
             logging.info(f"DockerDaemonClient - Exception during action for {key} : ({e})")
         finally:
-            self.__container_action_map.pop(key)
+            with self.__action_lock:
+                self.__container_action_map.pop(key, None)
+            self.__notify_change()
+
+    def __container_action(self, container_key: str, action_name: str, batch: ActionBatch) -> None:
+        """
+        Submits the action for the container to the action workers.
 
-    def __container_action(self, container_key: str, action_name: str, *args, **kwargs):
+        :raises: Exception - If the container or the action is unknown, or the same action is already in progress
+        """
         if container_key not in self.__containers:
             raise Exception('Unknown container!')
-        if not hasattr(self.__containers[container_key], action_name):
+        if action_name not in CONTAINER_ACTIONS:
             raise Exception('Unknown action_executor!')
 
         key = f"{container_key}/{action_name}"
-        if key in self.__container_action_map:
-            raise Exception('Another action_executor in progress!')
+        with self.__action_lock:
+            if key in self.__container_action_map:
+                raise Exception('Another action_executor in progress!')
+            # Submitted under the lock, so the worker can only remove the entry once it was added
+            self.__container_action_map[key] = self.__action_executor.submit(
+                self.__execute_action, key, container_key, action_name, batch, time.monotonic())
+
+    def __get_stream_container(self, container: Container) -> Container:
+        """
+        Returns the container bound to the stream client, for methods streaming from the daemon
+        """
+        if self.__stream_client is None or self.__stream_client is self.__client:
+            return container
+        return self.__stream_client.containers.prepare_model(container.attrs)
+
+    def __create_stats_streamer(self, container: Container) -> StatsStreamer:
+        """
+        Creates the StatsStreamer for the container with the recorder, if any, and the MetricsEngine attached.
+
+        :param container: The container to stream stats for
+        :return: A StatsStreamer which is not started yet
+        """
+        streamer = self.__create_backend_stats_streamer(self.__get_stream_container(container))
+        streamer.recorder = self.__recorder
+        streamer.attach_metrics_engine(self.__metrics_engine, self.__get_key(container))
+        return streamer
+
+    def __create_backend_stats_streamer(self, container: Container) -> StatsStreamer:
+        """
+        Creates the StatsStreamer for the container as per the configured stats backend. Falls back to the API backend
+        if the selected backend can not be used with the current daemon. A replay always uses the API backend.
+
+        :param container: The container to stream stats for
+        :return: A StatsStreamer which is not started yet
+        """
+        stats_backend = self.STATS_BACKEND_API if self.__config.replay_file else self.__config.stats_backend
+        if stats_backend == self.STATS_BACKEND_ASYNC:
+            socket_path = get_unix_socket_path(self.__config.docker_socket_url)
+            if socket_path:
+                return AsyncStatsStreamer(container, socket_path, self.__config.history_size)
+            logging.warning(f"DockerDaemonClient - `{self.STATS_BACKEND_ASYNC}` stats backend requires a unix socket, "
+                            f"using `{self.STATS_BACKEND_API}`")
+
+        elif stats_backend == self.STATS_BACKEND_CGROUP:
+            streamer = CgroupStatsStreamer(container, self.__config.cgroup_root, self.__config.proc_root,
+                                           self.__config.history_size)
+            if streamer.is_readable():
+                return streamer
+            logging.info(f"DockerDaemonClient - cgroup of {self.__get_key(container)} is not readable, "
+                         f"using `{self.STATS_BACKEND_API}` stats backend")
+
+        return StatsStreamer(container, self.__config.history_size)
+
+    def __get_sampling_mode(self, container: Container) -> str:
+        """
+        Returns how the stats of the container should be sampled: paused containers are parked, and if adaptive
+        sampling is enabled, only the visible containers are streamed while the others are polled
+        """
+        if container.status == 'paused':
+            return self.SAMPLING_PARKED
+        if self.__visible_keys is None or self.__config.stats_poll_interval <= 0 or \
+                self.__get_key(container) in self.__visible_keys:
+            return self.SAMPLING_STREAM
+        return self.SAMPLING_POLL
+
+    def __apply_sampling_mode(self, container_key: str) -> None:
+        """
+        Starts or stops the stream of the container if its sampling mode changed. The StatsStreamer is kept across
+        modes, so the delta state of the MetricsEngine and the history survive a promotion or demotion.
 
-        action = getattr(self.__containers[container_key], action_name)
-        self.__container_action_map[key] = Thread(target=self.__action_executor, args=(key, action, args, kwargs))
-        self.__container_action_map[key].daemon = True
-        self.__container_action_map[key].start()
+        :param container_key: A container with a StatsStreamer
+        """
+        mode = self.__get_sampling_mode(self.__containers[container_key])
+        previous_mode = self.__sampling_modes.get(container_key)
+        if mode == previous_mode:
+            return
+
+        streamer = self.__container_stats_streams[container_key]
+        if previous_mode == self.SAMPLING_STREAM:
+            streamer.stop_stream()
+        if mode == self.SAMPLING_STREAM:
+            streamer.start_stream()
+        self.__sampling_modes[container_key] = mode
+        logging.debug(f"DockerDaemonClient - Sampling mode of {container_key}: {mode}")
+
+    def __stop_sampling(self, container_key: str) -> None:
+        if self.__sampling_modes.pop(container_key, None) == self.SAMPLING_STREAM:
+            self.__container_stats_streams[container_key].stop_stream()
 
     def __upsert_container(self, container: Container) -> None:
         """
@@ -64,20 +243,26 @@ class DockerDaemonClient:
         :param container:
         """
         container_key = self.__get_key(container)
-        if container_key not in self.__containers:
-            logging.info(f"DockerDaemonClient - Adding container {container_key}")
-        else:
-            logging.debug(f"DockerDaemonClient - Updating container {container_key}")
-        self.__containers[container_key] = container
-
-        if container_key not in self.__container_stats_streams and container.status in self.STREAMING_STATUS:
-            logging.debug(f"DockerDaemonClient - Starting streamer for {container_key}")
-            self.__container_stats_streams[container_key] = StatsStreamer(container)
-            self.__container_stats_streams[container_key].start_stream()
-
-        elif container_key in self.__container_stats_streams and container.status not in self.STREAMING_STATUS:
-            logging.debug(f"DockerDaemonClient - Stopping streamer for {container_key}")
-            self.__container_stats_streams.pop(container_key).stop_stream()
+        with self.__lock:
+            if container_key not in self.__containers:
+                logging.info(f"DockerDaemonClient - Adding container {container_key}")
+            else:
+                logging.debug(f"DockerDaemonClient - Updating container {container_key}")
+            self.__containers[container_key] = container
+
+            if container_key not in self.__container_stats_streams and container.status in self.STREAMING_STATUS:
+                logging.debug(f"DockerDaemonClient - Starting streamer for {container_key}")
+                self.__container_stats_streams[container_key] = self.__create_stats_streamer(container)
+                self.__apply_sampling_mode(container_key)
+
+            elif container_key in self.__container_stats_streams and container.status not in self.STREAMING_STATUS:
+                logging.debug(f"DockerDaemonClient - Stopping streamer for {container_key}")
+                self.__stop_sampling(container_key)
+                self.__container_stats_streams.pop(container_key)
+
+            elif container_key in self.__container_stats_streams:
+                self.__container_stats_streams[container_key].update_container(self.__get_stream_container(container))
+                self.__apply_sampling_mode(container_key)
 
     def __remove_container(self, container_key: str) -> None:
         """
@@ -86,13 +271,159 @@ class DockerDaemonClient:
 
         :param container_key: The container that needs to be removed
         """
-        if container_key in self.__containers:
-            logging.info(f"DockerDaemonClient - Removing container {container_key}")
-            self.__containers[container_key] = container_key
+        with self.__lock:
+            if container_key in self.__containers:
+                logging.info(f"DockerDaemonClient - Removing container {container_key}")
+                self.__containers.pop(container_key)
+            self.__container_details.pop(container_key, None)
+
+            if container_key in self.__container_stats_streams:
+                logging.debug(f"DockerDaemonClient - Stopping streamer for {container_key}")
+                self.__stop_sampling(container_key)
+                self.__container_stats_streams.pop(container_key)
+
+    def __sync_containers(self, containers: List[Container]) -> None:
+        """
+        Upserts the given containers and removes any known container which is not in the list.
+
+        :param containers: The complete list of containers reported by the daemon
+        """
+        for container in containers:
+            self.__upsert_container(container)
+
+        with self.__lock:
+            missing_container_keys = (set(self.__containers.keys()) | set(self.__container_stats_streams.keys())) - set(
+                [self.__get_key(c) for c in containers])
+            for container_key in missing_container_keys:
+                self.__remove_container(container_key)
+
+    def __resync(self) -> int:
+        """
+        Performs a full resync of the daemon version and the container list, used by the events inventory mode on start
+        and after the event stream was interrupted.
+
+        :return: The timestamp from which the event stream must be followed to not miss any change
+        :raises: Exception - If the daemon could not be reached
+        """
+        # Taken before listing, events from this point are replayed, so nothing happening during the listing is lost
+        since = int(time.time())
+        # Image events might have been missed as well
+        self.__image_cache.clear()
+        self.__version = self.__client.version()
+        containers = self.__client.containers.list(all=self.__config.client_list_all_containers) or []
+        self.__sync_containers(containers)
+        if self.__recorder:
+            self.__recorder.record_version(self.__version)
+        self.__needs_resync = False
+        logging.info(f"DockerDaemonClient - Resynced {len(self.__containers)} containers")
+        return since
+
+    def __notify_change(self) -> None:
+        for listener in self.__change_listeners:
+            listener()
+
+    def __handle_container_event(self, event: Dict) -> None:
+        """
+        Applies a container event from the daemon's event stream to the internal maps.
 
-        if container_key in self.__container_stats_streams:
-            logging.debug(f"DockerDaemonClient - Stopping streamer for {container_key}")
-            self.__container_stats_streams.pop(container_key).stop_stream()
+        :param event: The decoded event
+        """
+        action = event.get('Action', event.get('status', '')).split(':')[0]
+        container_key = event.get('Actor', {}).get('ID', event.get('id'))
+        if action not in self.INVENTORY_EVENTS or not container_key:
+            return
+
+        logging.debug(f"DockerDaemonClient - Event `{action}` for {container_key}")
+        container = None
+        if action != 'destroy':
+            try:
+                container = self.__client.containers.get(container_key)
+            except NotFound:
+                pass
+
+        if container is None or (not self.__config.client_list_all_containers and
+                                 container.status not in self.LISTED_STATUS):
+            self.__remove_container(container_key)
+        else:
+            self.__upsert_container(container)
+        self.__notify_change()
+
+    def __handle_image_event(self, event: Dict) -> None:
+        """
+        Invalidates the cached tags of the image on tag, untag and delete events.
+
+        :param event: The decoded event
+        """
+        action = event.get('Action', event.get('status', ''))
+        image_ref = event.get('Actor', {}).get('ID', event.get('id'))
+        if action in self.IMAGE_EVENTS and image_ref:
+            logging.debug(f"DockerDaemonClient - Event `{action}` for image {image_ref}")
+            self.__image_cache.invalidate(image_ref)
+
+    def __events_listener(self, events_stream) -> None:
+        """
+        Follows the daemon's container and image events and keeps the internal maps and the image cache up to date.
+        On any interruption of the event stream, a full resync is requested as events might have been missed.
+
+        :param events_stream: The CancellableStream of decoded container events
+        """
+        try:
+            for event in events_stream:
+                if event.get('Type') == 'image':
+                    self.__handle_image_event(event)
+                else:
+                    self.__handle_container_event(event)
+        except Exception as e:
+            logging.error(f"DockerDaemonClient - Event stream interrupted ({e})")
+        finally:
+            # A listener which was stopped on purpose must not request a resync
+            if self.__events_thread is current_thread():
+                self.__needs_resync = True
+
+    def __start_events_listener(self, since: int) -> None:
+        self.__events_stream = self.__stream_client.events(since=since, filters={'type': ['container', 'image']},
+                                                           decode=True)
+        self.__events_thread = Thread(target=self.__events_listener, args=(self.__events_stream,))
+        self.__events_thread.daemon = True
+        self.__events_thread.start()
+
+    def __stop_events_listener(self) -> None:
+        self.__events_thread = None
+        if self.__events_stream is not None:
+            self.__events_stream.close()
+            self.__events_stream = None
+
+    def __get_containers_from_events(self) -> List[Container]:
+        """
+        Returns the containers tracked from the event stream, resyncing and (re)subscribing if required.
+
+        :return: The known containers, newest first like `containers.list`
+        :raises: Exception - If a resync was required and the daemon could not be reached
+        """
+        if self.__needs_resync or not self.__events_thread or not self.__events_thread.is_alive():
+            self.__stop_events_listener()
+            self.__start_events_listener(self.__resync())
+
+        with self.__lock:
+            containers = list(self.__containers.values())
+        containers = sorted(containers, key=lambda c: c.attrs['Created'], reverse=True)
+        if self.__recorder:
+            self.__recorder.record_container_list(containers)
+        return containers
+
+    def __get_container_details(self, container: Container) -> ContainerDetails:
+        """
+        Returns the ContainerDetails of the container, parsed again only if the container was restarted since.
+
+        :param container: The Container to get details for
+        :return: The ContainerDetails
+        """
+        container_key = self.__get_key(container)
+        details = self.__container_details.get(container_key)
+        if details is None or not details.is_current(container.attrs):
+            details = ContainerDetails(container.attrs)
+            self.__container_details[container_key] = details
+        return details
 
     def __get_active_container_stats(self, container: Container) -> Dict:
         """
@@ -106,43 +437,62 @@ class DockerDaemonClient:
         container_key = self.__get_key(container)
 
         try:
-            stats['started_at'] = container.attrs['State']['StartedAt']
-            stats['command'] = []
-            if container.attrs['Config'].get('Entrypoint', None):
-                stats['command'].extend(container.attrs['Config'].get('Entrypoint', []))
-            if container.attrs['Config'].get('Cmd', None):
-                stats['command'].extend(container.attrs['Config'].get('Cmd', []))
-
-            stats['cpu_stats'] = self.__container_stats_streams[container_key].get_cpu_stats()
-            stats['memory_stats'] = self.__container_stats_streams[container_key].get_memory_stats()
-            stats['net_io_stats'] = self.__container_stats_streams[container_key].get_network_io()
-            stats['disk_io_stats'] = self.__container_stats_streams[container_key].get_disk_io()
-            stats['published_ports'] = [k for k in container.attrs['Config'].get('ExposedPorts', {}).keys()]
+            details = self.__get_container_details(container)
+            stats['started_at'] = details.started_at
+            stats['command'] = details.command
+            stats['published_ports'] = details.published_ports
+
+            streamer = self.__container_stats_streams[container_key]
+            stats['cpu_stats'], stats['memory_stats'], stats['net_io_stats'], stats['disk_io_stats'] = \
+                self.__metrics_engine.get_stats(container_key)
+            stats['history'] = streamer.history
+            stats['stale'] = container_key in self.__stale_keys
         except Exception as e:
             logging.error(f"DockerDaemonClient - Failed getting active stats for {container_key} ({e})")
             logging.error(container)
 
         return stats
 
-    def __generate_container_view(self, container: Container) -> ContainerView:
+    def __generate_container_view(self, container: Container) -> ContainerSnapshot:
         """
-        Generates a ContainerView object for the given container. ContainerView includes active stats if the container
-        status is in STREAMING_STATUS
+        Generates a ContainerSnapshot for the given container. It includes active stats if the container status is in
+        STREAMING_STATUS
 
-        :param container: The Container to generate ContainerView for.
-        :return: A ContainerView
+        :param container: The Container to generate ContainerSnapshot for.
+        :return: A ContainerSnapshot
         """
         view = {
             'name': container.name,
             'id': container.id,
             'status': container.attrs['State']['Status'],
-            'image': container.image.tags[0] if len(container.image.tags) > 0 else "",
-            'created_at': container.attrs['Created'],
+            'image': next(iter(self.__image_cache.get_tags(container.attrs.get('Image', ''))), ""),
+            'created_at': self.__get_container_details(container).created_at,
+            'host': self.host_name,
         }
         if view['status'] in self.STREAMING_STATUS:
             view |= self.__get_active_container_stats(container)
 
-        return ContainerView(**view)
+        return ContainerSnapshot(**view)
+
+    def __store_samples(self, container_keys: List[str]) -> None:
+        """
+        Hands the new samples over to the HistoryStore, which only buffers them
+        """
+        with self.__lock:
+            names = {key: self.__containers[key].name for key in container_keys if key in self.__containers}
+        for key, name in names.items():
+            read_time = self.__metrics_engine.get_read_time(key)
+            self.__history_store.record(self.host_name, key, name, read_time.timestamp(),
+                                        self.__metrics_engine.get_metric_values(key))
+
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Registers a callback invoked whenever the container inventory changes in the background (events inventory
+        mode). The callback is invoked from the events listener thread, so it must be thread-safe and must not block.
+
+        :param listener: A callable without arguments
+        """
+        self.__change_listeners.append(listener)
 
     def connect(self) -> bool:
         """
@@ -156,26 +506,56 @@ class DockerDaemonClient:
             raise Exception("DockerDaemonClient - Already connection to a daemon")
 
         try:
-            # TODO: lookup usage for certs
-            self.__client = DockerClient(base_url=self.__config.docker_socket_url)
+            if self.__config.replay_file:
+                self.__client = ReplayDockerClient(self.__config.replay_file, self.__config.replay_speed)
+                self.__stream_client = self.__action_client = self.__client
+            else:
+                base_url = self.__config.docker_socket_url
+                tls = create_tls_config(self.__config, base_url)
+                self.__client = create_docker_client(base_url, tls, self.__config.client_pool_size)
+                self.__stream_client = create_docker_client(base_url, tls, self.__config.client_stream_pool_size,
+                                                            self.__client.api.api_version)
+                self.__action_client = create_docker_client(base_url, tls, self.__config.action_workers,
+                                                            self.__client.api.api_version, self.__config.action_timeout)
+                for name, client in (('control', self.__client), ('stream', self.__stream_client),
+                                     ('action', self.__action_client)):
+                    instruments.instrument_session(client.api, name)
+            if self.__config.record_file:
+                self.__recorder = StreamRecorder(self.__config.record_file)
         except Exception as e:
-            self.__client = None
+            self.__client = self.__stream_client = self.__action_client = None
             logging.error(f"DockerDaemonClient - Failed establish connection to docker daemon ({e})")
             return False
 
         return True
 
     def disconnect(self):
+        self.__stop_events_listener()
+        with self.__lock:
+            for key in list(self.__containers.keys()):
+                self.__remove_container(key)
+        self.__stats_poller.close()
+        self.__action_executor.shutdown(wait=False, cancel_futures=True)
+        # Closing the clients once their streams are stopped
         self.__client.close()
-        for key in self.__containers.keys():
-            self.__remove_container(key)
+        if self.__stream_client is not self.__client:
+            self.__stream_client.close()
+            self.__action_client.close()
+        if self.__recorder:
+            self.__recorder.close()
+        with self.__lock:
+            for spool in self.__log_spools.values():
+                spool.close()
+            self.__log_spools.clear()
+        if self.__owns_history_store:
+            self.__history_store.close()
 
     def get_version_and_container_views(self) -> Optional[Dict]:
         """
         Returns a dict with `version` and  `container_views` as keys (latter is not included if a error occurs)
         Raises an exception if the client is not initialized (`connect` methods performs the connection)
 
-        :return: A dict containing version and a list of ContainerView
+        :return: A dict containing version and a list of ContainerSnapshot
         :raises Exception - If DockerClient is not initialized
         """
         if not self.__client:
@@ -183,44 +563,170 @@ class DockerDaemonClient:
 
         stats = {}
         try:
-            stats['version'] = self.__client.version()
-            containers = self.__client.containers.list(all=self.__config.client_list_all_containers) or []
+            with instruments.timer('refresh.daemon'):
+                if self.__config.client_inventory_mode == self.INVENTORY_MODE_EVENTS:
+                    containers = self.__get_containers_from_events()
+                    stats['version'] = self.__version
+                else:
+                    stats['version'] = self.__client.version()
+                    containers = self.__client.containers.list(all=self.__config.client_list_all_containers) or []
+                    self.__sync_containers(containers)
+                    if self.__recorder:
+                        self.__recorder.record_version(stats['version'])
+                        self.__recorder.record_container_list(containers)
         except Exception as e:  # We might have lost connection
             logging.error(f"DockerDaemonClient - Failed to get daemon version or containers list ({e})")
+            self.__needs_resync = True
             return stats
 
-        for container in containers:
-            self.__upsert_container(container)
+        # Computing the stats of all new samples at once
+        with instruments.timer('refresh.metrics'):
+            with self.__lock:
+                streamers = dict(self.__container_stats_streams)
+                polled_streamers = {key: streamer for key, streamer in streamers.items()
+                                    if self.__sampling_modes.get(key) == self.SAMPLING_POLL}
+                if self.__stream_supervisor:
+                    self.__stale_keys = self.__stream_supervisor.supervise(
+                        {key: streamer for key, streamer in streamers.items()
+                         if self.__sampling_modes.get(key) == self.SAMPLING_STREAM})
+            self.__stats_poller.poll(polled_streamers)
+            updated_keys = self.__metrics_engine.update(streamers)
+            if self.__history_store:
+                self.__store_samples(updated_keys)
+
+        # Generating ContainerSnapshot for all containers, published at once
+        with instruments.timer('refresh.views'):
+            snapshot = Snapshot(stats['version'], [self.__generate_container_view(c) for c in containers])
+        self.__snapshot = snapshot
+        stats['container_views'] = list(snapshot.container_views)
 
-        missing_container_names = set(self.__container_stats_streams.keys()) - set(
-            [self.__get_key(c) for c in containers])
-        for container_key in missing_container_names:
-            self.__remove_container(container_key)
+        return stats
 
-        # Generating ContainerView for all containers
-        stats['container_views'] = [self.__generate_container_view(container) for container in containers]
+    def set_visible_containers(self, container_keys: Optional[Iterable[str]]) -> None:
+        """
+        Enables adaptive sampling: the given containers (ie: the rows on screen and the selected row) are streamed at
+        full rate, every other running container is polled every `stats_poll_interval` seconds instead. Containers
+        are promoted or demoted right away, keeping their stats and history.
 
-        return stats
+        :param container_keys: The keys of the visible containers, None to stream every container again
+        """
+        visible_keys = None if container_keys is None else set(container_keys)
+        with self.__lock:
+            if visible_keys == self.__visible_keys:
+                return
+            self.__visible_keys = visible_keys
+            for container_key in self.__container_stats_streams:
+                self.__apply_sampling_mode(container_key)
+
+    def get_sampling_modes(self) -> Dict[str, str]:
+        """
+        Returns the sampling mode (SAMPLING_STREAM, SAMPLING_POLL or SAMPLING_PARKED) of every container with stats
+        """
+        with self.__lock:
+            return dict(self.__sampling_modes)
+
+    def get_sample_ages(self) -> Dict[str, Optional[float]]:
+        """
+        Returns the seconds since the last sample of every streamed container, None if its stream had no sample yet.
+        Polled and parked containers are left out, their samples are expected to be old.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return {key: self.__container_stats_streams[key].get_sample_age(now)
+                    for key, mode in self.__sampling_modes.items()
+                    if mode == self.SAMPLING_STREAM and key in self.__container_stats_streams}
+
+    def get_snapshot(self) -> Optional[Snapshot]:
+        """
+        Returns the Snapshot published by the last successful `get_version_and_container_views`, without contacting
+        the daemon. Safe to call from any thread.
+
+        :return: The last Snapshot, None before the first refresh
+        """
+        return self.__snapshot
+
+    def query_history(self, container_key: str, metric: str, start: float, end: Optional[float] = None,
+                      resolution: Optional[str] = None) -> List[Tuple[float, float, float, float]]:
+        """
+        Returns the stored values of a metric of the container over a time range, see `HistoryStore.query`
+
+        :raises: Exception - If the history is not stored
+        """
+        if not self.__history_store:
+            raise Exception("DockerDaemonClient - The history is not stored, HISTORY_DB_PATH is not set")
+        return self.__history_store.query(container_key, metric, start, end, self.host_name, resolution)
+
+    def has_history_store(self) -> bool:
+        return self.__history_store is not None
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the usage of the connection pools of the request client (`control`), the stream client (`stream`) and
+        the container actions client (`action`), see `connection_pools.get_pool_stats`
+
+        :return: A dict of pool counters per client
+        """
+        if not self.__client:
+            return {}
+        return {'control': get_pool_stats(self.__client), 'stream': get_pool_stats(self.__stream_client),
+                'action': get_pool_stats(self.__action_client)}
+
+    def run_actions(self, action_name: str, container_keys: Iterable[str],
+                    batch: Optional[ActionBatch] = None) -> ActionBatch:
+        """
+        Submits the action for all given containers to the action workers, at most `action_workers` run at once.
+        Containers which are unknown or already running the same action are reported as failed in the batch.
+
+        :param action_name: One of CONTAINER_ACTIONS
+        :param container_keys: The containers to run the action for
+        :param batch: The batch to report progress to, a new one for `container_keys` if not given
+        :return: The ActionBatch tracking the progress of the actions
+        :raises: Exception - If the action is unknown
+        """
+        if action_name not in CONTAINER_ACTIONS:
+            raise Exception('Unknown action_executor!')
+        container_keys = list(container_keys)
+        batch = batch or ActionBatch(action_name, len(container_keys))
+        for container_key in container_keys:
+            try:
+                self.__container_action(container_key, action_name, batch)
+            except Exception as e:
+                batch.failed(container_key, str(e))
+        return batch
+
+    def __single_action(self, container_key: str, action_name: str) -> ActionBatch:
+        batch = ActionBatch(action_name, 1)
+        self.__container_action(container_key, action_name, batch)
+        return batch
 
-    def start(self, container_key: str):
-        self.__container_action(container_key, 'start')
+    def start(self, container_key: str) -> ActionBatch:
+        return self.__single_action(container_key, 'start')
 
-    def restart(self, container_key: str):
-        self.__container_action(container_key, 'restart')
+    def restart(self, container_key: str) -> ActionBatch:
+        return self.__single_action(container_key, 'restart')
 
-    def pause(self, container_key: str):
-        self.__container_action(container_key, 'pause')
+    def pause(self, container_key: str) -> ActionBatch:
+        return self.__single_action(container_key, 'pause')
 
-    def resume(self, container_key: str):
-        self.__container_action(container_key, 'unpause')
+    def resume(self, container_key: str) -> ActionBatch:
+        return self.__single_action(container_key, 'resume')
 
-    def stop(self, container_key: str):
-        self.__container_action(container_key, 'stop')
+    def stop(self, container_key: str) -> ActionBatch:
+        return self.__single_action(container_key, 'stop')
 
-    def kill(self, container_key: str):
-        self.__container_action(container_key, 'kill')
+    def kill(self, container_key: str) -> ActionBatch:
+        return self.__single_action(container_key, 'kill')
 
     def logs(self, container_key: str):
         if container_key not in self.__containers:
             raise Exception('Unknown container!')
-        return LogsStreamer(self.__containers[container_key])
+        spool = None
+        if self.__config.logs_spool_dir:
+            directory = os.path.join(self.__config.logs_spool_dir, container_key)
+            with self.__lock:
+                spool = self.__log_spools.get(directory)
+                if spool is None:
+                    spool = self.__log_spools[directory] = LogSpool(directory, self.__config.logs_spool_segment_size,
+                                                                    self.__config.logs_spool_max_segments)
+        return LogsStreamer(self.__get_stream_container(self.__containers[container_key]),
+                            self.__config.logs_buffer_size, spool)
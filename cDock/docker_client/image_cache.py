@@ -0,0 +1,84 @@
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, List, Tuple
+
+from docker.errors import ImageNotFound
+
+
+class ImageCache:
+    """
+    A bounded LRU cache of image tags keyed by image ID, so the image of a container is not looked up on every
+    refresh. Entries expire after `ttl` seconds and can be invalidated explicitly, eg: on image tag/untag/delete events.
+    """
+
+    def __init__(self, loader: Callable[[str], List[str]], max_size: int = 256, ttl: float = 300):
+        """
+        :param loader: Returns the tags of the image with the given ID, raises ImageNotFound for unknown images
+        :param max_size: Maximum number of cached images, the least recently used image is evicted beyond
+        :param ttl: Seconds after which a cached entry is looked up again
+        """
+        self.__loader = loader
+        self.__max_size = max(max_size, 1)
+        self.__ttl = ttl
+        self.__entries: OrderedDict[str, Tuple[float, List[str]]] = OrderedDict()
+        self.__lock = Lock()
+
+        # For diagnostics
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get_tags(self, image_id: str) -> List[str]:
+        """
+        Returns the tags of the image, from the cache if present and not expired
+
+        :param image_id: The ID of the image, as in the container's `Image` attribute
+        :return: A list of tags, empty if the image has no tags or does not exist anymore
+        """
+        if not image_id:
+            return []
+
+        with self.__lock:
+            entry = self.__entries.get(image_id)
+            if entry is not None and time.monotonic() - entry[0] < self.__ttl:
+                self.__entries.move_to_end(image_id)
+                self.hits += 1
+                return entry[1]
+
+        self.misses += 1
+        try:
+            tags = self.__loader(image_id)
+        except ImageNotFound:
+            tags = []
+        except Exception as e:
+            logging.error(f"ImageCache - Failed to get image {image_id} ({e})")
+            return []
+
+        with self.__lock:
+            self.__entries[image_id] = (time.monotonic(), tags)
+            self.__entries.move_to_end(image_id)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+        return tags
+
+    def invalidate(self, image_ref: str) -> None:
+        """
+        Removes an image from the cache
+
+        :param image_ref: The ID of the image or one of its tags
+        """
+        with self.__lock:
+            if image_ref in self.__entries:
+                self.__entries.pop(image_ref)
+                return
+            for image_id, (_, tags) in list(self.__entries.items()):
+                if image_ref in tags or image_id.endswith(image_ref):
+                    self.__entries.pop(image_id)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
@@ -18,19 +18,29 @@ def run_event_loop(event_loop: asyncio.AbstractEventLoop) -> None:
     event_loop.run_forever()
 
 
+class StreamEnded(Exception):
+    """
+    Raised when the stream generator is exhausted, as StopIteration can not be propagated through a Future
+    """
+
+
 class InfoStreamer(ABC):
-    __executor = concurrent.futures.ThreadPoolExecutor()
+    # Shared by the streams of all InfoStreamers for the lifetime of the process, it is never shut down
+    __executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='cDock-stream')
     __event_loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
     __event_loop_thread: Thread = Thread(target=run_event_loop, args=(__event_loop,))
     __event_loop_thread.daemon = True
 
-    def __init__(self, container: Container, sleep_interval: Union[int, float] = 0.9):
+    def __init__(self, container: Container, sleep_interval: Union[int, float] = 0.9, batch_size: int = 1):
         self.container: Container = container
         self.time_initialized: datetime = datetime.now()
         self.sleep_interval: Union[int, float] = sleep_interval
+        # Number of streamed values handled per stream action, ie: per executor round trip
+        self.batch_size: int = max(batch_size, 1)
 
         # To stream container stats and stop when not required
         self.__stream_task: Optional[Future] = None
+        self.__stream_generator = None
 
         self.__start_event_loop_thread()
 
@@ -42,6 +52,13 @@ class InfoStreamer(ABC):
         if not cls.__event_loop_thread.is_alive():
             cls.__event_loop_thread.start()
 
+    @classmethod
+    def get_event_loop(cls) -> asyncio.AbstractEventLoop:
+        """
+        Returns the shared event loop on which all streams are run
+        """
+        return cls.__event_loop
+
     @abstractmethod
     def stream_handler(self, streamed_value):
         """
@@ -58,17 +75,20 @@ class InfoStreamer(ABC):
 
     def __stream_action(self):
         """
-        Action to be executed every `sleep_interval` seconds
+        Action to be executed every `sleep_interval` seconds. Handles up to `batch_size` streamed values.
         """
-        self.stream_handler(next(self.__stream_generator))
+        for _ in range(self.batch_size):
+            try:
+                streamed_value = next(self.__stream_generator)
+            except StopIteration:
+                raise StreamEnded("The stream ended")
+            self.stream_handler(streamed_value)
 
     async def __shared_executor_loop(self):
-        with self.__executor as executor:
-            await self.__event_loop.run_in_executor(executor, self.__stream_action)
-
+        # The stream action blocks until the next value, so it never runs on the event loop itself
         while True:
+            await self.__event_loop.run_in_executor(self.__executor, self.__stream_action)
             await asyncio.sleep(self.sleep_interval)
-            self.__stream_action()
 
     async def __private_executor_loop(self):
         with concurrent.futures.ThreadPoolExecutor(1) as executor:
@@ -77,16 +97,13 @@ class InfoStreamer(ABC):
 
     async def __stream_action_invoker(self, use_private_executor: bool) -> None:
         """
-        Runs the executor loop which invokes the stream action_name periodically. Returns if another stream task was not
-        setup or if it is already in progress
+        Runs the executor loop which invokes the stream action_name periodically.
 
         :param use_private_executor: Set to True to use a private executor for the stream
         """
-        if not self.__stream_task or self.__stream_task.running():
-            return
-
+        stream_generator = None
         try:
-            self.__stream_generator = self.get_stream_generator()
+            stream_generator = self.__stream_generator = self.get_stream_generator()
 
             if use_private_executor:
                 await self.__private_executor_loop()
@@ -95,6 +112,18 @@ class InfoStreamer(ABC):
 
         except Exception as e:
             logging.error(f"{self.__class__.__name__} - Exiting. {type(e)} while streaming: ({e})")
+        finally:
+            # The task might be cancelled before `stop_stream` could see the generator
+            self.__close_generator(stream_generator)
+
+    def __close_generator(self, stream_generator) -> None:
+        if stream_generator is None:
+            return
+        try:
+            stream_generator.close()
+        except ValueError:
+            # The generator is waiting for a value in the executor, the cancelled task drops it
+            logging.debug(f"{self.__class__.__name__} - Stream generator still executing on stop")
 
     def start_stream(self, use_private_executor: bool = False) -> None:
         """
@@ -103,7 +132,7 @@ class InfoStreamer(ABC):
         :param use_private_executor: Set to True to stream on a separate thread
         :raise Exception: if the stream task is already in progress
         """
-        if self.__stream_task and self.__stream_task.running():
+        if self.__stream_task and not self.__stream_task.done():
             raise Exception("Already streaming!")
 
         self.__stream_task = asyncio.run_coroutine_threadsafe(self.__stream_action_invoker(use_private_executor),
@@ -119,7 +148,24 @@ class InfoStreamer(ABC):
             raise Exception("Streaming was never started!")
         if not self.__stream_task.cancelled():
             self.__stream_task.cancel()
-            self.__stream_generator.close()
+            self.__close_generator(self.__stream_generator)
+
+    def is_streaming(self) -> bool:
+        """
+        Returns True if the stream was started and did not end, False once it was stopped or died (ie: the daemon
+        closed the connection)
+        """
+        return self.__stream_task is not None and not self.__stream_task.done()
+
+    def restart_stream(self) -> None:
+        """
+        Stops the stream if it was started, and starts it again on a new connection
+        """
+        try:
+            self.stop_stream()
+        except Exception:
+            pass  # Never started
+        self.start_stream()
 
     def get_container(self) -> Container:
         """
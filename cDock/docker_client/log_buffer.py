@@ -0,0 +1,129 @@
+from collections import deque
+from threading import Lock
+from typing import Deque, List
+
+DEFAULT_LOG_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class LogBuffer:
+    """
+    A bounded buffer for streamed logs. Logs are appended to a ring of chunks, the oldest chunks are dropped once
+    `max_size` bytes are exceeded. The start offset of every held line is indexed, so the tail or any range of lines can
+    be read without scanning the logs. At most `max_size` bytes are readable, the memory held is bounded by
+    `max_size` + CHUNK_SIZE.
+
+    All offsets are absolute, ie: counted from the first byte ever appended.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, max_size: int = DEFAULT_LOG_BUFFER_SIZE):
+        self.max_size = max(max_size, 1)
+
+        # Full chunks are immutable, only the last chunk is appended to
+        self.__chunks: Deque[bytearray] = deque([bytearray()])
+        self.__chunk_offsets: Deque[int] = deque([0])
+        self.__start_offset = 0
+        self.__end_offset = 0
+
+        self.__line_offsets: Deque[int] = deque([0])
+        self.__read_offset = 0
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return self.__end_offset - self.__start_offset
+
+    @property
+    def line_count(self) -> int:
+        """
+        The number of (possibly incomplete last) lines held in the buffer
+        """
+        with self.__lock:
+            return len(self.__line_offsets) - (1 if self.__line_offsets[-1] == self.__end_offset else 0)
+
+    def append(self, data: bytes) -> None:
+        """
+        Appends data to the buffer, dropping the oldest data if the buffer is full
+        """
+        if not data:
+            return
+
+        with self.__lock:
+            index = data.find(b'\n')
+            while index != -1:
+                self.__line_offsets.append(self.__end_offset + index + 1)
+                index = data.find(b'\n', index + 1)
+
+            last_chunk = self.__chunks[-1]
+            while data:
+                free = self.CHUNK_SIZE - len(last_chunk)
+                last_chunk += data[:free]
+                data = data[free:]
+                if len(last_chunk) >= self.CHUNK_SIZE:
+                    last_chunk = bytearray()
+                    self.__chunk_offsets.append(self.__chunk_offsets[-1] + len(self.__chunks[-1]))
+                    self.__chunks.append(last_chunk)
+            self.__end_offset = self.__chunk_offsets[-1] + len(last_chunk)
+
+            self.__trim()
+
+    def __trim(self) -> None:
+        while self.__end_offset - self.__chunk_offsets[0] > self.max_size and len(self.__chunks) > 1:
+            self.__chunks.popleft()
+            self.__chunk_offsets.popleft()
+        # The first chunk is only partly held if a single chunk is larger than the remaining space
+        self.__start_offset = max(self.__chunk_offsets[0], self.__end_offset - self.max_size)
+
+        while len(self.__line_offsets) > 1 and self.__line_offsets[0] < self.__start_offset:
+            self.__line_offsets.popleft()
+        if self.__line_offsets[0] < self.__start_offset:
+            self.__line_offsets[0] = self.__start_offset
+
+    def __read(self, start: int, end: int) -> bytes:
+        """
+        Returns the bytes between two absolute offsets, which must be held in the buffer
+        """
+        parts = []
+        for chunk_offset, chunk in zip(self.__chunk_offsets, self.__chunks):
+            chunk_end = chunk_offset + len(chunk)
+            if chunk_end <= start:
+                continue
+            if chunk_offset >= end:
+                break
+            parts.append(bytes(chunk[max(start - chunk_offset, 0):min(end, chunk_end) - chunk_offset]))
+        return b''.join(parts)
+
+    def read_new(self) -> bytes:
+        """
+        Returns the data appended since the last call, skipping data which was already dropped
+        """
+        with self.__lock:
+            data = self.__read(max(self.__read_offset, self.__start_offset), self.__end_offset)
+            self.__read_offset = self.__end_offset
+        return data
+
+    def get_lines(self, start: int, count: int) -> List[bytes]:
+        """
+        Returns up to `count` lines, without line endings, starting from the `start`th line held in the buffer
+
+        :param start: Index of the first line, negative to index from the end
+        :param count: Maximum number of lines
+        """
+        with self.__lock:
+            line_offsets = list(self.__line_offsets)
+            if line_offsets[-1] != self.__end_offset:
+                line_offsets.append(self.__end_offset)
+            if start < 0:
+                start = max(len(line_offsets) - 1 + start, 0)
+            bounds = line_offsets[start:start + count + 1]
+            if len(bounds) < 2:
+                return []
+            data = self.__read(bounds[0], bounds[-1])
+
+        return [data[s - bounds[0]:e - bounds[0]].rstrip(b'\r\n') for s, e in zip(bounds, bounds[1:])]
+
+    def tail(self, count: int) -> List[bytes]:
+        """
+        Returns the last `count` lines held in the buffer
+        """
+        return self.get_lines(-count, count)
@@ -0,0 +1,228 @@
+import calendar
+import gzip
+import logging
+import mmap
+import os
+import re
+from array import array
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_SEGMENTS = 64
+# The latest rotated segments are kept uncompressed, as they are the most likely to be paged through
+UNCOMPRESSED_SEGMENTS = 2
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{8})\.log(\.gz)?$')
+
+
+def parse_log_timestamp(line: bytes) -> Optional[Tuple[int, int]]:
+    """
+    A utility method to read the RFC 3339 timestamp prefixed by the Docker API to log lines (`timestamps=True`).
+    Docker trims trailing zeros of the nanoseconds, so the timestamp is returned as (seconds, nanoseconds) to compare
+    timestamps correctly.
+    :param line: A log line starting with a timestamp, eg: `2021-10-01T12:00:00.123456789Z message`
+    :return: A tuple of the UTC epoch seconds and nanoseconds, None if the line has no timestamp
+    """
+    timestamp = line.split(b' ', 1)[0].decode('ascii', errors='ignore').rstrip('Z')
+    seconds, _, fraction = timestamp.partition('.')
+    try:
+        epoch = calendar.timegm(datetime.fromisoformat(seconds[:19]).timetuple())
+        return epoch, int(fraction[:9].ljust(9, '0') or 0)
+    except ValueError:
+        return None
+
+
+class LogSpool:
+    """
+    An append-only, segmented on-disk spool of a container's logs. Lines are appended to the active segment which is
+    rotated once it exceeds `segment_size`. Older segments are gzip compressed and the oldest are deleted beyond
+    `max_segments`. Segments are read back through mmap for paging and search, with a lazily built line index.
+
+    Lines are expected to be prefixed by their timestamp, so streaming can resume after the last spooled line.
+    Closing the spool closes the active segment, which is opened again by the next append.
+    """
+
+    def __init__(self, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 max_segments: int = DEFAULT_MAX_SEGMENTS, compress: bool = True):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(max_segments, 1)
+        self.compress = compress
+
+        self.__lock = Lock()
+        # Line start offsets of the segments, by segment number. The active segment's index is extended as it grows
+        self.__line_indexes: Dict[int, array] = {}
+        # Last decompressed segment, to page through a compressed segment without decompressing it on every read
+        self.__decompressed: Tuple[Optional[int], bytes] = (None, b'')
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self.get_segments()
+        self.__active_segment = segments[-1] if segments and not self.__is_compressed(segments[-1]) else \
+            (segments[-1] + 1 if segments else 0)
+        self.__file = open(self.__get_path(self.__active_segment), 'ab')
+        self.last_timestamp: Optional[Tuple[int, int]] = self.__read_last_timestamp()
+
+    def __get_path(self, segment: int, compressed: bool = False) -> str:
+        return os.path.join(self.directory, f"segment-{segment:08d}.log" + ('.gz' if compressed else ''))
+
+    def __is_compressed(self, segment: int) -> bool:
+        return os.path.exists(self.__get_path(segment, compressed=True))
+
+    def get_segments(self) -> List[int]:
+        """
+        Returns the numbers of all spooled segments, oldest first
+        """
+        segments = set()
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                segments.add(int(match.group(1)))
+        return sorted(segments)
+
+    def __read_last_timestamp(self) -> Optional[Tuple[int, int]]:
+        """
+        Returns the timestamp of the last spooled line, looking back through the segments if the latest is empty
+        """
+        for segment in reversed(self.get_segments()):
+            lines = self.get_lines(segment, -1, 1)
+            if lines:
+                return parse_log_timestamp(lines[0])
+        return None
+
+    def append(self, lines: bytes) -> None:
+        """
+        Appends complete lines to the spool, rotating the active segment if it is full
+
+        :param lines: One or more lines, each terminated by a line feed
+        """
+        if not lines:
+            return
+        with self.__lock:
+            if self.__file.closed:
+                self.__file = open(self.__get_path(self.__active_segment), 'ab')
+            self.__file.write(lines)
+            self.__file.flush()
+            timestamp = parse_log_timestamp(lines[lines.rfind(b'\n', 0, len(lines) - 1) + 1:])
+            if timestamp:
+                self.last_timestamp = timestamp
+
+            if self.__file.tell() >= self.segment_size:
+                self.__rotate()
+
+    def __rotate(self) -> None:
+        self.__file.close()
+        self.__active_segment += 1
+        self.__file = open(self.__get_path(self.__active_segment), 'ab')
+
+        segments = self.get_segments()
+        for segment in segments[:-self.max_segments]:
+            for compressed in (False, True):
+                if os.path.exists(self.__get_path(segment, compressed)):
+                    os.remove(self.__get_path(segment, compressed))
+            self.__line_indexes.pop(segment, None)
+
+        if self.compress:
+            # Keeping the active segment and the latest rotated ones uncompressed
+            for segment in segments[-self.max_segments:-(UNCOMPRESSED_SEGMENTS + 1)]:
+                if not self.__is_compressed(segment):
+                    self.__compress_segment(segment)
+
+    def __compress_segment(self, segment: int) -> None:
+        path = self.__get_path(segment)
+        try:
+            with open(path, 'rb') as source, gzip.open(path + '.gz.tmp', 'wb') as target:
+                for block in iter(lambda: source.read(1024 * 1024), b''):
+                    target.write(block)
+            os.replace(path + '.gz.tmp', self.__get_path(segment, compressed=True))
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"LogSpool - Failed to compress segment {path} ({e})")
+
+    def __read_segment(self, segment: int):
+        """
+        Returns the segment's content, a mmap for uncompressed segments. The caller must close a returned mmap.
+        """
+        if self.__is_compressed(segment):
+            if self.__decompressed[0] != segment:
+                with gzip.open(self.__get_path(segment, compressed=True), 'rb') as f:
+                    self.__decompressed = (segment, f.read())
+            return self.__decompressed[1]
+
+        with open(self.__get_path(segment), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __get_line_index(self, segment: int, data) -> array:
+        """
+        Returns the start offsets of the segment's lines plus the end offset of the last complete line
+        """
+        index = self.__line_indexes.setdefault(segment, array('Q', [0]))
+        position = data.find(b'\n', index[-1])
+        while position != -1:
+            index.append(position + 1)
+            position = data.find(b'\n', position + 1)
+        return index
+
+    def get_line_count(self, segment: int) -> int:
+        data = self.__read_segment(segment)
+        try:
+            return len(self.__get_line_index(segment, data)) - 1
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def get_lines(self, segment: int, start: int, count: int) -> List[bytes]:
+        """
+        Returns up to `count` complete lines of a segment, without line endings
+
+        :param segment: The segment number, see `get_segments`
+        :param start: Index of the first line in the segment, negative to index from the end
+        :param count: Maximum number of lines
+        """
+        data = self.__read_segment(segment)
+        try:
+            index = self.__get_line_index(segment, data)
+            if start < 0:
+                start = max(len(index) - 1 + start, 0)
+            bounds = index[start:start + count + 1]
+            return [data[s:e - 1] for s, e in zip(bounds, bounds[1:])]
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def search(self, pattern: bytes, max_results: int = 1000) -> List[Tuple[int, bytes]]:
+        """
+        Searches all segments, newest first, for lines matching the regular expression
+
+        :return: A list of (segment, line) tuples
+        """
+        results = []
+        expression = re.compile(pattern)
+        for segment in reversed(self.get_segments()):
+            data = self.__read_segment(segment)
+            try:
+                last_line_start = -1
+                for match in expression.finditer(data):
+                    line_start = data.rfind(b'\n', 0, match.start()) + 1
+                    if line_start == last_line_start:
+                        continue
+                    last_line_start = line_start
+                    line_end = data.find(b'\n', match.end())
+                    results.append((segment, data[line_start:line_end if line_end != -1 else len(data)]))
+                    if len(results) >= max_results:
+                        return results
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+        return results
+
+    @property
+    def closed(self) -> bool:
+        return self.__file.closed
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
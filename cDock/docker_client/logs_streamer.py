@@ -1,22 +1,70 @@
+from typing import Optional
+
 from docker.models.containers import Container
 
 from cDock.docker_client.info_streamer import InfoStreamer
+from cDock.docker_client.log_buffer import DEFAULT_LOG_BUFFER_SIZE, LogBuffer
+from cDock.docker_client.log_spool import LogSpool, parse_log_timestamp
 
 
 class LogsStreamer(InfoStreamer):
+    # Log chunks pulled from the stream per executor round trip
+    BATCH_SIZE = 64
 
-    def __init__(self, container: Container):
-        super().__init__(container, sleep_interval=0)
-        self.logs: bytes = b''
+    def __init__(self, container: Container, buffer_size: int = DEFAULT_LOG_BUFFER_SIZE,
+                 spool: Optional[LogSpool] = None):
+        """
+        :param container: The container to stream logs of
+        :param buffer_size: Maximum bytes of logs kept in memory
+        :param spool: If set, logs are streamed with timestamps and also written to the spool. Streaming resumes after
+            the last spooled line.
+        """
+        super().__init__(container, sleep_interval=0, batch_size=self.BATCH_SIZE)
+        self.logs: LogBuffer = LogBuffer(buffer_size)
+        self.spool: Optional[LogSpool] = spool
         self.last_update_timestamp = self.time_initialized
 
+        # For spooling complete lines only and skipping lines streamed again on resume
+        self.__partial_line = b''
+        self.__resume_after = None
+
     def get_stream_generator(self):
-        return self.container.logs(stream=True)
+        if self.spool is None:
+            return self.container.logs(stream=True)
+
+        self.__partial_line = b''
+        self.__resume_after = self.spool.last_timestamp
+        # `since` has a precision of seconds, lines of the last spooled second are skipped in the handler
+        since = self.__resume_after[0] if self.__resume_after else None
+        return self.container.logs(stream=True, timestamps=True, since=since)
 
     def stream_handler(self, streamed_value):
-        self.logs += streamed_value
+        if self.spool is None:
+            self.logs.append(streamed_value)
+            return
+
+        data = self.__partial_line + streamed_value
+        end = data.rfind(b'\n') + 1
+        lines, self.__partial_line = data[:end], data[end:]
+
+        if self.__resume_after is not None:
+            new_lines = [line for line in lines.splitlines(keepends=True)
+                         if (parse_log_timestamp(line) or (0, 0)) > self.__resume_after]
+            if new_lines:
+                # Lines are ordered, all following lines are newer
+                self.__resume_after = None
+            lines = b''.join(new_lines)
+
+        self.logs.append(lines)
+        self.spool.append(lines)
+
+    def stop_stream(self) -> None:
+        """
+        Stops the stream and closes the spool's active segment, the spool can be streamed to again
+        """
+        super().stop_stream()
+        if self.spool is not None:
+            self.spool.close()
 
     def get_streamed_logs(self) -> str:
-        logs = self.logs
-        self.logs = b''
-        return logs.decode('utf-8')
+        return self.logs.read_new().decode('utf-8', errors='replace')
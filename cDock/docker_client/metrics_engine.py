@@ -0,0 +1,298 @@
+import logging
+import math
+from array import array
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from cDock.snapshot import CPUSnapshot, DiskIOSnapshot, MemorySnapshot, NetIOSnapshot, parse_docker_timestamp
+
+if TYPE_CHECKING:
+    from cDock.docker_client.stats_streamer import StatsStreamer
+
+NAN = float('nan')
+NO_STATS = (None, None, None, None)
+
+
+def extract_counters(stats: Dict) -> Tuple[datetime, Tuple[float, ...]]:
+    """
+    Returns the raw counters of a Docker API stats sample in the order of `MetricsEngine.COUNTERS`, NaN for the
+    counters missing from the sample. The block IO counters are summed over the container's devices, like `docker
+    stats` does.
+
+    :param stats: The decoded stats sample
+    :return: The read time and the tuple of counters
+    :raises: ValueError, KeyError, TypeError - If the sample is malformed, ie: its read time is not a timestamp
+    """
+    cpu_stats = stats.get('cpu_stats') or {}
+    precpu_stats = stats.get('precpu_stats') or {}
+    memory_stats = stats.get('memory_stats') or {}
+    eth0 = (stats.get('networks') or {}).get('eth0') or {}
+    io_service_bytes = (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []
+    io = {}
+    for entry in io_service_bytes:
+        op = entry['op'].upper()
+        io[op] = io.get(op, 0) + entry['value']
+
+    cores = cpu_stats.get('online_cpus')
+    if cores is None and 'cpu_usage' in cpu_stats:
+        cores = len(cpu_stats['cpu_usage'].get('percpu_usage') or [])
+
+    read_time = parse_docker_timestamp(stats['read'])
+    values = (
+        read_time.timestamp(),
+        (cpu_stats.get('cpu_usage') or {}).get('total_usage'),
+        cpu_stats.get('system_cpu_usage'),
+        (precpu_stats.get('cpu_usage') or {}).get('total_usage'),
+        precpu_stats.get('system_cpu_usage'),
+        cores,
+        memory_stats.get('usage'),
+        memory_stats.get('limit'),
+        eth0.get('rx_bytes'),
+        eth0.get('tx_bytes'),
+        io.get('READ'),
+        io.get('WRITE'),
+    )
+    return read_time, tuple(NAN if value is None else float(value) for value in values)
+
+
+def present(value: float) -> bool:
+    return value == value  # NaN is the only value not equal to itself
+
+
+class MetricsEngine:
+    """
+    Computes the stats of all containers in batches. Every refresh, the raw counters of the samples received since
+    the previous refresh are gathered into typed arrays (one slot per container, NaN for missing counters). CPU% and
+    the per second rates are then computed column by column for the updated slots only, normalized by the actual
+    interval between two samples and optionally smoothed with an exponentially weighted moving average.
+
+    Containers whose stats did not change since the previous refresh cost a dict lookup, so the work per refresh
+    follows the number of new samples instead of the number of refreshes.
+    """
+
+    COUNTERS = ['time', 'cpu_total', 'cpu_system', 'precpu_total', 'precpu_system', 'cores', 'mem_usage',
+                'mem_limit', 'rx', 'tx', 'ior', 'iow']
+    RATES = ['cpu', 'rx', 'tx', 'ior', 'iow']
+    TYPE_CODE = 'd'
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, smoothing: float = 0.0):
+        """
+        :param smoothing: Time constant of the EWMA in seconds, 0 disables smoothing
+        """
+        self.smoothing = smoothing
+        self.__capacity = 0
+        self.__current: Dict[str, array] = {name: array(self.TYPE_CODE) for name in self.COUNTERS}
+        self.__previous: Dict[str, array] = {name: array(self.TYPE_CODE) for name in self.COUNTERS}
+        self.__smoothed: Dict[str, array] = {name: array(self.TYPE_CODE) for name in self.RATES}
+
+        # Container key -> slot in the arrays
+        self.__slots: Dict[str, int] = {}
+        self.__free_slots: List[int] = []
+        self.__streamers: List[Optional['StatsStreamer']] = []
+        self.__sample_keys: List = []
+        self.__read_times: List = []
+        self.__records: List[Tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.__slots)
+
+    def __grow(self) -> None:
+        grow_by = max(self.__capacity, self.INITIAL_CAPACITY)
+        for columns in (self.__current, self.__previous, self.__smoothed):
+            for column in columns.values():
+                column.extend(array(self.TYPE_CODE, [NAN]) * grow_by)
+        for values, default in ((self.__streamers, None), (self.__sample_keys, None), (self.__read_times, None),
+                                (self.__records, NO_STATS)):
+            values.extend([default] * grow_by)
+        self.__free_slots.extend(reversed(range(self.__capacity, self.__capacity + grow_by)))
+        self.__capacity += grow_by
+
+    def __reset_slot(self, slot: int, streamer: Optional['StatsStreamer']) -> None:
+        for columns in (self.__current, self.__previous, self.__smoothed):
+            for column in columns.values():
+                column[slot] = NAN
+        self.__streamers[slot] = streamer
+        self.__sample_keys[slot] = None
+        self.__read_times[slot] = None
+        self.__records[slot] = NO_STATS
+
+    def __get_slot(self, key: str, streamer: 'StatsStreamer') -> int:
+        slot = self.__slots.get(key)
+        if slot is None:
+            if not self.__free_slots:
+                self.__grow()
+            slot = self.__free_slots.pop()
+            self.__slots[key] = slot
+            self.__reset_slot(slot, streamer)
+        elif self.__streamers[slot] is not streamer:
+            # A new stream (ie: the container was restarted), the counters of the previous one are meaningless
+            self.__reset_slot(slot, streamer)
+        return slot
+
+    def __release_slot(self, key: str) -> None:
+        slot = self.__slots.pop(key)
+        self.__reset_slot(slot, None)
+        self.__free_slots.append(slot)
+
+    def update(self, streamers: Dict[str, 'StatsStreamer']) -> List[str]:
+        """
+        Gathers the samples received by the streamers since the last update and computes their stats. Containers
+        missing from `streamers` are forgotten.
+
+        :param streamers: Container key -> StatsStreamer of every streamed container, or any object with the `stats`
+                          and `history` of a container
+        :return: The keys of the containers with a new sample
+        """
+        for key in [key for key in self.__slots if key not in streamers]:
+            self.__release_slot(key)
+
+        current, previous = self.__current, self.__previous
+        updated_keys, updated_slots = [], []
+        for key, streamer in streamers.items():
+            stats = streamer.stats
+            sample_key = stats.get('read')
+            slot = self.__get_slot(key, streamer)
+            if sample_key is None or sample_key == self.__sample_keys[slot]:
+                continue
+
+            self.__sample_keys[slot] = sample_key
+            try:
+                read_time, counters = extract_counters(stats)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # Only this sample is skipped, the container keeps its last stats
+                logging.debug(f"MetricsEngine - Skipping a malformed sample of {key} ({e})")
+                continue
+            self.__read_times[slot] = read_time
+            for name, value in zip(self.COUNTERS, counters):
+                previous[name][slot] = current[name][slot]
+                current[name][slot] = value
+            updated_keys.append(key)
+            updated_slots.append(slot)
+
+        if updated_slots:
+            self.__compute(updated_slots)
+            for slot in updated_slots:
+                self.__record_history(slot)
+        return updated_keys
+
+    def __record_history(self, slot: int) -> None:
+        self.__streamers[slot].history.append(self.__sample_keys[slot], **self.__get_metric_values(slot))
+
+    def __get_metric_values(self, slot: int) -> Dict[str, Optional[float]]:
+        cpu_stats, memory_stats, net_io, disk_io = self.__records[slot]
+        return {
+            'cpu': cpu_stats.usage if cpu_stats else None,
+            'mem': memory_stats.usage if memory_stats else None,
+            'rx': net_io.rx_rate if net_io else None,
+            'tx': net_io.tx_rate if net_io else None,
+            'ior': disk_io.ior_rate if disk_io else None,
+            'iow': disk_io.iow_rate if disk_io else None,
+        }
+
+    def __compute(self, slots: List[int]) -> None:
+        """
+        Computes the stats of the given slots column by column and stores the resulting records
+        """
+        current, previous = self.__current, self.__previous
+        time, previous_time = current['time'], previous['time']
+        intervals = [time[i] - previous_time[i] for i in slots]
+
+        def deltas(name: str) -> List[float]:
+            # A counter going backwards was reset, so there is no delta
+            column, previous_column = current[name], previous[name]
+            return [column[i] - previous_column[i] if column[i] >= previous_column[i] else NAN for i in slots]
+
+        def rates(values: List[float]) -> List[float]:
+            return [value / interval if interval > 0 else NAN for value, interval in zip(values, intervals)]
+
+        # CPU usage % = cpu_delta / system_cpu_delta * number_of_cpus * 100, from the sample's own `precpu_stats`
+        # when present, else from the previous sample
+        cpu_total, cpu_system = current['cpu_total'], current['cpu_system']
+        precpu_total, precpu_system = current['precpu_total'], current['precpu_system']
+        previous_total, previous_system = previous['cpu_total'], previous['cpu_system']
+        cores = current['cores']
+        cpu = []
+        for i in slots:
+            pre_total, pre_system = (precpu_total[i], precpu_system[i]) if present(precpu_total[i]) else \
+                (previous_total[i], previous_system[i])
+            system_delta = cpu_system[i] - pre_system
+            if not present(system_delta) or not present(cpu_total[i] - pre_total):
+                cpu.append(NAN)
+            else:
+                cpu.append((cpu_total[i] - pre_total) / system_delta * cores[i] * 100 if system_delta > 0 else 0.0)
+
+        delta_columns = {name: deltas(name) for name in ('rx', 'tx', 'ior', 'iow')}
+        values = {'cpu': cpu} | {name: rates(column) for name, column in delta_columns.items()}
+        if self.smoothing > 0:
+            alphas = [1 - math.exp(-interval / self.smoothing) if interval > 0 else NAN for interval in intervals]
+            for name in self.RATES:
+                values[name] = self.__smooth(self.__smoothed[name], slots, values[name], alphas)
+
+        mem_usage, mem_limit = current['mem_usage'], current['mem_limit']
+        for n, i in enumerate(slots):
+            interval = timedelta(seconds=intervals[n]) if intervals[n] > 0 else None
+            self.__records[i] = (
+                CPUSnapshot(usage=values['cpu'][n], cores=int(cores[i])) if present(values['cpu'][n]) else None,
+                MemorySnapshot(usage=int(mem_usage[i]), limit=int(mem_limit[i]))
+                if present(mem_usage[i]) and present(mem_limit[i]) else None,
+                NetIOSnapshot(total_rx=int(current['rx'][i]), total_tx=int(current['tx'][i]),
+                              read_time=self.__read_times[i], duration=interval,
+                              rx=self.__optional_int(delta_columns['rx'][n]),
+                              tx=self.__optional_int(delta_columns['tx'][n]),
+                              rx_rate=self.__optional(values['rx'][n]), tx_rate=self.__optional(values['tx'][n]))
+                if present(current['rx'][i]) and present(current['tx'][i]) else None,
+                DiskIOSnapshot(total_ior=int(current['ior'][i]), total_iow=int(current['iow'][i]),
+                               read_time=self.__read_times[i], duration=interval,
+                               ior=self.__optional_int(delta_columns['ior'][n]),
+                               iow=self.__optional_int(delta_columns['iow'][n]),
+                               ior_rate=self.__optional(values['ior'][n]), iow_rate=self.__optional(values['iow'][n]))
+                if present(current['ior'][i]) and present(current['iow'][i]) else None,
+            )
+
+    @staticmethod
+    def __smooth(smoothed: array, slots: List[int], values: List[float], alphas: List[float]) -> List[float]:
+        """
+        Applies the EWMA in place: s = s + alpha * (value - s), starting from the first value
+        """
+        result = []
+        for i, value, alpha in zip(slots, values, alphas):
+            last = smoothed[i]
+            if present(value) and present(last) and present(alpha):
+                value = last + alpha * (value - last)
+            smoothed[i] = value
+            result.append(value)
+        return result
+
+    @staticmethod
+    def __optional(value: float) -> Optional[float]:
+        return value if present(value) else None
+
+    @staticmethod
+    def __optional_int(value: float) -> Optional[int]:
+        return int(value) if present(value) else None
+
+    def get_metric_values(self, key: str) -> Dict[str, Optional[float]]:
+        """
+        Returns the values of the last sample of the container recorded in its history, by MetricsHistory metric
+        """
+        slot = self.__slots.get(key)
+        return {} if slot is None else self.__get_metric_values(slot)
+
+    def get_read_time(self, key: str) -> Optional[datetime]:
+        """
+        Returns the read time of the last sample of the container, None if it has none
+        """
+        slot = self.__slots.get(key)
+        return None if slot is None else self.__read_times[slot]
+
+    def get_stats(self, key: str) -> Tuple[Optional[CPUSnapshot], Optional[MemorySnapshot], Optional[NetIOSnapshot],
+                                           Optional[DiskIOSnapshot]]:
+        """
+        Returns the CPU, memory, network IO and disk IO stats computed from the last sample of the container.
+
+        :param key: The container key
+        :return: A tuple of the four stats, None where unavailable
+        """
+        slot = self.__slots.get(key)
+        return NO_STATS if slot is None else self.__records[slot]
@@ -0,0 +1,254 @@
+import copy
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from cDock.config import Config
+from cDock.docker_client.container_actions import CONTAINER_ACTIONS, ActionBatch
+from cDock.docker_client.daemon_hosts import merge_versions, parse_docker_hosts
+from cDock.docker_client.docker_daemon_client import DockerDaemonClient
+from cDock.history_store import HistoryStore
+from cDock.snapshot import ContainerSnapshot, Snapshot
+
+
+class MultiDaemonClient:
+    """
+    Shows the containers of several Docker daemons as one. Every host has its own DockerDaemonClient, and all hosts
+    are collected concurrently on every refresh. A refresh waits at most `docker_hosts_timeout` seconds: hosts which
+    did not answer in time keep their last collected containers, and are not asked again until their pending
+    collection finishes, so one slow or unreachable host does not stall the others.
+
+    Has the same interface as DockerDaemonClient. Container views are tagged with their host name and container
+    actions are routed to the host of the container.
+    """
+
+    HOST_STATUS_UP = 'up'
+    HOST_STATUS_STALE = 'stale'
+    HOST_STATUS_DOWN = 'down'
+
+    def __init__(self, config: Config):
+        self.__config = config
+        # All hosts store their samples in the same database
+        self.__history_store: Optional[HistoryStore] = None
+        if config.history_db_path:
+            self.__history_store = HistoryStore(config.history_db_path, config.history_db_flush_interval,
+                                                config.history_db_raw_retention, config.history_db_minute_retention,
+                                                config.history_db_hour_retention)
+        self.__clients: Dict[str, DockerDaemonClient] = {}
+        for name, url in parse_docker_hosts(config.docker_hosts).items():
+            host_config = copy.copy(config)
+            host_config.docker_socket_url = url
+            # A recording holds a single daemon
+            host_config.record_file = host_config.replay_file = None
+            self.__clients[name] = DockerDaemonClient(host_config, name, self.__history_store)
+        if config.record_file or config.replay_file:
+            logging.warning("MultiDaemonClient - Recording and replay are not supported with several hosts")
+
+        self.__executor = ThreadPoolExecutor(max(len(self.__clients), 1), thread_name_prefix='cDock-collector')
+        self.__connected: Dict[str, bool] = {name: False for name in self.__clients}
+        # The unfinished connection (from `connect`) or collection of every host
+        self.__pending: Dict[str, Future] = {}
+        self.__host_stats: Dict[str, Dict] = {}
+        self.host_status: Dict[str, str] = {name: self.HOST_STATUS_DOWN for name in self.__clients}
+
+        # Container ID -> name of its host, to route container actions
+        self.__container_hosts: Dict[str, str] = {}
+        self.__snapshot: Optional[Snapshot] = None
+
+    def get_host_names(self) -> List[str]:
+        return list(self.__clients.keys())
+
+    def __connect_host(self, name: str) -> bool:
+        if not self.__connected[name]:
+            self.__connected[name] = self.__clients[name].connect()
+        return self.__connected[name]
+
+    def __collect(self, name: str) -> Dict:
+        """
+        Collects the version and container views of a host, connecting first if required
+        """
+        if not self.__connect_host(name):
+            return {}
+        return self.__clients[name].get_version_and_container_views()
+
+    def __get_client(self, container_key: str) -> DockerDaemonClient:
+        if container_key not in self.__container_hosts:
+            raise Exception('Unknown container!')
+        return self.__clients[self.__container_hosts[container_key]]
+
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Registers the callback on every host, see `DockerDaemonClient.add_change_listener`
+        """
+        for client in self.__clients.values():
+            client.add_change_listener(listener)
+
+    def connect(self) -> bool:
+        """
+        Connects to all hosts concurrently. Hosts which could not be reached are retried on every refresh.
+
+        :return: True if at least one host could be reached
+        """
+        if not self.__clients:
+            logging.error("MultiDaemonClient - No hosts configured")
+            return False
+
+        futures = {name: self.__executor.submit(self.__connect_host, name) for name in self.__clients}
+        wait(futures.values(), timeout=self.__config.docker_hosts_timeout)
+        self.__pending = {name: future for name, future in futures.items() if not future.done()}
+        return any(future.done() and future.result() for future in futures.values())
+
+    def disconnect(self):
+        for name, client in self.__clients.items():
+            if self.__connected[name]:
+                client.disconnect()
+                self.__connected[name] = False
+        self.__executor.shutdown(wait=False)
+        if self.__history_store:
+            self.__history_store.close()
+
+    def get_version_and_container_views(self) -> Optional[Dict]:
+        """
+        Returns a dict with the merged `version` and `container_views` of all hosts, see
+        `DockerDaemonClient.get_version_and_container_views`. `container_views` is not included if no host was ever
+        collected. The version holds the version of every host under `Hosts`.
+
+        :return: A dict containing version and a list of ContainerSnapshot
+        """
+        for name in self.__clients:
+            if name not in self.__pending:
+                self.__pending[name] = self.__executor.submit(self.__collect, name)
+        wait(self.__pending.values(), timeout=self.__config.docker_hosts_timeout)
+
+        for name, future in list(self.__pending.items()):
+            if not future.done():
+                self.host_status[name] = self.HOST_STATUS_STALE if name in self.__host_stats else self.HOST_STATUS_DOWN
+                continue
+            self.__pending.pop(name)
+            try:
+                stats = future.result()
+            except Exception as e:
+                logging.error(f"MultiDaemonClient - Failed to collect {name} ({e})")
+                stats = {}
+            if not isinstance(stats, dict):
+                # A connection which outlasted `connect`, the host is collected on the next refresh
+                continue
+            if 'container_views' in stats:
+                self.__host_stats[name] = stats
+                self.host_status[name] = self.HOST_STATUS_UP
+            else:
+                self.host_status[name] = self.HOST_STATUS_STALE if name in self.__host_stats else self.HOST_STATUS_DOWN
+
+        if not self.__host_stats:
+            return {}
+
+        versions = {name: self.__host_stats[name]['version'] for name in self.__clients if name in self.__host_stats}
+        views: List[ContainerSnapshot] = []
+        container_hosts = {}
+        for name in self.__clients:
+            for view in self.__host_stats.get(name, {}).get('container_views', []):
+                views.append(view)
+                container_hosts[view.id] = name
+        self.__container_hosts = container_hosts
+
+        snapshot = Snapshot(merge_versions(versions), views)
+        self.__snapshot = snapshot
+        return {'version': snapshot.version, 'container_views': list(snapshot.container_views)}
+
+    def set_visible_containers(self, container_keys: Optional[Iterable[str]]) -> None:
+        """
+        Passes the visible containers to every host, see `DockerDaemonClient.set_visible_containers`
+        """
+        container_keys = None if container_keys is None else set(container_keys)
+        for client in self.__clients.values():
+            client.set_visible_containers(container_keys)
+
+    def get_sampling_modes(self) -> Dict[str, str]:
+        """
+        Returns the sampling mode of every container of every host, see `DockerDaemonClient.get_sampling_modes`
+        """
+        modes = {}
+        for client in self.__clients.values():
+            modes |= client.get_sampling_modes()
+        return modes
+
+    def get_sample_ages(self) -> Dict[str, Optional[float]]:
+        """
+        Returns the age of the last sample of every streamed container of every host, see
+        `DockerDaemonClient.get_sample_ages`
+        """
+        ages = {}
+        for client in self.__clients.values():
+            ages |= client.get_sample_ages()
+        return ages
+
+    def get_snapshot(self) -> Optional[Snapshot]:
+        """
+        Returns the merged Snapshot of the last refresh, see `DockerDaemonClient.get_snapshot`
+        """
+        return self.__snapshot
+
+    def query_history(self, container_key: str, metric: str, start: float, end: Optional[float] = None,
+                      resolution: Optional[str] = None) -> List[Tuple[float, float, float, float]]:
+        """
+        Returns the stored values of a metric of the container, see `DockerDaemonClient.query_history`
+        """
+        return self.__get_client(container_key).query_history(container_key, metric, start, end, resolution)
+
+    def has_history_store(self) -> bool:
+        return self.__history_store is not None
+
+    def get_pool_stats(self) -> Dict[str, Dict]:
+        """
+        Returns the connection pool usage of every connected host, see `DockerDaemonClient.get_pool_stats`
+        """
+        return {name: client.get_pool_stats() for name, client in self.__clients.items() if self.__connected[name]}
+
+    def run_actions(self, action_name: str, container_keys: Iterable[str]) -> ActionBatch:
+        """
+        Routes the action of every container to its host, and tracks them all in one batch, see
+        `DockerDaemonClient.run_actions`
+        """
+        if action_name not in CONTAINER_ACTIONS:
+            raise Exception('Unknown action_executor!')
+        container_keys = list(container_keys)
+        batch = ActionBatch(action_name, len(container_keys))
+        host_keys: Dict[str, List[str]] = {}
+        for container_key in container_keys:
+            if container_key in self.__container_hosts:
+                host_keys.setdefault(self.__container_hosts[container_key], []).append(container_key)
+            else:
+                batch.failed(container_key, 'Unknown container!')
+        for name, keys in host_keys.items():
+            self.__clients[name].run_actions(action_name, keys, batch)
+        return batch
+
+    def start(self, container_key: str) -> ActionBatch:
+        return self.__get_client(container_key).start(container_key)
+
+    def restart(self, container_key: str) -> ActionBatch:
+        return self.__get_client(container_key).restart(container_key)
+
+    def pause(self, container_key: str) -> ActionBatch:
+        return self.__get_client(container_key).pause(container_key)
+
+    def resume(self, container_key: str) -> ActionBatch:
+        return self.__get_client(container_key).resume(container_key)
+
+    def stop(self, container_key: str) -> ActionBatch:
+        return self.__get_client(container_key).stop(container_key)
+
+    def kill(self, container_key: str) -> ActionBatch:
+        return self.__get_client(container_key).kill(container_key)
+
+    def logs(self, container_key: str):
+        return self.__get_client(container_key).logs(container_key)
+
+
+def create_client(config: Config) -> Union[DockerDaemonClient, MultiDaemonClient]:
+    """
+    Returns a MultiDaemonClient if several hosts are configured with `docker_hosts`, else a DockerDaemonClient
+    """
+    if config.docker_hosts:
+        return MultiDaemonClient(config)
+    return DockerDaemonClient(config)
@@ -0,0 +1,155 @@
+import copy
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from docker.errors import NotFound
+
+from cDock.config import Config
+from cDock.docker_client.connection_pools import create_docker_client
+from cDock.docker_client.daemon_hosts import create_tls_config, merge_versions, parse_docker_hosts
+from cDock.docker_client.metrics_engine import MetricsEngine
+from cDock.metrics_history import MetricsHistory
+from cDock.snapshot import ContainerSnapshot, Snapshot
+
+# The states in which containers have stats, as DockerDaemonClient.STREAMING_STATUS, which is not imported so the
+# collector does not load the streaming machinery
+SAMPLED_STATUS = ('running', 'paused')
+
+
+class OneShotSample:
+    """
+    Holds the single stats sample of a container, in the shape MetricsEngine reads from streamers
+    """
+    __slots__ = ('stats', 'history')
+
+    def __init__(self, stats: Dict):
+        self.stats = stats
+        self.history = MetricsHistory(1)
+
+
+class OneShotCollector:
+    """
+    Takes a single Snapshot of a daemon without streaming: the containers are listed once, then the stats of all
+    running and paused containers are requested at once (`stream=False`) on a bounded pool of threads, each with its
+    own connection to the daemon. The daemon takes a sample, waits for the next one to compute the CPU usage and
+    answers, so with enough workers the whole collection takes about one stats interval whatever the number of
+    containers.
+
+    Only uses the container list for the container details, no container or image is inspected.
+    """
+
+    def __init__(self, config: Config, host_name: Optional[str] = None):
+        """
+        :param config: The Config, `once_workers` bounds the concurrent stats requests
+        :param host_name: Tags the container views, when several daemons are collected together
+        """
+        self.__config = config
+        self.host_name = host_name
+
+    def __get_stats(self, api, container_id: str) -> Optional[Dict]:
+        try:
+            return api.stats(container_id, stream=False)
+        except NotFound:
+            # Removed since it was listed
+            return None
+        except Exception as e:
+            logging.warning(f"OneShotCollector - Failed to get the stats of {container_id[:12]} ({e})")
+            return None
+
+    def __generate_container_view(self, summary: Dict) -> ContainerSnapshot:
+        """
+        Generates a ContainerSnapshot from an entry of the container list, without stats
+        """
+        names = summary.get('Names') or ['']
+        ports = (f"{port['PrivatePort']}/{port.get('Type', 'tcp')}" for port in summary.get('Ports') or [])
+        created = summary.get('Created')
+        return ContainerSnapshot(
+            name=names[0].lstrip('/'),
+            id=summary['Id'],
+            status=summary.get('State', ''),
+            image=summary.get('Image', ''),
+            created_at=datetime.fromtimestamp(created, timezone.utc) if created is not None else None,
+            published_ports=list(dict.fromkeys(ports)),
+            command=(summary.get('Command') or '').split(),
+            host=self.host_name,
+        )
+
+    def collect(self) -> Snapshot:
+        """
+        Collects the version, the containers and their stats
+
+        :return: A Snapshot of all containers
+        :raises Exception - If the daemon could not be reached or listed
+        """
+        config = self.__config
+        base_url = config.docker_socket_url
+        client = create_docker_client(base_url, create_tls_config(config, base_url), config.once_workers,
+                                      timeout=config.once_timeout)
+        try:
+            api = client.api
+            with ThreadPoolExecutor(config.once_workers, thread_name_prefix='cDock-once') as executor:
+                version = executor.submit(api.version)
+                summaries = api.containers(all=config.client_list_all_containers)
+                sampled = [s['Id'] for s in summaries if s.get('State') in SAMPLED_STATUS]
+                stats = dict(zip(sampled, executor.map(lambda container_id: self.__get_stats(api, container_id),
+                                                       sampled)))
+                version = version.result()
+        finally:
+            client.close()
+
+        samples = {key: OneShotSample(sample) for key, sample in stats.items() if sample}
+        engine = MetricsEngine()
+        engine.update(samples)
+        views = []
+        for summary in summaries:
+            view = self.__generate_container_view(summary)
+            if view.id in samples:
+                view.cpu_stats, view.memory_stats, view.net_io_stats, view.disk_io_stats = engine.get_stats(view.id)
+            views.append(view)
+        return Snapshot(version, views)
+
+
+def collect_snapshot(config: Config) -> Tuple[Optional[Snapshot], Dict[str, str]]:
+    """
+    Takes a single Snapshot of the daemon, or of every host of `docker_hosts` concurrently, see OneShotCollector. The
+    containers of several hosts are tagged with their host name and the version holds the version of every host
+    under `Hosts`, like MultiDaemonClient.
+
+    :param config: The Config
+    :return: The Snapshot, None if no daemon could be collected, and the error of every host which failed
+    """
+    if config.replay_file:
+        logging.error("OneShotCollector - Recordings can not be replayed in one-shot mode")
+        return None, {'replay': 'Recordings can not be replayed in one-shot mode'}
+
+    collectors = {}
+    if config.docker_hosts:
+        for name, url in parse_docker_hosts(config.docker_hosts).items():
+            host_config = copy.copy(config)
+            host_config.docker_socket_url = url
+            collectors[name] = OneShotCollector(host_config, name)
+    else:
+        collectors[config.docker_socket_url] = OneShotCollector(config)
+
+    started_at = time.monotonic()
+    snapshots, errors = {}, {}
+    with ThreadPoolExecutor(len(collectors) or 1, thread_name_prefix='cDock-collector') as executor:
+        futures = {name: executor.submit(collector.collect) for name, collector in collectors.items()}
+        for name, future in futures.items():
+            try:
+                snapshots[name] = future.result()
+            except Exception as e:
+                logging.error(f"OneShotCollector - Failed to collect {name} ({e})")
+                errors[name] = str(e)
+    logging.debug(f"OneShotCollector - Collected {len(snapshots)} host(s) in {time.monotonic() - started_at:.2f}s")
+
+    if not snapshots:
+        return None, errors
+    if not config.docker_hosts:
+        return next(iter(snapshots.values())), errors
+    versions = {name: snapshot.version for name, snapshot in snapshots.items()}
+    views = [view for snapshot in snapshots.values() for view in snapshot.container_views]
+    return Snapshot(merge_versions(versions), views), errors
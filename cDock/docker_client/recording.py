@@ -0,0 +1,321 @@
+import bisect
+import json
+import logging
+import struct
+import time
+import zlib
+from calendar import timegm
+from datetime import datetime
+from threading import Event, Lock
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from docker.errors import ImageNotFound, NotFound
+from docker.models.containers import Container
+
+MAGIC = b'CDOCKREC'
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct('<8sH')
+# timestamp, record kind, key length, payload length
+RECORD_HEADER = struct.Struct('<dBHI')
+
+KIND_VERSION = 1
+KIND_CONTAINER_LIST = 2
+KIND_STATS = 3
+
+# Fixed schema of a stats record: read time, presence flags, cpu total/system, precpu total/system, online cpus,
+# memory usage/limit, network rx/tx and block IO read/write
+STATS_RECORD = struct.Struct('<dHQQQQHQQQQQQ')
+HAS_CPU, HAS_PRECPU, HAS_MEMORY, HAS_NETWORK, HAS_BLKIO = (1 << i for i in range(5))
+
+
+def encode_stats(stats: Dict) -> bytes:
+    """
+    Packs the fields of a Docker API stats sample used by cDock into a fixed-size record
+    """
+    flags, values = 0, [0] * 11
+    try:
+        read = timegm(datetime.fromisoformat(stats['read'][:19]).timetuple()) + float('0.' + (
+            stats['read'][20:].rstrip('Z') or '0'))
+    except (KeyError, ValueError):
+        read = 0.0
+
+    try:
+        values[0] = stats['cpu_stats']['cpu_usage']['total_usage']
+        values[1] = stats['cpu_stats']['system_cpu_usage']
+        values[4] = stats['cpu_stats'].get('online_cpus') or len(stats['cpu_stats']['cpu_usage'].get(
+            'percpu_usage') or [])
+        flags |= HAS_CPU
+        values[2] = stats['precpu_stats']['cpu_usage']['total_usage']
+        values[3] = stats['precpu_stats']['system_cpu_usage']
+        flags |= HAS_PRECPU
+    except (KeyError, TypeError):
+        pass
+
+    try:
+        values[5], values[6] = stats['memory_stats']['usage'], stats['memory_stats']['limit']
+        flags |= HAS_MEMORY
+    except (KeyError, TypeError):
+        pass
+
+    try:
+        values[7], values[8] = stats['networks']['eth0']['rx_bytes'], stats['networks']['eth0']['tx_bytes']
+        flags |= HAS_NETWORK
+    except (KeyError, TypeError):
+        pass
+
+    try:
+        io_service_bytes_recursive = stats['blkio_stats']['io_service_bytes_recursive']
+        values[9] = [i for i in io_service_bytes_recursive if i['op'].upper() == 'READ'][0]['value']
+        values[10] = [i for i in io_service_bytes_recursive if i['op'].upper() == 'WRITE'][0]['value']
+        flags |= HAS_BLKIO
+    except (KeyError, TypeError, IndexError):
+        pass
+
+    return STATS_RECORD.pack(read, flags, *values)
+
+
+def decode_stats(payload: bytes) -> Dict:
+    """
+    Unpacks a stats record into a Docker API stats sample
+    """
+    read, flags, cpu_total, cpu_system, precpu_total, precpu_system, online_cpus, memory_usage, memory_limit, rx, tx, \
+        ior, iow = STATS_RECORD.unpack(payload)
+
+    stats = {'read': datetime.utcfromtimestamp(read).isoformat() + 'Z', 'cpu_stats': {}, 'precpu_stats': {}}
+    if flags & HAS_CPU:
+        stats['cpu_stats'] = {'cpu_usage': {'total_usage': cpu_total}, 'system_cpu_usage': cpu_system,
+                              'online_cpus': online_cpus}
+    if flags & HAS_PRECPU:
+        stats['precpu_stats'] = {'cpu_usage': {'total_usage': precpu_total}, 'system_cpu_usage': precpu_system}
+    if flags & HAS_MEMORY:
+        stats['memory_stats'] = {'usage': memory_usage, 'limit': memory_limit}
+    if flags & HAS_NETWORK:
+        stats['networks'] = {'eth0': {'rx_bytes': rx, 'tx_bytes': tx}}
+    if flags & HAS_BLKIO:
+        stats['blkio_stats'] = {'io_service_bytes_recursive': [{'op': 'Read', 'value': ior},
+                                                               {'op': 'Write', 'value': iow}]}
+    return stats
+
+
+class StreamRecorder:
+    """
+    Appends the daemon version, container lists and stats samples received by cDock to a compact binary file. Every
+    record has a fixed-size header with its timestamp, stats samples have a fixed-size payload as well.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__file: BinaryIO = open(path, 'ab')
+        self.__lock = Lock()
+        if self.__file.tell() == 0:
+            self.__file.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+
+        # To only record the container list and version when they changed
+        self.__last_container_list_key = None
+        self.__last_version = None
+
+    def __write(self, kind: int, key: str, payload: bytes) -> None:
+        key = key.encode()
+        with self.__lock:
+            if self.__file.closed:
+                return
+            self.__file.write(RECORD_HEADER.pack(time.time(), kind, len(key), len(payload)) + key + payload)
+
+    def record_version(self, version: Dict) -> None:
+        if version != self.__last_version:
+            self.__last_version = version
+            self.__write(KIND_VERSION, '', json.dumps(version).encode())
+
+    def record_container_list(self, containers: List[Container]) -> None:
+        key = [(c.id, c.attrs.get('State', {}).get('Status'), c.attrs.get('Name')) for c in containers]
+        if key != self.__last_container_list_key:
+            self.__last_container_list_key = key
+            self.__write(KIND_CONTAINER_LIST, '', zlib.compress(json.dumps([c.attrs for c in containers]).encode()))
+
+    def record_stats(self, container_id: str, stats: Dict) -> None:
+        self.__write(KIND_STATS, container_id, encode_stats(stats))
+
+    def flush(self) -> None:
+        with self.__lock:
+            self.__file.flush()
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
+
+
+def read_records(path: str) -> Iterator[Tuple[float, int, str, bytes]]:
+    """
+    Yields the (timestamp, kind, key, payload) of every record of a recording, stopping at a truncated record
+
+    :raises: ValueError - If the file is not a recording
+    """
+    with open(path, 'rb') as f:
+        magic, version = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a cDock recording")
+
+        while len(header := f.read(RECORD_HEADER.size)) == RECORD_HEADER.size:
+            timestamp, kind, key_length, payload_length = RECORD_HEADER.unpack(header)
+            key, payload = f.read(key_length), f.read(payload_length)
+            if len(payload) < payload_length:
+                logging.warning(f"read_records - Truncated record at the end of {path}")
+                return
+            yield timestamp, kind, key.decode(), payload
+
+
+class ReplayClock:
+    """
+    Maps wall-clock time to the time of a recording, starting at the recording's first record
+    """
+
+    def __init__(self, start: float, speed: float = 1.0):
+        self.start = start
+        self.speed = speed if speed > 0 else 1.0
+        self.__started = time.monotonic()
+
+    def now(self) -> float:
+        return self.start + (time.monotonic() - self.__started) * self.speed
+
+    def sleep_until(self, timestamp: float, stop: Event) -> bool:
+        """
+        Sleeps until the replayed time reaches `timestamp`
+
+        :return: False if `stop` was set while sleeping
+        """
+        return not stop.wait(max((timestamp - self.now()) / self.speed, 0))
+
+
+class ReplayAPIClient:
+    def __init__(self, replay: 'ReplayDockerClient'):
+        self.__replay = replay
+
+    def stats(self, container: str, decode: bool = None, stream: bool = True, **kwargs):
+        if stream:
+            return self.__replay.stream_stats(container)
+        return self.__replay.get_stats(container)
+
+
+class ReplayContainerCollection:
+    def __init__(self, replay: 'ReplayDockerClient'):
+        self.__replay = replay
+
+    def list(self, all: bool = False, **kwargs) -> List[Container]:
+        containers = [Container(attrs=attrs, client=self.__replay, collection=self)
+                      for attrs in self.__replay.get_container_attrs()]
+        if not all:
+            containers = [c for c in containers if c.status in ('running', 'paused', 'restarting')]
+        return containers
+
+    def get(self, container_id: str) -> Container:
+        for attrs in self.__replay.get_container_attrs():
+            if attrs['Id'] == container_id:
+                return Container(attrs=attrs, client=self.__replay, collection=self)
+        raise NotFound(f"No such container: {container_id}")
+
+
+class ReplayImage:
+    def __init__(self, tags: List[str]):
+        self.tags = tags
+
+
+class ReplayImageCollection:
+    def __init__(self, replay: 'ReplayDockerClient'):
+        self.__replay = replay
+
+    def get(self, image_id: str) -> ReplayImage:
+        for attrs in self.__replay.get_container_attrs():
+            if attrs.get('Image', '').endswith(image_id):
+                return ReplayImage([attrs['Config']['Image']] if attrs.get('Config', {}).get('Image') else [])
+        raise ImageNotFound(f"No such image: {image_id}")
+
+
+class ReplayEventStream:
+    """
+    A stream without events, as the replayed container lists are complete. Blocks until closed.
+    """
+
+    def __init__(self):
+        self.__closed = Event()
+
+    def __iter__(self):
+        self.__closed.wait()
+        return iter(())
+
+    def close(self):
+        self.__closed.set()
+
+
+class ReplayDockerClient:
+    """
+    Replays a recording through the subset of the DockerClient interface used by cDock, so the same code paths run
+    without a daemon. Container lists and stats samples are served as per the recording's timing, scaled by `speed`.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        # Timestamps and records are kept in separate lists, the timestamps are bisected
+        self.__versions: Tuple[List[float], List[Dict]] = ([], [])
+        self.__container_lists: Tuple[List[float], List[bytes]] = ([], [])
+        self.__stats: Dict[str, Tuple[List[float], List[bytes]]] = {}
+        self.__closed = Event()
+
+        for timestamp, kind, key, payload in read_records(path):
+            if kind == KIND_VERSION:
+                records, payload = self.__versions, json.loads(payload)
+            elif kind == KIND_CONTAINER_LIST:
+                records = self.__container_lists
+            elif kind == KIND_STATS:
+                records = self.__stats.setdefault(key, ([], []))
+            else:
+                continue
+            records[0].append(timestamp)
+            records[1].append(payload)
+
+        timestamps = [records[0][0] for records in [self.__versions, self.__container_lists, *self.__stats.values()]
+                      if records[0]]
+        self.clock = ReplayClock(min(timestamps, default=time.time()), speed)
+        self.__decoded_list: Tuple[Optional[int], List[Dict]] = (None, [])
+
+        self.api = ReplayAPIClient(self)
+        self.containers = ReplayContainerCollection(self)
+        self.images = ReplayImageCollection(self)
+
+    def __latest(self, timestamps: List[float]) -> Optional[int]:
+        """
+        Returns the index of the latest record at the current replay time, the first record before the recording starts
+        """
+        if not timestamps:
+            return None
+        return max(bisect.bisect_right(timestamps, self.clock.now()) - 1, 0)
+
+    def version(self) -> Dict:
+        index = self.__latest(self.__versions[0])
+        return self.__versions[1][index] if index is not None else {}
+
+    def get_container_attrs(self) -> List[Dict]:
+        index = self.__latest(self.__container_lists[0])
+        if index is None:
+            return []
+        if self.__decoded_list[0] != index:
+            self.__decoded_list = (index, json.loads(zlib.decompress(self.__container_lists[1][index])))
+        return self.__decoded_list[1]
+
+    def stream_stats(self, container_id: str) -> Iterator[Dict]:
+        timestamps, payloads = self.__stats.get(container_id, ([], []))
+        # Starting with the latest sample at the current replay time
+        for index in range(max(bisect.bisect_right(timestamps, self.clock.now()) - 1, 0), len(timestamps)):
+            if not self.clock.sleep_until(timestamps[index], self.__closed):
+                return
+            yield decode_stats(payloads[index])
+
+    def get_stats(self, container_id: str) -> Dict:
+        timestamps, payloads = self.__stats.get(container_id, ([], []))
+        index = self.__latest(timestamps)
+        return decode_stats(payloads[index]) if index is not None else {}
+
+    def events(self, **kwargs) -> ReplayEventStream:
+        return ReplayEventStream()
+
+    def close(self) -> None:
+        self.__closed.set()
@@ -0,0 +1,62 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+from cDock.docker_client.stats_streamer import StatsStreamer
+
+
+class StatsPoller:
+    """
+    Samples the stats of containers which are not streamed with one-shot requests (`StatsStreamer.poll_stats`), every
+    `interval` seconds, on a bounded pool of threads. Polls are scheduled by `poll` on every refresh, so no thread
+    waits between polls, and a container is not polled again before its previous poll finished.
+    """
+
+    def __init__(self, interval: float, workers: int):
+        """
+        :param interval: Seconds between two polls of a container
+        :param workers: Maximum number of polls in progress at once
+        """
+        self.interval = interval
+        self.__executor = ThreadPoolExecutor(max(workers, 1), thread_name_prefix='cDock-poller')
+        # Container key -> time of its last poll, and its poll in progress
+        self.__last_polls: Dict[str, float] = {}
+        self.__pending: Dict[str, Future] = {}
+
+    def __poll(self, key: str, streamer: StatsStreamer) -> None:
+        try:
+            streamer.poll_stats()
+        except Exception as e:
+            logging.debug(f"StatsPoller - Failed to poll stats for {key} ({e})")
+
+    def poll(self, streamers: Dict[str, StatsStreamer]) -> List[str]:
+        """
+        Schedules a poll of the containers which are due. Containers new to the poller (ie: demoted from streaming)
+        are polled right away, as the first sample of a stream carries no CPU usage, then every `interval` seconds.
+        Containers missing from `streamers` are forgotten.
+
+        :param streamers: Container key -> StatsStreamer of every polled container
+        :return: The keys of the containers for which a poll was scheduled
+        """
+        for key in [key for key in self.__last_polls if key not in streamers]:
+            self.__last_polls.pop(key)
+            self.__pending.pop(key, None)
+
+        now = time.monotonic()
+        scheduled = []
+        for key, streamer in streamers.items():
+            if key in self.__pending and not self.__pending[key].done():
+                continue
+            if key in self.__last_polls and now - self.__last_polls[key] < self.interval:
+                continue
+            self.__last_polls[key] = now
+            self.__pending[key] = self.__executor.submit(self.__poll, key, streamer)
+            scheduled.append(key)
+        return scheduled
+
+    def close(self) -> None:
+        """
+        Drops the scheduled polls, the ones in progress are left to finish in the background
+        """
+        self.__executor.shutdown(wait=False, cancel_futures=True)
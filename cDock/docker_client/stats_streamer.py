@@ -1,152 +1,101 @@
-import logging
-from datetime import datetime
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Tuple
 
+from docker import APIClient
 from docker.models.containers import Container
+from docker.types import CancellableStream
 
 from cDock.docker_client.info_streamer import InfoStreamer
-from cDock.models import DiskIOStats, NetIOStats, MemoryStats, CPUStats
+from cDock.docker_client.metrics_engine import MetricsEngine
+from cDock.docker_client.recording import StreamRecorder
+from cDock.metrics_history import DEFAULT_HISTORY_SIZE, MetricsHistory
+from cDock.snapshot import CPUSnapshot, DiskIOSnapshot, MemorySnapshot, NetIOSnapshot
 
 SHA_256_HASH_PICK = 12
 
 
-def read_iso_timestamp(timestamp_str: str) -> datetime:
-    """
-    A utility method to convert Docker API's timestamp into datetime objects.
-    Removes characters after `.` or `Z` in the timestamp as datetime doesnt accept it
-    :param timestamp_str: ISO 8061 string timestamp
-    :return: corresponding datetime instance
-    """
-    # Hard coding to 19 chars as that filters out excess text
-    timestamp_str = timestamp_str[:19]
-    return datetime.fromisoformat(timestamp_str)
-
-
 class StatsStreamer(InfoStreamer):
 
-    def __init__(self, container: Container):
+    def __init__(self, container: Container, history_size: int = DEFAULT_HISTORY_SIZE):
         super().__init__(container)
+        # The last sample as decoded from the API, its stats are computed by MetricsEngine
         self.stats: Dict = {}
 
-        # To calculate with details from Docker API
-        self.old_net_io = None
-        self.old_disk_io = None
+        self.history = MetricsHistory(history_size)
+        # `time.monotonic` when the last sample was received, streamed or polled
+        self.last_sample_time: Optional[float] = None
+        # Set to record every received sample
+        self.recorder: Optional[StreamRecorder] = None
+
+        # The MetricsEngine computing the stats of the samples and the key of the container in it, a streamer used on
+        # its own computes them with an engine of its own
+        self.__metrics_engine: Optional[MetricsEngine] = None
+        self.__metrics_key: Optional[str] = None
+        self.__owns_metrics_engine = False
 
     def get_stream_generator(self):
-        return self.container.stats(decode=True)
+        api = self.container.client.api
+        if not isinstance(api, APIClient):
+            return self.container.stats(decode=True)
+        # Requested like docker-py does for events, as its stats generator can not close the connection when the
+        # stream is stopped (ie: the container is demoted to polling)
+        response = api._get(api._url('/containers/{0}/stats', self.container.id), stream=True)
+        return CancellableStream(api._stream_helper(response, decode=True), response)
+
+    def poll_stats(self) -> None:
+        """
+        Requests a single sample instead of streaming, for containers sampled at a lower rate. The sample is handled
+        like a streamed one, so polling and streaming can take turns on the same StatsStreamer.
+        """
+        self.stream_handler(self.container.stats(stream=False))
 
     def stream_handler(self, streamed_value):
         self.stats = streamed_value
+        self.last_sample_time = time.monotonic()
+        if self.recorder:
+            self.recorder.record_stats(self.container.id, streamed_value)
 
-    def get_cpu_stats(self) -> CPUStats:
-        """
-        Returns a container's CPU usage and core count
-        :return: a float value indicating the CPU usage along with core count
+    def attach_metrics_engine(self, engine: MetricsEngine, key: str) -> None:
         """
-        cpu_stats = {}
-        stats = self.stats  # Using a copy to avoid values overwritten while reading
-
-        try:
-            cpu = {
-                'system': stats['cpu_stats']['system_cpu_usage'],
-                'total': stats['cpu_stats']['cpu_usage']['total_usage']
-            }
-            precpu = {
-                'system': stats['precpu_stats']['system_cpu_usage'],
-                'total': stats['precpu_stats']['cpu_usage']['total_usage']
-            }
-
-            cpu['count'] = stats['cpu_stats'].get('online_cpus')
-            if cpu['count'] is None:
-                cpu['count'] = len(stats['cpu_stats']['cpu_usage']['percpu_usage'] or [])
-        except KeyError as e:
-            logging.debug(f"StatsStreamer - Failed to get CPU usage for `{self.container.id}` ({e})")
-            logging.debug(stats)
-        else:
-            # CPU usage % = cpu_delta / system_cpu_delta * number_of_cpus * 100
-            cpu_delta = cpu['total'] - precpu['total']
-            system_cpu_delta = cpu['system'] - precpu['system']
-            usage = cpu_delta / system_cpu_delta * cpu['count'] * 100
-
-            cpu_stats = {'usage': usage, 'cores': cpu['count']}
-
-        return CPUStats(**cpu_stats) if cpu_stats else None
-
-    def get_memory_stats(self) -> Optional[MemoryStats]:
+        Reads the stats of the samples from the given engine, which is updated with this streamer by its owner (ie:
+        the DockerDaemonClient) on every refresh
+
+        :param engine: The MetricsEngine of the streamer's owner
+        :param key: The key of the streamer's container in the engine
         """
-        Returns a container's memory details
-        :return: a MemoryStats object
+        self.__metrics_engine, self.__metrics_key = engine, key
+        self.__owns_metrics_engine = False
+
+    def get_stats(self) -> Tuple[Optional[CPUSnapshot], Optional[MemorySnapshot], Optional[NetIOSnapshot],
+                                 Optional[DiskIOSnapshot]]:
         """
-        memory_stats = {}
+        Returns the CPU, memory, network IO and disk IO stats of the last sample, as computed by the MetricsEngine
 
-        try:
-            container_mem_stats = self.stats['memory_stats']
+        :return: A tuple of the four stats, None where unavailable
+        """
+        if self.__metrics_engine is None:
+            self.__metrics_engine, self.__metrics_key = MetricsEngine(), self.container.id
+            self.__owns_metrics_engine = True
+        if self.__owns_metrics_engine:
+            self.__metrics_engine.update({self.__metrics_key: self})
+        return self.__metrics_engine.get_stats(self.__metrics_key)
 
-            # Fixed details
-            memory_stats['usage'] = container_mem_stats['usage']
-            memory_stats['limit'] = container_mem_stats['limit']
+    def get_cpu_stats(self) -> Optional[CPUSnapshot]:
+        return self.get_stats()[0]
 
-            # Optional details
-            if 'stats' in memory_stats:
-                memory_stats['cache'] = container_mem_stats['stats'].get('cache')
-                memory_stats['max_usage'] = container_mem_stats['stats'].get('max_usage')
+    def get_memory_stats(self) -> Optional[MemorySnapshot]:
+        return self.get_stats()[1]
 
-        except KeyError as e:
-            logging.debug(f"StatsStreamer - Failed to get Memory stats for `{self.container.id}` ({e})")
-            logging.debug(self.stats)
+    def get_network_io(self) -> Optional[NetIOSnapshot]:
+        return self.get_stats()[2]
 
-        return MemoryStats(**memory_stats) if memory_stats else None
+    def get_disk_io(self) -> Optional[DiskIOSnapshot]:
+        return self.get_stats()[3]
 
-    def get_network_io(self) -> Optional[NetIOStats]:
-        """
-        Returns a container's network transfer details
-        :return: a NetIOStats object
-        """
-        net_io = {}
-        stats = self.stats  # Using a copy to avoid values overwritten while reading
-
-        try:
-            net_io['total_rx'] = stats['networks']['eth0']['rx_bytes']
-            net_io['total_tx'] = stats['networks']['eth0']['tx_bytes']
-            net_io['read_time'] = read_iso_timestamp(stats['read'])
-        except KeyError as e:
-            logging.debug(f"StatsStreamer - Failed to get Network IO for `{self.container.id}` ({e})")
-            logging.debug(stats)
-        else:
-            if self.old_net_io is not None:
-                net_io['rx'] = net_io['total_rx'] - self.old_net_io['total_rx']
-                net_io['tx'] = net_io['total_tx'] - self.old_net_io['total_tx']
-                net_io['duration'] = net_io['read_time'] - self.old_net_io['read_time']
-
-            # Storing net_io details for Rx/s, Tx/s and duration calculation in subsequent call
-            self.old_net_io = net_io
-
-        # Return the details
-        return NetIOStats(**net_io) if net_io else None
-
-    def get_disk_io(self) -> Optional[DiskIOStats]:
+    def get_sample_age(self, now: Optional[float] = None) -> Optional[float]:
         """
-        Returns a container's disk IO transfer details
-        :return: a DiskIOStats object
+        Returns the seconds since the last sample was received, None if none was received yet
         """
-        disk_io = {}
-        stats = self.stats  # Using a copy to avoid values overwritten while reading
-
-        try:
-            io_service_bytes_recursive = stats["blkio_stats"]['io_service_bytes_recursive']
-            disk_io['total_ior'] = [i for i in io_service_bytes_recursive if i['op'].upper() == 'READ'][0]['value']
-            disk_io['total_iow'] = [i for i in io_service_bytes_recursive if i['op'].upper() == 'WRITE'][0]['value']
-            disk_io['read_time'] = read_iso_timestamp(stats['read'])
-        except (KeyError, TypeError) as e:
-            logging.debug(f"StatsStreamer - Failed to get Disk IO for `{self.container.id}` ({e})")
-            logging.debug(stats)
-        else:
-            if self.old_disk_io is not None:
-                disk_io['ior'] = disk_io['total_ior'] - self.old_disk_io['total_ior']
-                disk_io['iow'] = disk_io['total_iow'] - self.old_disk_io['total_iow']
-                disk_io['duration'] = disk_io['read_time'] - self.old_disk_io['read_time']
-
-            # Storing disk_io details for ior, iow and duration in subsequent call
-            self.old_disk_io = disk_io
-
-        return DiskIOStats(**disk_io) if disk_io else None
+        if self.last_sample_time is None:
+            return None
+        return (time.monotonic() if now is None else now) - self.last_sample_time
@@ -0,0 +1,109 @@
+import logging
+import random
+import time
+from typing import Dict, Optional, Set
+
+from cDock.docker_client.stats_streamer import StatsStreamer
+
+
+class SupervisedStream:
+    __slots__ = ('watched_since', 'attempts', 'next_attempt', 'reconnecting_since')
+
+    def __init__(self, now: float):
+        # When the stream was first seen, its age is counted from there until its first sample
+        self.watched_since = now
+        # Restarts since the stream last delivered a sample, and the earliest time of the next one
+        self.attempts = 0
+        self.next_attempt = now
+        # When the restart in progress was started, None if none is
+        self.reconnecting_since: Optional[float] = None
+
+
+class StreamSupervisor:
+    """
+    Watches the stats streams of the streamed containers. A stream without a sample for `stale_after` seconds is
+    reported stale, so its last values are not shown as live, and a stream which is stale or ended (ie: the daemon
+    closed the connection) is restarted.
+
+    Restarts of a stream are spaced by an exponential backoff from `backoff` up to `backoff_max` seconds, with a
+    random jitter so streams which died together are not restarted together. At most `max_reconnects` restarts are in
+    progress at once: a restart is in progress until the stream delivers a sample, dies again, or `stale_after`
+    seconds passed. After a daemon hiccup, streams are reconnected a few at a time instead of all at once.
+
+    `supervise` is called on every refresh, no thread of its own is used.
+    """
+
+    def __init__(self, stale_after: float, backoff: float, backoff_max: float, max_reconnects: int):
+        """
+        :param stale_after: Seconds without a sample after which a stream is stale and restarted
+        :param backoff: Seconds before the second restart of a stream, doubled on every restart which did not help
+        :param backoff_max: Maximum seconds between two restarts of a stream
+        :param max_reconnects: Maximum number of restarts in progress at once
+        """
+        self.stale_after = stale_after
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_reconnects = max(max_reconnects, 1)
+        self.__streams: Dict[str, SupervisedStream] = {}
+
+    def get_backoff(self, attempts: int) -> float:
+        """
+        Returns the seconds to wait before the next restart of a stream restarted `attempts` times, between half and
+        all of the exponential backoff
+        """
+        delay = min(self.backoff * 2 ** max(attempts - 1, 0), self.backoff_max)
+        return random.uniform(delay / 2, delay)
+
+    def get_reconnect_count(self) -> int:
+        return sum(1 for stream in self.__streams.values() if stream.reconnecting_since is not None)
+
+    def supervise(self, streamers: Dict[str, StatsStreamer], now: Optional[float] = None) -> Set[str]:
+        """
+        Restarts the streams which are due and returns the stale ones. Containers missing from `streamers` (ie: no
+        longer streamed) are forgotten.
+
+        :param streamers: Container key -> StatsStreamer of every streamed container
+        :param now: The current `time.monotonic`
+        :return: The keys of the containers whose stream is stale
+        """
+        now = time.monotonic() if now is None else now
+        for key in [key for key in self.__streams if key not in streamers]:
+            self.__streams.pop(key)
+
+        stale_keys = set()
+        due = []
+        for key, streamer in streamers.items():
+            stream = self.__streams.get(key)
+            if stream is None:
+                stream = self.__streams[key] = SupervisedStream(now)
+
+            last_sample_time = streamer.last_sample_time
+            if stream.reconnecting_since is not None:
+                if last_sample_time is not None and last_sample_time >= stream.reconnecting_since:
+                    logging.info(f"StreamSupervisor - Stream of {key} is back")
+                    stream.reconnecting_since = None
+                    stream.attempts = 0
+                elif now - stream.reconnecting_since > self.stale_after or not streamer.is_streaming():
+                    stream.reconnecting_since = None
+
+            age = now - max(last_sample_time or stream.watched_since, stream.watched_since)
+            is_stale = age > self.stale_after
+            if is_stale:
+                stale_keys.add(key)
+            if stream.reconnecting_since is None and (is_stale or not streamer.is_streaming()) and \
+                    now >= stream.next_attempt:
+                due.append(key)
+
+        # The streams waiting the longest go first
+        due.sort(key=lambda k: self.__streams[k].next_attempt)
+        for key in due[:max(self.max_reconnects - self.get_reconnect_count(), 0)]:
+            stream = self.__streams[key]
+            stream.attempts += 1
+            stream.reconnecting_since = now
+            stream.next_attempt = now + self.get_backoff(stream.attempts)
+            logging.info(f"StreamSupervisor - Restarting the stream of {key} (attempt {stream.attempts})")
+            try:
+                streamers[key].restart_stream()
+            except Exception as e:
+                logging.error(f"StreamSupervisor - Failed to restart the stream of {key} ({e})")
+        return stale_keys
@@ -0,0 +1,255 @@
+import logging
+import math
+import sqlite3
+import time
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Tuple
+
+from cDock.metrics_history import MetricsHistory
+
+RESOLUTION_RAW = 'raw'
+RESOLUTION_MINUTE = 'minute'
+RESOLUTION_HOUR = 'hour'
+
+# Resolution -> (table, seconds per bucket), finest first. Raw samples are kept as received (ie: every second).
+RESOLUTIONS: Dict[str, Tuple[str, int]] = {
+    RESOLUTION_RAW: ('samples_raw', 0),
+    RESOLUTION_MINUTE: ('samples_minute', 60),
+    RESOLUTION_HOUR: ('samples_hour', 3600),
+}
+
+METRICS = MetricsHistory.METRICS
+# A query returns at most this many points when the resolution is picked automatically
+DEFAULT_MAX_POINTS = 1500
+
+
+def get_schema() -> List[str]:
+    raw_columns = ", ".join(f"{metric} REAL" for metric in METRICS)
+    aggregate_columns = ", ".join(f"{metric}_min REAL, {metric}_avg REAL, {metric}_max REAL" for metric in METRICS)
+    statements = [
+        "CREATE TABLE IF NOT EXISTS containers (id INTEGER PRIMARY KEY, host TEXT NOT NULL, "
+        "container_id TEXT NOT NULL, name TEXT, UNIQUE (host, container_id))",
+        f"CREATE TABLE IF NOT EXISTS samples_raw (container INTEGER NOT NULL, ts REAL NOT NULL, {raw_columns})",
+        "CREATE INDEX IF NOT EXISTS samples_raw_container_ts ON samples_raw (container, ts)",
+        "CREATE INDEX IF NOT EXISTS samples_raw_ts ON samples_raw (ts)",
+    ]
+    for table in ('samples_minute', 'samples_hour'):
+        statements += [
+            f"CREATE TABLE IF NOT EXISTS {table} (container INTEGER NOT NULL, ts INTEGER NOT NULL, "
+            f"count INTEGER NOT NULL, {aggregate_columns}, PRIMARY KEY (container, ts)) WITHOUT ROWID",
+            f"CREATE INDEX IF NOT EXISTS {table}_ts ON {table} (ts)",
+        ]
+    return statements
+
+
+def get_raw_rollup() -> str:
+    """
+    Aggregates the raw samples of a time range into minute buckets, replacing the buckets computed before
+    """
+    aggregates = ", ".join(f"MIN({m}), AVG({m}), MAX({m})" for m in METRICS)
+    return (f"INSERT OR REPLACE INTO samples_minute SELECT container, CAST(ts / 60 AS INTEGER) * 60 AS bucket, "
+            f"COUNT(*), {aggregates} FROM samples_raw WHERE ts >= ? AND ts < ? GROUP BY container, bucket")
+
+
+def get_minute_rollup() -> str:
+    """
+    Aggregates the minute buckets of a time range into hour buckets, averages are weighted by their sample count
+    """
+    aggregates = ", ".join(f"MIN({m}_min), SUM({m}_avg * count) / SUM(CASE WHEN {m}_avg IS NULL THEN 0 ELSE count END),"
+                           f" MAX({m}_max)" for m in METRICS)
+    return (f"INSERT OR REPLACE INTO samples_hour SELECT container, ts / 3600 * 3600 AS bucket, SUM(count), "
+            f"{aggregates} FROM samples_minute WHERE ts >= ? AND ts < ? GROUP BY container, bucket")
+
+
+class HistoryStore:
+    """
+    Keeps the metrics of all containers in a SQLite database, beyond the in-memory MetricsHistory and the lifetime of
+    the process. Samples are kept raw, and rolled up into minute and hour buckets holding the min, average and max of
+    every metric. Every resolution is pruned after its own retention.
+
+    `record` only appends the sample to a buffer, so the refresh is never slowed down by the database. A writer
+    thread flushes the buffer every `flush_interval` seconds in a single transaction, then rolls up the buckets
+    touched by the flushed samples (again, so late samples are accounted for) and prunes the expired ones. Queries
+    use a connection of their own, the database is in WAL mode so they do not wait for the writer. Samples still in
+    the buffer are not returned by queries.
+    """
+
+    MAX_BUFFERED_SAMPLES = 10000
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, path: str, flush_interval: float = 5, raw_retention: float = 3600,
+                 minute_retention: float = 2 * 86400, hour_retention: float = 30 * 86400):
+        """
+        :param path: The database file, created if missing
+        :param flush_interval: Seconds between two writes to the database
+        :param raw_retention: Seconds the raw samples are kept
+        :param minute_retention: Seconds the minute buckets are kept
+        :param hour_retention: Seconds the hour buckets are kept
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retentions: Dict[str, float] = {RESOLUTION_RAW: raw_retention, RESOLUTION_MINUTE: minute_retention,
+                                             RESOLUTION_HOUR: hour_retention}
+
+        self.__connection = self.__connect()
+        with self.__connection:
+            for statement in get_schema():
+                self.__connection.execute(statement)
+        self.__query_connection = self.__connect()
+        self.__query_lock = Lock()
+
+        # (host, container ID, name, timestamp, metric values) of the samples not written yet
+        self.__buffer: List[Tuple] = []
+        self.__buffer_lock = Lock()
+        # Serializes flushes, `flush` may be called while the writer thread flushes
+        self.__write_lock = Lock()
+        # (host, container ID) -> row ID in `containers`, and the name last written
+        self.__container_ids: Dict[Tuple[str, str], int] = {}
+        self.__container_names: Dict[int, str] = {}
+        self.__last_prune = 0.0
+
+        self.__wake_up = Event()
+        self.__is_closing = False
+        self.__thread = Thread(target=self.__writer, name='cDock-history-writer', daemon=True)
+        self.__thread.start()
+
+    def __connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record(self, host: Optional[str], container_id: str, name: str, timestamp: float,
+               values: Dict[str, Optional[float]]) -> None:
+        """
+        Buffers a sample of a container, written by the writer thread
+
+        :param host: The host of the container, None for a single daemon
+        :param container_id: The container ID
+        :param name: The container name, to tell containers apart when browsing the database
+        :param timestamp: The read time of the sample as a unix timestamp
+        :param values: The value of each metric in METRICS, None if unavailable
+        """
+        sample = (host or '', container_id, name, timestamp, tuple(values.get(metric) for metric in METRICS))
+        with self.__buffer_lock:
+            self.__buffer.append(sample)
+            if len(self.__buffer) >= self.MAX_BUFFERED_SAMPLES:
+                self.__wake_up.set()
+
+    def __writer(self) -> None:
+        while not self.__is_closing:
+            self.__wake_up.wait(self.flush_interval)
+            self.__wake_up.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"HistoryStore - Failed to write the history ({e})")
+
+    def __get_container_id(self, host: str, container_id: str, name: str) -> int:
+        row_id = self.__container_ids.get((host, container_id))
+        if row_id is None:
+            self.__connection.execute("INSERT OR IGNORE INTO containers (host, container_id, name) VALUES (?, ?, ?)",
+                                      (host, container_id, name))
+            row_id = self.__connection.execute("SELECT id FROM containers WHERE host = ? AND container_id = ?",
+                                               (host, container_id)).fetchone()[0]
+            self.__container_ids[(host, container_id)] = row_id
+        if self.__container_names.get(row_id) != name:
+            self.__connection.execute("UPDATE containers SET name = ? WHERE id = ?", (name, row_id))
+            self.__container_names[row_id] = name
+        return row_id
+
+    def flush(self) -> int:
+        """
+        Writes the buffered samples, updates their minute and hour buckets and prunes the expired data
+
+        :return: The number of samples written
+        """
+        with self.__buffer_lock:
+            samples, self.__buffer = self.__buffer, []
+
+        with self.__write_lock:
+            try:
+                self.__write(samples)
+            except Exception:
+                # The rows of the containers created by the failed transaction are gone
+                self.__container_ids.clear()
+                self.__container_names.clear()
+                raise
+        return len(samples)
+
+    def __write(self, samples: List[Tuple]) -> None:
+        with self.__connection:
+            if samples:
+                rows = [(self.__get_container_id(host, container_id, name), timestamp, *values)
+                        for host, container_id, name, timestamp, values in samples]
+                self.__connection.executemany(
+                    f"INSERT INTO samples_raw VALUES (?, ?, {', '.join('?' * len(METRICS))})", rows)
+
+                # Only the buckets the new samples fall in are computed again
+                first, last = min(row[1] for row in rows), max(row[1] for row in rows)
+                self.__connection.execute(get_raw_rollup(), (math.floor(first / 60) * 60,
+                                                             math.floor(last / 60) * 60 + 60))
+                self.__connection.execute(get_minute_rollup(), (math.floor(first / 3600) * 3600,
+                                                                math.floor(last / 3600) * 3600 + 3600))
+
+            now = time.time()
+            if now - self.__last_prune >= self.PRUNE_INTERVAL:
+                self.__last_prune = now
+                for resolution, (table, _) in RESOLUTIONS.items():
+                    self.__connection.execute(f"DELETE FROM {table} WHERE ts < ?", (now - self.retentions[resolution],))
+
+    def pick_resolution(self, start: float, end: float, max_points: int = DEFAULT_MAX_POINTS) -> str:
+        """
+        Returns the finest resolution still holding data from `start` and returning at most `max_points` buckets
+        over the range. Raw samples are assumed to be one per second.
+        """
+        now = time.time()
+        for resolution, (_, seconds) in RESOLUTIONS.items():
+            if start >= now - self.retentions[resolution] and (end - start) / max(seconds, 1) <= max_points:
+                return resolution
+        return RESOLUTION_HOUR
+
+    def query(self, container_id: str, metric: str, start: float, end: Optional[float] = None,
+              host: Optional[str] = None, resolution: Optional[str] = None) -> List[Tuple[float, float, float, float]]:
+        """
+        Returns the values of a metric of a container over a time range, oldest first
+
+        :param container_id: The container ID
+        :param metric: One of METRICS
+        :param start: The start of the range as a unix timestamp
+        :param end: The end of the range, now if not given
+        :param host: The host of the container, None for a single daemon
+        :param resolution: One of RESOLUTIONS, picked with `pick_resolution` if not given
+        :return: A (timestamp, min, average, max) tuple per raw sample or bucket. A raw sample has the same min,
+                 average and max.
+        :raises: Exception - If the metric or resolution is unknown
+        """
+        if metric not in METRICS:
+            raise Exception(f"Unknown metric `{metric}`")
+        end = time.time() if end is None else end
+        resolution = resolution or self.pick_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise Exception(f"Unknown resolution `{resolution}`")
+
+        table, _ = RESOLUTIONS[resolution]
+        columns = f"{metric}, {metric}, {metric}" if resolution == RESOLUTION_RAW else \
+            f"{metric}_min, {metric}_avg, {metric}_max"
+        with self.__query_lock:
+            return self.__query_connection.execute(
+                f"SELECT s.ts, {columns} FROM {table} s JOIN containers c ON c.id = s.container "
+                f"WHERE c.host = ? AND c.container_id = ? AND s.ts >= ? AND s.ts <= ? ORDER BY s.ts",
+                (host or '', container_id, start, end)).fetchall()
+
+    def close(self) -> None:
+        """
+        Stops the writer thread, writes the remaining samples and closes the database
+        """
+        self.__is_closing = True
+        self.__wake_up.set()
+        self.__thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"HistoryStore - Failed to write the history ({e})")
+        self.__connection.close()
+        self.__query_connection.close()
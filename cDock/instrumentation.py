@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Timings are recorded in microseconds, bucket `i` of a histogram holds the values below 2^i
+HISTOGRAM_BUCKETS = 40
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram:
+    """
+    A histogram with power of two buckets: recording a value is a `bit_length` and an increment, and the memory used
+    does not grow with the number of values. Percentiles are the upper bound of their bucket, so they are within a
+    factor of two of the actual value, which is enough to tell where time goes.
+    """
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        """
+        :param value: A non-negative integer, ie: a duration in microseconds or a count
+        """
+        self.buckets[min(value.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def get_percentile(self, percentile: float) -> int:
+        """
+        Returns the upper bound of the bucket holding the given percentile, capped to the largest value recorded
+        """
+        if not self.count:
+            return 0
+        rank = self.count * percentile / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(2 ** i - 1 if i else 0, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        stats = {'count': self.count, 'mean': self.total / self.count if self.count else 0, 'max': self.max}
+        for percentile in PERCENTILES:
+            stats[f'p{percentile}'] = self.get_percentile(percentile)
+        stats['buckets'] = {2 ** i - 1 if i else 0: count for i, count in enumerate(self.buckets) if count}
+        return stats
+
+
+class NullTimer:
+    """
+    Returned by `Instrumentation.timer` while disabled, entering and exiting it does nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Timer:
+    """
+    Records the time spent in a `with` block into a histogram of its Instrumentation, in microseconds
+    """
+
+    def __init__(self, instrumentation: 'Instrumentation', name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.name, (time.perf_counter_ns() - self.start) // 1000)
+        return False
+
+
+class Instrumentation:
+    """
+    Timers, counters and gauges of the hot paths (ie: the refresh, the rendering and the daemon requests), shown by
+    the performance overlay and dumped as JSON.
+
+    Disabled, `timer` returns a shared no-op context manager and `record` and `increment` return right away, so the
+    probes can stay on the hot paths. Gauges are only computed when the stats are read.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.__histograms: Dict[str, Histogram] = {}
+        self.__counters: Dict[str, int] = {}
+        self.__gauges: Dict[str, Callable[[], object]] = {}
+        # Probes run on the refresh, stream and worker threads
+        self.__lock = threading.Lock()
+
+    def timer(self, name: str):
+        """
+        Returns a context manager recording the time spent in its block into the `name` histogram
+
+        :param name: The histogram, ie: `refresh.daemon`
+        """
+        return Timer(self, name) if self.enabled else NULL_TIMER
+
+    def record(self, name: str, value: int) -> None:
+        """
+        Records a value (ie: a duration in microseconds or a count per refresh) into the `name` histogram
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            histogram = self.__histograms.get(name)
+            if histogram is None:
+                histogram = self.__histograms[name] = Histogram()
+            histogram.record(max(int(value), 0))
+
+    def increment(self, name: str, count: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + count
+
+    def get_counter(self, name: str) -> int:
+        return self.__counters.get(name, 0)
+
+    def add_gauge(self, name: str, gauge: Callable[[], object]) -> None:
+        """
+        Registers a callable read every time the stats are read, ie: the number of open streams
+
+        :param name: The gauge
+        :param gauge: A callable without arguments returning a JSON serializable value
+        """
+        self.__gauges[name] = gauge
+
+    def instrument_session(self, session, name: str) -> None:
+        """
+        Counts the requests made by a requests Session (ie: the APIClient of a DockerClient) in the `api.<name>`
+        counter, and in `api.calls` for all sessions. Stream requests are counted once, when their response starts.
+
+        :param session: A requests Session, anything else (ie: a replay) is ignored
+        :param name: The name of the client, ie: `control`
+        """
+        hooks = getattr(session, 'hooks', None)
+        if not isinstance(hooks, dict):
+            return
+
+        def count_request(response, *args, **kwargs):
+            if self.enabled:
+                self.increment('api.calls')
+                self.increment(f'api.{name}')
+            return response
+
+        hooks.setdefault('response', []).append(count_request)
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__histograms.clear()
+            self.__counters.clear()
+        self.started_at = time.time()
+
+    def get_stats(self) -> Dict:
+        """
+        Returns the histograms, counters and gauges as a JSON serializable dict. Durations are in microseconds.
+        """
+        with self.__lock:
+            stats = {
+                'enabled': self.enabled,
+                'since': self.started_at,
+                'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.__histograms.items())},
+                'counters': dict(sorted(self.__counters.items())),
+            }
+        gauges = {}
+        for name, gauge in self.__gauges.items():
+            try:
+                gauges[name] = gauge()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        stats['gauges'] = gauges
+        return stats
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the stats to a JSON file
+
+        :raises: OSError - If the file could not be written
+        """
+        with open(path, 'w') as f:
+            json.dump(self.get_stats(), f, indent=2, default=str)
+
+
+# The probes of all modules report here, enabled with INSTRUMENTATION or from the performance overlay
+instruments = Instrumentation()
+
+
+def get_thread_count() -> int:
+    return threading.active_count()
+
+
+def summarize_ages(ages: Dict[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """
+    Summarizes the age of the last sample of every stream: the oldest, the median, and the number of streams which
+    never received a sample
+
+    :param ages: Stream (ie: container ID) -> seconds since its last sample, None if it had none yet
+    """
+    known = sorted(age for age in ages.values() if age is not None)
+    return {
+        'streams': len(ages),
+        'without_sample': len(ages) - len(known),
+        'median': known[len(known) // 2] if known else None,
+        'max': known[-1] if known else None,
+    }
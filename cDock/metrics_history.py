@@ -0,0 +1,65 @@
+from array import array
+from typing import Dict, List, Optional
+
+DEFAULT_HISTORY_SIZE = 120
+
+
+class MetricsHistory:
+    """
+    A fixed-size ring buffer holding the last `size` samples of a container's metrics. Every metric is stored in a
+    preallocated typed array, so the memory used is constant (`size` * 4 bytes per metric) for the lifetime of the
+    container.
+    """
+
+    METRICS = ['cpu', 'mem', 'rx', 'tx', 'ior', 'iow']
+    TYPE_CODE = 'f'
+
+    def __init__(self, size: int = DEFAULT_HISTORY_SIZE):
+        self.size = max(size, 1)
+        self.__columns: Dict[str, array] = {metric: array(self.TYPE_CODE, [0.0]) * self.size for metric in self.METRICS}
+        self.__next_index = 0
+        self.__count = 0
+
+        # Identifies the last recorded sample to not record a sample twice
+        self.last_sample_key = None
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def append(self, sample_key, **values: Optional[float]) -> bool:
+        """
+        Records a sample, overwriting the oldest one once the buffer is full. Missing metrics are recorded as 0.
+
+        :param sample_key: Identifies the sample (eg: its read timestamp), a sample with the last key is not recorded
+        :param values: The value of each metric in METRICS
+        :return: True if the sample was recorded
+        """
+        if sample_key is not None and sample_key == self.last_sample_key:
+            return False
+        self.last_sample_key = sample_key
+
+        for metric, column in self.__columns.items():
+            column[self.__next_index] = values.get(metric) or 0.0
+        self.__next_index = (self.__next_index + 1) % self.size
+        self.__count = min(self.__count + 1, self.size)
+        return True
+
+    def get(self, metric: str, count: int = None) -> List[float]:
+        """
+        Returns the recorded values of a metric, oldest first
+
+        :param metric: One of METRICS
+        :param count: Limits to the latest `count` values
+        :return: A list of the values
+        """
+        column = self.__columns[metric]
+        count = self.__count if count is None else min(count, self.__count)
+        start = (self.__next_index - count) % self.size
+        if start + count <= self.size:
+            return column[start:start + count].tolist()
+        return column[start:].tolist() + column[:(start + count) % self.size].tolist()
+
+    def get_latest(self, metric: str) -> Optional[float]:
+        if not self.__count:
+            return None
+        return self.__columns[metric][self.__next_index - 1]
@@ -3,6 +3,8 @@ from typing import List, Optional
 
 from pydantic import BaseModel
 
+from cDock.metrics_history import MetricsHistory
+
 
 class CPUStats(BaseModel):
     usage: float
@@ -23,6 +25,8 @@ class NetIOStats(BaseModel):
     rx: Optional[int]
     tx: Optional[int]
     duration: Optional[timedelta]
+    rx_rate: Optional[float]
+    tx_rate: Optional[float]
 
 
 class DiskIOStats(BaseModel):
@@ -32,6 +36,8 @@ class DiskIOStats(BaseModel):
     ior: Optional[int]
     iow: Optional[int]
     duration: timedelta = timedelta(seconds=1)
+    ior_rate: Optional[float]
+    iow_rate: Optional[float]
 
 
 class ContainerView(BaseModel):
@@ -47,3 +53,9 @@ class ContainerView(BaseModel):
     started_at: Optional[datetime]
     published_ports: List[str] = []
     command: List[str] = []
+    history: Optional[MetricsHistory]
+    host: Optional[str]
+    stale: bool = False
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -0,0 +1,187 @@
+import gzip
+import logging
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, List, Optional
+
+from cDock.config import Config
+from cDock.docker_client import create_client
+from cDock.snapshot import ContainerSnapshot
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help) of the exported container metrics
+CONTAINER_METRICS = [
+    ("cdock_container_info", "gauge", "Container metadata, always 1"),
+    ("cdock_container_cpu_usage_percent", "gauge", "CPU usage of the container, 100 per fully used core"),
+    ("cdock_container_cpu_cores", "gauge", "Number of CPU cores available to the container"),
+    ("cdock_container_memory_usage_bytes", "gauge", "Memory used by the container"),
+    ("cdock_container_memory_limit_bytes", "gauge", "Memory limit of the container"),
+    ("cdock_container_network_receive_bytes_total", "counter", "Bytes received on eth0"),
+    ("cdock_container_network_transmit_bytes_total", "counter", "Bytes transmitted on eth0"),
+    ("cdock_container_blkio_read_bytes_total", "counter", "Bytes read from block devices"),
+    ("cdock_container_blkio_write_bytes_total", "counter", "Bytes written to block devices"),
+    ("cdock_container_stats_stale", "gauge", "1 if the stats stream of the container is stale, 0 if live"),
+]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    # Set on the server instance
+    server: 'MetricsHTTPServer'
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body, compressed_body = self.server.exporter.get_serialized_metrics()
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(compressed_body if use_gzip else body)))
+        self.end_headers()
+        self.wfile.write(compressed_body if use_gzip else body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"MetricsRequestHandler - {self.address_string()} {format % args}")
+
+
+class MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, exporter: 'cDockExporter'):
+        super().__init__(address, MetricsRequestHandler)
+        self.exporter = exporter
+
+
+class cDockExporter:
+    """
+    Runs the collector headless and serves the containers' stats in the Prometheus text format on `/metrics`.
+    Scrapes are served from the latest snapshot, which is serialized at most once however many scrapers there are.
+    """
+    DEFAULT_REFRESH_TIME = 1
+
+    def __init__(self, config: Config = None):
+        self.config = config or Config.load_env_from_file()
+        self.client = create_client(self.config)
+        self.refresh_time = self.config.tui_refresh_interval or self.DEFAULT_REFRESH_TIME
+
+        self.server: Optional[MetricsHTTPServer] = None
+        self.is_running = True
+
+        # The latest snapshot and its serialization, which is only regenerated when the snapshot changed
+        self.__lock = Lock()
+        self.__version: Optional[Dict] = None
+        self.__container_views: List[ContainerSnapshot] = []
+        self.__snapshot_timestamp = 0.0
+        self.__snapshot_generation = 0
+        self.__serialized_generation = -1
+        self.__serialized: tuple = (b'', b'')
+
+    def update_snapshot(self):
+        stats = self.client.get_version_and_container_views()
+        if 'container_views' not in stats:
+            return
+
+        with self.__lock:
+            self.__version = stats['version']
+            self.__container_views = stats['container_views']
+            self.__snapshot_timestamp = time.time()
+            self.__snapshot_generation += 1
+
+    def get_serialized_metrics(self) -> tuple:
+        """
+        Returns the plain and gzip compressed metrics of the latest snapshot, serializing them if the snapshot changed
+        since the last call
+        """
+        with self.__lock:
+            if self.__serialized_generation != self.__snapshot_generation:
+                body = self.serialize(self.__version, self.__container_views, self.__snapshot_timestamp).encode()
+                self.__serialized = (body, gzip.compress(body, compresslevel=5))
+                self.__serialized_generation = self.__snapshot_generation
+            return self.__serialized
+
+    @staticmethod
+    def serialize(version: Optional[Dict], container_views: List[ContainerSnapshot], timestamp: float) -> str:
+        """
+        Serializes a snapshot into the Prometheus text exposition format
+        """
+        samples: Dict[str, List[str]] = {name: [] for name, _, _ in CONTAINER_METRICS}
+        for view in container_views:
+            labels = f'id="{view.id}",name="{escape_label_value(view.name)}"'
+            if view.host:
+                labels += f',host="{escape_label_value(view.host)}"'
+            samples["cdock_container_info"].append(
+                f'{{{labels},image="{escape_label_value(view.image)}",status="{view.status}"}} 1')
+
+            values = {}
+            if view.cpu_stats:
+                values["cdock_container_cpu_usage_percent"] = view.cpu_stats.usage
+                values["cdock_container_cpu_cores"] = view.cpu_stats.cores
+            if view.memory_stats:
+                values["cdock_container_memory_usage_bytes"] = view.memory_stats.usage
+                values["cdock_container_memory_limit_bytes"] = view.memory_stats.limit
+            if view.net_io_stats:
+                values["cdock_container_network_receive_bytes_total"] = view.net_io_stats.total_rx
+                values["cdock_container_network_transmit_bytes_total"] = view.net_io_stats.total_tx
+            if view.disk_io_stats:
+                values["cdock_container_blkio_read_bytes_total"] = view.disk_io_stats.total_ior
+                values["cdock_container_blkio_write_bytes_total"] = view.disk_io_stats.total_iow
+            if view.history is not None:
+                # Only containers with stats are streamed
+                values["cdock_container_stats_stale"] = int(view.stale)
+            for name, value in values.items():
+                samples[name].append(f'{{{labels}}} {value}')
+
+        lines = []
+        if version:
+            lines += ["# HELP cdock_daemon_info Docker daemon version, always 1", "# TYPE cdock_daemon_info gauge"]
+            # Several daemons have their versions under `Hosts`
+            for host, host_version in (version.get('Hosts') or {None: version}).items():
+                host_label = f'host="{escape_label_value(host)}",' if host else ''
+                lines.append(f'cdock_daemon_info{{{host_label}'
+                             f'version="{escape_label_value(str((host_version or {}).get("Version", "")))}",'
+                             f'api_version="{escape_label_value(str((host_version or {}).get("ApiVersion", "")))}"}} 1')
+        lines += ["# HELP cdock_containers Number of containers", "# TYPE cdock_containers gauge",
+                  f"cdock_containers {len(container_views)}",
+                  "# HELP cdock_snapshot_timestamp_seconds Time the snapshot was collected",
+                  "# TYPE cdock_snapshot_timestamp_seconds gauge",
+                  f"cdock_snapshot_timestamp_seconds {timestamp}"]
+        for name, metric_type, description in CONTAINER_METRICS:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+            lines += [name + sample for sample in samples[name]]
+
+        return "\n".join(lines) + "\n"
+
+    def run(self):
+        if not self.client.connect():
+            return
+
+        self.server = MetricsHTTPServer((self.config.exporter_host, self.config.exporter_port), self)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info(f"cDockExporter - Serving metrics on {self.config.exporter_host}:{self.config.exporter_port}")
+
+        try:
+            while self.is_running:
+                started = time.time()
+                self.update_snapshot()
+                time.sleep(max(self.refresh_time - (time.time() - started), 0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self.is_running:
+            self.is_running = False
+            if self.server:
+                self.server.shutdown()
+                self.server.server_close()
+            self.client.disconnect()
@@ -1,11 +1,13 @@
-from typing import Union
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
 
 from rich.text import Text
 
 from cDock.config import Config
 from cDock.models import *
+from cDock.snapshot import ContainerSnapshot, CPUSnapshot
 
 header_map = {
+    "host": "Host",
     "name": "Name",
     "id": "Id",
     "status": "Status",
@@ -21,39 +23,181 @@ header_map = {
     "started": "Started",
     "ports": "Ports",
     "command": "Command",
+    "cpu_graph": "CPU% History",
+    "mem_graph": "MEM History",
 }
 
 SHA_512_ID_PICK_SIZE = 12
+SPARKLINE_WIDTH = 20
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
 
 
 class RichFormatter:
+    """
+    Formats ContainerSnapshots into table rows. The columns are planned once from `priority_attributes`, and the cells
+    of every container are memoized: a cell is only formatted again when the values it is built from changed.
+    """
+
     def __init__(self, config: Config):
         self.config = config
+        self.column_plan: List[Tuple[str, Callable[[ContainerSnapshot], Any],
+                                     Callable[[ContainerSnapshot], Any]]] = \
+            self._build_column_plan()
 
-    def get_header_row(self):
-        return [header_map[k] for k in self.config.priority_attributes.split(",") if k in header_map]
-
-    def get_container_row(self, view: ContainerView):
-        values = {
-            "name": view.name,
-            "id": view.id[:SHA_512_ID_PICK_SIZE],
-            "status": self._format_container_status(view.status),
-            "image": view.image,
-            "cpu": format(view.cpu_stats.usage, ".2f") if view.cpu_stats else '-',
-            "mem_usage": self._auto_unit(view.memory_stats.usage) if view.memory_stats else '-',
-            "mem_limit": self._auto_unit(view.memory_stats.limit) if view.memory_stats else '-',
-            "rx/s": self._auto_unit(view.net_io_stats.rx) if view.net_io_stats else '-',
-            "tx/s": self._auto_unit(view.net_io_stats.tx) if view.net_io_stats else '-',
-            "ior/s": self._auto_unit(view.disk_io_stats.ior) if view.disk_io_stats else '-',
-            "iow/s": self._auto_unit(view.disk_io_stats.iow) if view.disk_io_stats else '-',
-            "created": "Created",
-            "started": "Started",
-            "ports": ", ".join(view.published_ports),
-            "command": view.command[0] if len(view.command) > 0 else '',
+        # Container ID -> (keys of the cells, cells)
+        self.__row_cache: Dict[str, Tuple[List, List]] = {}
+
+    def _build_column_plan(self) -> List[Tuple[str, Callable[[ContainerSnapshot], Any],
+                                               Callable[[ContainerSnapshot], Any]]]:
+        """
+        Returns the (attribute, key function, cell function) of every column to display. The key function returns
+        the values a cell is built from and must be cheap, the cell function formats the cell.
+        """
+        columns = {
+            "host": (lambda v: v.host, lambda v: v.host or ''),
+            "name": (lambda v: v.name, lambda v: v.name),
+            "id": (lambda v: v.id, lambda v: v.id[:SHA_512_ID_PICK_SIZE]),
+            "status": (lambda v: v.status, lambda v: self._format_container_status(v.status)),
+            "image": (lambda v: v.image, lambda v: v.image),
+            "cpu": (lambda v: v.cpu_stats and v.cpu_stats.usage,
+                    lambda v: format(v.cpu_stats.usage, ".2f") if v.cpu_stats else '-'),
+            "mem_usage": (lambda v: v.memory_stats and v.memory_stats.usage,
+                          lambda v: self._auto_unit(v.memory_stats.usage) if v.memory_stats else '-'),
+            "mem_limit": (lambda v: v.memory_stats and v.memory_stats.limit,
+                          lambda v: self._auto_unit(v.memory_stats.limit) if v.memory_stats else '-'),
+            "rx/s": (lambda v: v.net_io_stats and v.net_io_stats.rx_rate,
+                     lambda v: self._auto_unit(v.net_io_stats.rx_rate) if v.net_io_stats else '-'),
+            "tx/s": (lambda v: v.net_io_stats and v.net_io_stats.tx_rate,
+                     lambda v: self._auto_unit(v.net_io_stats.tx_rate) if v.net_io_stats else '-'),
+            "ior/s": (lambda v: v.disk_io_stats and v.disk_io_stats.ior_rate,
+                      lambda v: self._auto_unit(v.disk_io_stats.ior_rate) if v.disk_io_stats else '-'),
+            "iow/s": (lambda v: v.disk_io_stats and v.disk_io_stats.iow_rate,
+                      lambda v: self._auto_unit(v.disk_io_stats.iow_rate) if v.disk_io_stats else '-'),
+            "created": (lambda v: None, lambda v: "Created"),
+            "started": (lambda v: None, lambda v: "Started"),
+            "ports": (lambda v: tuple(v.published_ports), lambda v: ", ".join(v.published_ports)),
+            "command": (lambda v: v.command[0] if v.command else '', lambda v: v.command[0] if v.command else ''),
+            "cpu_graph": (lambda v: v.history and (v.history.last_sample_key, len(v.history)),
+                          lambda v: self.sparkline(v.history.get('cpu', SPARKLINE_WIDTH)) if v.history else ''),
+            "mem_graph": (lambda v: v.history and (v.history.last_sample_key, len(v.history)),
+                          lambda v: self.sparkline(v.history.get('mem', SPARKLINE_WIDTH)) if v.history else ''),
         }
-        return [values[attr] for attr in self.config.priority_attributes.split(',')]
+        attributes = self.config.priority_attributes.split(",")
+        # Containers of several daemons are told apart by their host
+        if self.config.docker_hosts and "host" not in attributes:
+            attributes.insert(0, "host")
+        return [(attr, *columns[attr]) for attr in attributes if attr in columns]
+
+    def get_header_row(self):
+        return [header_map[attr] for attr, _, _ in self.column_plan]
+
+    def get_container_row(self, view: ContainerSnapshot):
+        """
+        Returns the cells of the container's row, formatting only the cells whose values changed since the last call
+        """
+        cached = self.__row_cache.get(view.id)
+        keys = [key(view) for _, key, _ in self.column_plan]
+        if cached is None:
+            cells = [cell(view) for _, _, cell in self.column_plan]
+        elif cached[0] == keys:
+            return cached[1]
+        else:
+            cells = [cached_cell if cached_key == key else cell(view)
+                     for (_, _, cell), key, cached_key, cached_cell in zip(self.column_plan, keys, *cached)]
+
+        self.__row_cache[view.id] = (keys, cells)
+        return cells
+
+    def prune(self, container_ids: Iterable[str]) -> None:
+        """
+        Drops the memoized rows of all containers which are not in `container_ids`
+        """
+        container_ids = set(container_ids)
+        for container_id in [i for i in self.__row_cache if i not in container_ids]:
+            self.__row_cache.pop(container_id)
+
+    def _get_history_metrics(self) -> List[Tuple[str, str, Callable[[float], str]]]:
+        return [
+            ("CPU%", 'cpu', lambda v: format(v, ".2f")),
+            ("MEM", 'mem', self._auto_unit),
+            ("Rx/s", 'rx', self._auto_unit),
+            ("Tx/s", 'tx', self._auto_unit),
+            ("IOR/s", 'ior', self._auto_unit),
+            ("IOW/s", 'iow', self._auto_unit),
+        ]
+
+    def get_history_rows(self, view: ContainerSnapshot, width: int) -> List[List]:
+        """
+        Returns a row per metric of the container's history with its label, sparkline, latest and peak value
+        """
+        rows = []
+        for label, metric, fmt in self._get_history_metrics():
+            values = view.history.get(metric, width) if view.history else []
+            latest = fmt(values[-1]) if values else '-'
+            peak = fmt(max(values)) if values else '-'
+            rows.append([label, self.sparkline(values), latest, peak])
+        return rows
+
+    def get_stored_history_rows(self, points: Dict[str, List[Tuple[float, float, float, float]]],
+                                width: int) -> List[List]:
+        """
+        Returns a row per metric of the container's stored history (see `HistoryStore.query`) with its label, the
+        sparkline of the averages, the latest average and the peak maximum. The points are merged down to `width`.
+        """
+        rows = []
+        for label, metric, fmt in self._get_history_metrics():
+            metric_points = [p for p in points.get(metric, []) if p[2] is not None]
+            step = max(-(-len(metric_points) // max(width, 1)), 1)
+            chunks = [metric_points[i:i + step] for i in range(0, len(metric_points), step)]
+            averages = [sum(p[2] for p in chunk) / len(chunk) for chunk in chunks]
+            peak = max((p[3] for p in metric_points if p[3] is not None), default=None)
+            rows.append([label, self.sparkline(averages), fmt(averages[-1]) if averages else '-',
+                         fmt(peak) if peak is not None else '-'])
+        return rows
+
+    @staticmethod
+    def get_perf_rows(stats: Dict) -> List[List[str]]:
+        """
+        Returns a row per histogram of `Instrumentation.get_stats` with its count, p50, p99, max and mean. Durations
+        are shown in milliseconds, `*.api_calls` histograms as counts.
+        """
+        rows = []
+        for name, histogram in stats['histograms'].items():
+            fmt = (lambda v: format(v, ".0f")) if name.endswith('.api_calls') else (lambda v: format(v / 1000, ".2f"))
+            rows.append([name, str(histogram['count']), fmt(histogram['p50']), fmt(histogram['p99']),
+                         fmt(histogram['max']), fmt(histogram['mean'])])
+        return rows
+
+    @staticmethod
+    def get_perf_values(stats: Dict) -> List[List[str]]:
+        """
+        Returns a row per counter and gauge of `Instrumentation.get_stats` with its value. Gauges holding dicts of
+        dicts (ie: the connection pools per client) get a row per inner dict, named `<gauge>.<key>`.
+        """
+        rows = []
+        values = list(stats['counters'].items()) + list(stats['gauges'].items())
+        while values:
+            name, value = values.pop(0)
+            if isinstance(value, dict) and value and all(isinstance(v, dict) for v in value.values()):
+                values[:0] = [(f"{name}.{k}", v) for k, v in value.items()]
+                continue
+            if isinstance(value, dict):
+                value = ", ".join(f"{k} {format(v, '.1f') if isinstance(v, float) else v}" for k, v in value.items())
+            rows.append([name, str(value)])
+        return rows
+
+    @staticmethod
+    def sparkline(values: List[float], maximum: float = None) -> str:
+        """
+        Renders the values as a line of block characters, scaled to the given maximum or the peak of the values
+        """
+        maximum = maximum or max(values, default=0)
+        if maximum <= 0:
+            return SPARKLINE_BLOCKS[0] * len(values)
+        last_block = len(SPARKLINE_BLOCKS) - 1
+        return ''.join(SPARKLINE_BLOCKS[min(max(int(v / maximum * last_block), 0), last_block)] for v in values)
 
-    def _format_cpu_usage(self, stats: CPUStats) -> str:
+    def _format_cpu_usage(self, stats: CPUSnapshot) -> str:
         return format(stats.usage, ".2f") if stats else '_'
 
     @staticmethod
@@ -83,7 +227,7 @@ class RichFormatter:
                     precision = 0
                 return '{:.{decimal}f}{suffix}'.format(value, decimal=precision, suffix=suffix)
 
-        return '{!s}'.format(number)
+        return '{!s}'.format(int(number) if isinstance(number, float) else number)
 
     def _format_container_status(self, status) -> Text:
         status_styles = {
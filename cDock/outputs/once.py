@@ -0,0 +1,113 @@
+import csv
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, TextIO
+
+from cDock.config import Config
+from cDock.docker_client.one_shot import collect_snapshot
+from cDock.snapshot import ContainerSnapshot, Snapshot, SnapshotRecord
+
+FORMAT_TABLE = 'table'
+FORMAT_JSON = 'json'
+FORMAT_CSV = 'csv'
+FORMATS = [FORMAT_TABLE, FORMAT_JSON, FORMAT_CSV]
+
+# A single sample gives the CPU usage (the daemon includes the previous CPU counters) but no network or disk rates,
+# so only their totals are written
+CSV_COLUMNS = ['host', 'id', 'name', 'image', 'status', 'created_at', 'cpu_percent', 'cpu_cores', 'mem_usage',
+               'mem_limit', 'rx_total', 'tx_total', 'ior_total', 'iow_total']
+
+
+def to_json_value(value: Any) -> Any:
+    """
+    Converts the fields of a snapshot into JSON values: datetimes as ISO 8601, durations in seconds and records as
+    objects
+    """
+    if isinstance(value, SnapshotRecord):
+        return {name: to_json_value(getattr(value, name)) for name in value.__slots__ if name != 'history'}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return value
+
+
+def get_csv_row(view: ContainerSnapshot) -> Dict[str, Any]:
+    cpu, mem, net, disk = view.cpu_stats, view.memory_stats, view.net_io_stats, view.disk_io_stats
+    return {
+        'host': view.host or '',
+        'id': view.id,
+        'name': view.name,
+        'image': view.image,
+        'status': view.status,
+        'created_at': view.created_at.isoformat() if view.created_at else '',
+        'cpu_percent': format(cpu.usage, '.2f') if cpu else '',
+        'cpu_cores': cpu.cores if cpu else '',
+        'mem_usage': mem.usage if mem else '',
+        'mem_limit': mem.limit if mem else '',
+        'rx_total': net.total_rx if net else '',
+        'tx_total': net.total_tx if net else '',
+        'ior_total': disk.total_ior if disk else '',
+        'iow_total': disk.total_iow if disk else '',
+    }
+
+
+def write_json(snapshot: Snapshot, errors: Dict[str, str], file: TextIO) -> None:
+    json.dump({'timestamp': snapshot.timestamp, 'version': snapshot.version,
+               'containers': [to_json_value(view) for view in snapshot.container_views], 'errors': errors}, file)
+    file.write('\n')
+
+
+def write_csv(snapshot: Snapshot, file: TextIO) -> None:
+    writer = csv.DictWriter(file, CSV_COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(get_csv_row(view) for view in snapshot.container_views)
+
+
+def write_table(snapshot: Snapshot, config: Config, file: TextIO) -> None:
+    # Only the table needs rich
+    from rich import box
+    from rich.console import Console
+    from rich.table import Table
+
+    from cDock.outputs.formatter import RichFormatter
+
+    formatter = RichFormatter(config)
+    version = (snapshot.version or {}).get('Version', '')
+    table = Table(box=box.SIMPLE, header_style=config.tui_header_color,
+                  title=f"CONTAINERS ({len(snapshot.container_views)}) - cDock - Docker {version}")
+    for column in formatter.get_header_row():
+        table.add_column(column)
+    for view in snapshot.container_views:
+        table.add_row(*formatter.get_container_row(view))
+    Console(file=file).print(table)
+
+
+def run_once(config: Config, output_format: str = FORMAT_TABLE, file: TextIO = None) -> int:
+    """
+    Collects a single snapshot of the containers and writes it in the given format
+
+    :param config: The Config
+    :param output_format: One of FORMATS
+    :param file: Where the snapshot is written, stdout by default
+    :return: The exit status: 0 if all daemons were collected, 1 if some failed, 2 if none could be collected
+    """
+    if output_format not in FORMATS:
+        raise Exception(f"Unknown output format `{output_format}`")
+    file = file or sys.stdout
+
+    # The errors are logged by the collector
+    snapshot, errors = collect_snapshot(config)
+    if snapshot is None:
+        return 2
+
+    if output_format == FORMAT_JSON:
+        write_json(snapshot, errors, file)
+    elif output_format == FORMAT_CSV:
+        write_csv(snapshot, file)
+    else:
+        write_table(snapshot, config, file)
+    return 1 if errors else 0
@@ -1,104 +1,302 @@
-import fcntl
+import logging
 import os
+import re
+import selectors
 import sys
 import termios
 import time
-from threading import Thread
-from typing import List
+from typing import List, Optional, Set
 
+from cDock.alerts import AlertEngine, parse_rules
 from cDock.config import Config
-from cDock.docker_client import DockerDaemonClient
-from cDock.models import ContainerView
+from cDock.docker_client import create_client
+from cDock.docker_client.container_actions import ActionBatch
+from cDock.instrumentation import get_thread_count, instruments, summarize_ages
+from cDock.metrics_history import MetricsHistory
+from cDock.snapshot import ContainerSnapshot
 from cDock.outputs.screen import cDockRichScreen
+from cDock.outputs.table_index import ContainerTableIndex
 
 
 class cDockStandalone:
     DEFAULT_REFRESH_TIME = 0.5
+    # Seconds the result of the last container actions stays in the title once they finished
+    ACTION_STATUS_TIME = 10
+    # Escape sequences sent by terminals for the navigation keys, mapped to key names
+    ESCAPE_SEQUENCES = {
+        '\x1b[A': 'up',
+        '\x1b[B': 'down',
+        '\x1b[5~': 'page_up',
+        '\x1b[6~': 'page_down',
+        '\x1b[H': 'home',
+        '\x1b[1~': 'home',
+        '\x1b[F': 'end',
+        '\x1b[4~': 'end',
+    }
+    # Other CSI (ESC [, parameter and intermediate bytes, a final byte) and SS3 (ESC O and a character) sequences,
+    # dropped as a whole so their characters are not taken for key strokes. A lone ESC is a key stroke.
+    UNKNOWN_SEQUENCE_PATTERN = re.compile(r'\x1b(?:\[[\x30-\x3f]*[\x20-\x2f]*(?:[\x40-\x7e]|$)|O.)', re.DOTALL)
+    # Seconds of stored history shown by the history panel's second view
+    STORED_HISTORY_RANGE = 24 * 3600
+    SORT_KEYS = {
+        'c': ContainerTableIndex.SORT_CPU,
+        'm': ContainerTableIndex.SORT_MEMORY,
+        'i': ContainerTableIndex.SORT_IO,
+        'n': ContainerTableIndex.SORT_NAME,
+    }
 
-    def __init__(self):
-        self.config = Config.load_env_from_file()
+    def __init__(self, config: Config = None):
+        self.config = config or Config.load_env_from_file()
         self.screen = cDockRichScreen(self.config)
-        self.client = DockerDaemonClient(self.config)
+        self.client = create_client(self.config)
 
         self.row_index = 0
         self._changed = True
         self.last_stats_update_timestamp = 0
+        self.last_render_timestamp = 0
 
-        self.container_views: List[ContainerView] = []
+        self.refresh_time = self.config.tui_refresh_interval or self.DEFAULT_REFRESH_TIME
+        self.frame_time = 1 / self.config.tui_max_fps if self.config.tui_max_fps else 0
+
+        self.container_views: List[ContainerSnapshot] = []
+        # Sorts and filters the containers, `container_views` holds the listed ones in order
+        self.table_index = ContainerTableIndex()
+        self.filter_mode = False
+        # Containers selected for bulk actions, and the progress of the last actions
+        self.marked_keys: Set[str] = set()
+        self.action_batch = None
+        # Evaluates the alert rules on every refresh, the containers with a firing alert are highlighted
+        self.alert_engine = AlertEngine(parse_rules(self.config.alert_rules), self.config.alert_command)
+        self.alert_keys: Set[str] = set()
+        # The stored history view, queried again when another container is selected or new samples were written
+        self.show_stored_history = False
+        self.stored_history_key = None
+        self.stored_history_timestamp = 0
+        # The performance overlay, shown with the stats of the probes refreshed with the table
+        self.show_perf = False
+        if self.config.instrumentation:
+            instruments.enabled = True
+        instruments.add_gauge('threads', get_thread_count)
+        instruments.add_gauge('stream_sample_age', lambda: summarize_ages(self.client.get_sample_ages()))
+        instruments.add_gauge('connection_pools', self.client.get_pool_stats)
 
         self.is_running = True
-        self.key_press_listener_thread = Thread(target=self.key_strokes_listener, args=())
+
+        # The reactor waits on stdin and on a wakeup pipe, written to when the client reports changes
+        self.selector = selectors.DefaultSelector()
+        self._wakeup_read_fd, self._wakeup_write_fd = os.pipe()
+        os.set_blocking(self._wakeup_read_fd, False)
+        os.set_blocking(self._wakeup_write_fd, False)
+        self._stats_changed = False
 
     def run(self):
         self.client.connect()
-        self.client.get_version_and_container_views()
+        self.client.add_change_listener(self.notify_stats_changed)
 
         self.screen.init_screen()
-        self.key_press_listener_thread.start()
+        terminal_attributes = self.enter_cbreak_mode()
+        self.selector.register(self._wakeup_read_fd, selectors.EVENT_READ)
 
-        while self.is_running:
-            try:
-                if self._changed or self.is_after_refresh_window():
-                    if self.is_after_refresh_window():
-                        self.update_stats()
+        try:
+            self.update_stats()
+            while self.is_running:
+                for key, _ in self.selector.select(self.get_wait_timeout()):
+                    if key.fd == self._wakeup_read_fd:
+                        self.drain_wakeups()
+                    else:
+                        self.read_key_strokes(key.fd)
 
-                    self.screen.render()
-            except KeyboardInterrupt:
-                self.shutdown()
-            except Exception as e:
-                self.shutdown()
-                raise e
+                if self._stats_changed or self.is_after_refresh_window():
+                    self.update_stats()
+                if self._changed and self.is_after_frame_window():
+                    self.render()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.exit_cbreak_mode(terminal_attributes)
+            self.shutdown()
+            self.selector.close()
+            os.close(self._wakeup_read_fd)
+            os.close(self._wakeup_write_fd)
 
     def is_after_refresh_window(self):
-        return time.time() - self.last_stats_update_timestamp > self.DEFAULT_REFRESH_TIME
+        return time.time() - self.last_stats_update_timestamp > self.refresh_time
+
+    def is_after_frame_window(self):
+        return time.time() - self.last_render_timestamp >= self.frame_time
+
+    def get_wait_timeout(self) -> float:
+        """
+        Returns how long the reactor can sleep: until the next refresh, or until the next frame if a render is pending
+        """
+        now = time.time()
+        timeout = self.last_stats_update_timestamp + self.refresh_time - now
+        if self._changed:
+            timeout = min(timeout, self.last_render_timestamp + self.frame_time - now)
+        return max(timeout, 0)
+
+    def render(self):
+        self.screen.render()
+        self._changed = False
+        self.last_render_timestamp = time.time()
+
+    def notify_stats_changed(self):
+        """
+        Wakes up the reactor to refresh the stats. Safe to call from any thread.
+        """
+        try:
+            os.write(self._wakeup_write_fd, b'\0')
+        except BlockingIOError:
+            pass  # A wakeup is already pending
+
+    def drain_wakeups(self):
+        try:
+            while os.read(self._wakeup_read_fd, 1024):
+                pass
+        except BlockingIOError:
+            pass
+        self._stats_changed = True
 
     def update_stats(self):
-        stats = self.client.get_version_and_container_views()
+        api_calls = instruments.get_counter('api.calls')
+        with instruments.timer('refresh.total'):
+            stats = self.client.get_version_and_container_views()
+            if 'container_views' in stats:
+                self.table_index.update(stats['container_views'])
+                with instruments.timer('refresh.alerts'):
+                    self.alert_engine.update(stats['container_views'])
+                self.alert_keys = set(self.alert_engine.get_firing())
+            self.update_table()
+        instruments.record('refresh.api_calls', instruments.get_counter('api.calls') - api_calls)
+        if self.show_perf:
+            self.screen.set_perf_stats(instruments.get_stats())
+        self.last_stats_update_timestamp = time.time()
+        self._stats_changed = False
+
+    def update_table(self):
+        """
+        Lists the containers from the table index, keeping the same container selected if it is still listed
+        """
         row_key = self.get_row_key()
-        self.container_views = stats['container_views']
+        self.container_views = self.table_index.get_views()
+        self.row_index = next((i for i, view in enumerate(self.container_views) if view.id == row_key), 0)
+        with instruments.timer('render.table'):
+            self.screen.update_container_table(self.container_views, self.row_index, self.get_table_status(),
+                                               self.marked_keys, self.alert_keys)
+        self.update_visible_containers()
+        self.update_stored_history()
+        self._changed = True
 
-        # Update row index to keep the same container selected
-        self.row_index = 0
-        for i, view in enumerate(self.container_views):
-            if view.id == row_key:
-                self.row_index = i
-                break
+    def get_marked_keys(self) -> List[str]:
+        """
+        Returns the listed containers which are selected for bulk actions, hidden ones (ie: filtered) are left out
+        """
+        if not self.marked_keys:
+            return []
+        return [view.id for view in self.container_views if view.id in self.marked_keys]
 
-        self.screen.update_container_table(self.container_views, self.row_index)
-        self.last_stats_update_timestamp = time.time()
+    def get_table_status(self) -> str:
+        status = []
+        marked_count = len(self.get_marked_keys())
+        if marked_count:
+            status.append(f"{marked_count} selected")
+        if self.alert_keys:
+            status.append(f"{len(self.alert_keys)} alerting")
+        stale_count = sum(1 for view in self.container_views if view.stale)
+        if stale_count:
+            status.append(f"{stale_count} stale")
+        batch = self.action_batch
+        if batch and (not batch.is_finished() or time.monotonic() - batch.finished_at < self.ACTION_STATUS_TIME):
+            status.append(str(batch))
+        if self.table_index.sort != ContainerTableIndex.SORT_CREATED:
+            status.append(f"sorted by {self.table_index.sort}")
+        if self.table_index.filter_text:
+            status.append(f"filter `{self.table_index.filter_text}` ({len(self.table_index)} total)")
+        return ", ".join(status)
+
+    def update_visible_containers(self):
+        """
+        Tells the client which containers are on screen, only those and the selected one are streamed at full rate
+        """
+        visible_keys = {view.id for view in self.screen.visible_views}
+        if self.container_views:
+            visible_keys.add(self.get_row_key())
+        self.client.set_visible_containers(visible_keys)
 
     def get_row_key(self):
         return self.container_views[self.row_index].id if self.container_views else ''
 
-    def key_strokes_listener(self):
+    def enter_cbreak_mode(self) -> Optional[List]:
+        """
+        Disables line buffering and echo on stdin and registers it with the reactor.
+
+        :return: The previous terminal attributes, None if stdin is not a terminal
+        """
+        if not sys.stdin.isatty():
+            return None
+
         fd = sys.stdin.fileno()
         oldterm = termios.tcgetattr(fd)
         newattr = termios.tcgetattr(fd)
         newattr[3] = newattr[3] & ~termios.ICANON & ~termios.ECHO
         termios.tcsetattr(fd, termios.TCSANOW, newattr)
 
-        oldflags = fcntl.fcntl(fd, fcntl.F_GETFL)
-        fcntl.fcntl(fd, fcntl.F_SETFL, oldflags | os.O_NONBLOCK)
+        self.selector.register(fd, selectors.EVENT_READ)
+        return oldterm
 
-        try:
-            while self.is_running:
-                try:
-                    char = sys.stdin.read(1)
-                    if not char:
-                        continue
-                    self.handle_key_stroke(char)
-                except IOError:
-                    pass
+    def exit_cbreak_mode(self, terminal_attributes: Optional[List]):
+        if terminal_attributes is not None:
+            termios.tcsetattr(sys.stdin.fileno(), termios.TCSAFLUSH, terminal_attributes)
 
-        finally:
-            termios.tcsetattr(fd, termios.TCSAFLUSH, oldterm)
-            fcntl.fcntl(fd, fcntl.F_SETFL, oldflags)
+    def read_key_strokes(self, fd: int):
+        data = os.read(fd, 1024)
+        if not data:
+            # stdin was closed
+            self.selector.unregister(fd)
+            return
+        for key in self.split_key_strokes(data.decode('utf-8', errors='ignore')):
+            self.handle_key_stroke(key)
+
+    @classmethod
+    def split_key_strokes(cls, text: str) -> List[str]:
+        """
+        Splits the input into key strokes, the known escape sequences being returned as their key names and the
+        unknown ones dropped
+        """
+        keys, i = [], 0
+        while i < len(text):
+            if text[i] == '\x1b':
+                sequence = next((s for s in cls.ESCAPE_SEQUENCES if text.startswith(s, i)), None)
+                if sequence:
+                    keys.append(cls.ESCAPE_SEQUENCES[sequence])
+                    i += len(sequence)
+                    continue
+                match = cls.UNKNOWN_SEQUENCE_PATTERN.match(text, i)
+                if match:
+                    i = match.end()
+                    continue
+            keys.append(text[i])
+            i += 1
+        return keys
 
     def handle_key_stroke(self, key_pressed: str):
-        if key_pressed == "w":
+        if self.filter_mode:
+            self.handle_filter_key_stroke(key_pressed)
+            return
+
+        page_size = self.screen.get_visible_row_count()
+        if key_pressed in ("w", "up"):
             self._update_row_index(self.row_index - 1)
-        elif key_pressed == "s":
+        elif key_pressed in ("s", "down"):
             self._update_row_index(self.row_index + 1)
+        elif key_pressed == "page_up":
+            self._update_row_index(max(self.row_index - page_size, 0))
+        elif key_pressed == "page_down":
+            self._update_row_index(min(self.row_index + page_size, len(self.container_views) - 1))
+        elif key_pressed in ("g", "home"):
+            self._update_row_index(0)
+        elif key_pressed in ("G", "end"):
+            self._update_row_index(len(self.container_views) - 1)
         elif key_pressed == "q":
             self.shutdown()
         elif key_pressed == '1':
@@ -113,25 +311,159 @@ class cDockStandalone:
             self.container_action('pause')
         elif key_pressed == '6':
             self.container_action('resume')
+        elif key_pressed == ' ':
+            self.toggle_marked(self.get_row_key())
+        elif key_pressed == 'A':
+            self.toggle_marked_all()
+        elif key_pressed in self.SORT_KEYS:
+            # Pressing the key of the current sort goes back to the default order
+            sort = self.SORT_KEYS[key_pressed]
+            self.table_index.set_sort(ContainerTableIndex.SORT_CREATED if sort == self.table_index.sort else sort)
+            self.update_table()
+        elif key_pressed == '/':
+            self.filter_mode = True
+            self.screen.filter_prompt = self.table_index.filter_text
+            self._changed = True
+        elif key_pressed == 'h':
+            self.cycle_history_view()
+            self.screen.update_container_table(self.container_views, self.row_index, self.get_table_status(),
+                                               self.marked_keys, self.alert_keys)
+            self.update_visible_containers()
+            self.update_stored_history()
+            self._changed = True
+        elif key_pressed == 'p':
+            self.toggle_perf_overlay()
+        elif key_pressed == 'P':
+            self.dump_instrumentation()
+
+    def toggle_perf_overlay(self):
+        """
+        Shows or hides the performance overlay. Instrumentation is enabled on first use if INSTRUMENTATION is not set,
+        and stays enabled so the measurements keep accumulating.
+        """
+        self.show_perf = not self.show_perf
+        if self.show_perf:
+            instruments.enabled = True
+        self.screen.set_perf_stats(instruments.get_stats() if self.show_perf else None)
+        self._update_row_index()
+
+    def dump_instrumentation(self):
+        path = self.config.instrumentation_dump_path
+        if not path:
+            return
+        try:
+            instruments.dump(path)
+            logging.info(f"cDockStandalone - Instrumentation written to {path}")
+        except OSError as e:
+            logging.error(f"cDockStandalone - Failed to write the instrumentation to {path} ({e})")
+
+    def cycle_history_view(self):
+        """
+        Shows the live history panel, then the stored history (if HISTORY_DB_PATH is set), then hides the panel
+        """
+        if not self.screen.show_history:
+            self.screen.toggle_history()
+        elif not self.show_stored_history and self.client.has_history_store():
+            self.show_stored_history = True
+            self.stored_history_key = None
+        else:
+            self.screen.toggle_history()
+            self.show_stored_history = False
+            self.screen.stored_history = None
+
+    def update_stored_history(self):
+        """
+        Queries the stored history of the selected container, at most once per flush of the store unless another
+        container is selected
+        """
+        if not self.show_stored_history:
+            return
+        row_key = self.get_row_key()
+        now = time.time()
+        if row_key == self.stored_history_key and \
+                now - self.stored_history_timestamp < self.config.history_db_flush_interval:
+            return
+
+        self.stored_history_key, self.stored_history_timestamp = row_key, now
+        self.screen.stored_history_range = self.STORED_HISTORY_RANGE
+        self.screen.stored_history = {}
+        if row_key:
+            start = now - self.STORED_HISTORY_RANGE
+            try:
+                self.screen.stored_history = {metric: self.client.query_history(row_key, metric, start, now)
+                                              for metric in MetricsHistory.METRICS}
+            except Exception as e:
+                logging.error(f"cDockStandalone - Failed to query the stored history of {row_key} ({e})")
+        self._changed = True
+
+    def handle_filter_key_stroke(self, key_pressed: str):
+        """
+        Edits the filter as it is typed. Enter keeps the filter, Escape clears it.
+        """
+        filter_text = self.table_index.filter_text
+        if key_pressed in ('\n', '\r', '\x1b'):
+            self.filter_mode = False
+            self.screen.filter_prompt = None
+            if key_pressed == '\x1b':
+                filter_text = ''
+        elif key_pressed in ('\x7f', '\x08'):
+            filter_text = filter_text[:-1]
+        elif len(key_pressed) == 1 and key_pressed.isprintable():
+            filter_text += key_pressed
+
+        if self.filter_mode:
+            self.screen.filter_prompt = filter_text
+        self.table_index.set_filter(filter_text)
+        self.update_table()
+
+    def toggle_marked(self, container_key: str):
+        if container_key:
+            self.marked_keys ^= {container_key}
+            self.update_table()
+
+    def toggle_marked_all(self):
+        """
+        Selects all listed containers, or clears the selection if they are all selected already
+        """
+        listed_keys = {view.id for view in self.container_views}
+        if listed_keys <= self.marked_keys:
+            self.marked_keys.clear()
+        else:
+            self.marked_keys |= listed_keys
+        self.update_table()
 
     def _update_row_index(self, index: int = None):
         if index is None:
             index = self.row_index
         self.row_index = index % max(len(self.container_views), 1)
+        self.screen.update_container_table(self.container_views, self.row_index, self.get_table_status(),
+                                           self.marked_keys, self.alert_keys)
+        self.update_visible_containers()
+        self.update_stored_history()
         self._changed = True
 
     def container_action(self, action_name: str):
-        key = self.get_row_key()
-        if not key or action_name not in ['start', 'stop', 'restart', 'kill', 'pause', 'resume']:
+        """
+        Runs the action for the selected containers, or for the container of the current row if none is selected
+        """
+        keys = self.get_marked_keys() or ([self.get_row_key()] if self.container_views else [])
+        if not keys or action_name not in ['start', 'stop', 'restart', 'kill', 'pause', 'resume']:
             return
         try:
-            action = getattr(self.client, action_name)
-            action(key)
+            self.action_batch = self.client.run_actions(action_name, keys)
         except Exception as e:
-            print(e)
+            logging.error(f"cDockStandalone - Failed to {action_name} {len(keys)} container(s) ({e})")
+            # Shown as failed in the table title
+            self.action_batch = ActionBatch(action_name, len(keys))
+            for key in keys:
+                self.action_batch.failed(key, str(e))
+        self.marked_keys.clear()
+        self.update_table()
 
     def shutdown(self):
         if self.is_running:
             self.is_running = False
             self.screen.stop()
             self.client.disconnect()
+            if instruments.enabled:
+                self.dump_instrumentation()
@@ -1,11 +1,16 @@
+from typing import Collection, Dict, List, Optional
+
 from rich import box
 from rich.console import Console
 from rich.layout import Layout
 from rich.live import Live
+from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
 from cDock.config import Config
+from cDock.instrumentation import instruments
+from cDock.metrics_history import MetricsHistory
 from cDock.outputs.formatter import RichFormatter
 
 
@@ -15,8 +20,22 @@ class cDockRichScreen:
         self.console = Console()
 
         self.split_view = False
+        self.show_history = False
+        # Metric -> stored (timestamp, min, average, max) points of the selected container over
+        # `stored_history_range` seconds, shown in the history panel instead of the live history when set
+        self.stored_history = None
+        self.stored_history_range = 0
         self.container_table = Table()
+        self.selected_view = None
+        # Only the rows from `scroll_offset` which fit on the screen are formatted and laid out
+        self.scroll_offset = 0
+        self.visible_views = []
+        # The filter being typed, shown instead of the key bindings
+        self.filter_prompt = None
         self.formatter = RichFormatter(config)
+        # The histogram rows and the counter and gauge rows of the performance overlay, hidden when None
+        self.perf_rows: Optional[List[List[str]]] = None
+        self.perf_values: List[List[str]] = []
 
         self.live = Live(console=self.console, screen=True)
 
@@ -24,32 +43,119 @@ class cDockRichScreen:
         self.live.start(False)
 
     def render(self):
-        self.live.update(self.prepare_layout())
+        with instruments.timer('render.layout'):
+            layout = self.prepare_layout()
+        with instruments.timer('render.live'):
+            self.live.update(layout)
 
     def prepare_layout(self):
         layout = Layout()
-        layout.split(
+        layouts = [
             # Layout(name="header", size=2),
             Layout(name="main"),
             Layout(name="footer", size=1),
-        )
+        ]
+        if self.show_history:
+            layouts.insert(1, Layout(name="history", size=len(MetricsHistory.METRICS) + 2))
+        if self.perf_rows is not None:
+            layouts.insert(1, Layout(name="perf", size=self.get_perf_overlay_height()))
+        layout.split(*layouts)
 
         layout['main'].update(self.container_table)
+        if self.show_history:
+            layout['history'].update(self.prepare_history())
+        if self.perf_rows is not None:
+            layout['perf'].update(self.prepare_perf_overlay())
         layout['footer'].update(self.prepare_footer())
         return layout
 
+    def get_visible_row_count(self) -> int:
+        """
+        Returns the number of container rows which fit on the screen, below the table's title and header and above the
+        history panel and footer
+        """
+        # Title, top padding, header, header separator and bottom padding of the table, and the footer
+        reserved = 6 + (len(MetricsHistory.METRICS) + 2 if self.show_history else 0)
+        reserved += self.get_perf_overlay_height() if self.perf_rows is not None else 0
+        return max(self.console.height - reserved, 1)
+
+    def prepare_history(self):
+        if not self.selected_view:
+            return Panel("No container selected", title="History")
+
+        # Leaving space for the label, latest and peak columns
+        width = max(self.console.width - 40, 10)
+        grid = Table.grid(padding=(0, 2))
+        grid.add_column(style=self.config.tui_header_color)
+        grid.add_column()
+        grid.add_column(justify="right")
+        grid.add_column(justify="right")
+        if self.stored_history is not None:
+            rows = self.formatter.get_stored_history_rows(self.stored_history, width)
+            hours = self.stored_history_range / 3600
+            title = f"Last {hours:g}h - {self.selected_view.name}"
+        else:
+            rows = self.formatter.get_history_rows(self.selected_view, width)
+            title = f"History - {self.selected_view.name}"
+        for row in rows:
+            grid.add_row(*row)
+        return Panel(grid, title=title, subtitle="latest / peak")
+
+    def set_perf_stats(self, stats: Optional[Dict]) -> None:
+        """
+        Shows the stats of the Instrumentation in the performance overlay, hides the overlay if None
+        """
+        self.perf_rows = None if stats is None else self.formatter.get_perf_rows(stats)
+        self.perf_values = [] if stats is None else self.formatter.get_perf_values(stats)
+
+    def get_perf_overlay_height(self) -> int:
+        # The histograms have a header row, the panel a border above and below
+        return max(len(self.perf_rows) + 1, len(self.perf_values)) + 2
+
+    def prepare_perf_overlay(self):
+        histograms = Table.grid(padding=(0, 2))
+        histograms.add_column(style=self.config.tui_header_color)
+        for _ in range(5):
+            histograms.add_column(justify="right")
+        histograms.add_row("ms", "count", "p50", "p99", "max", "mean", style=self.config.tui_header_color)
+        for row in self.perf_rows:
+            histograms.add_row(*row)
+
+        values = Table.grid(padding=(0, 2))
+        values.add_column(style=self.config.tui_header_color)
+        values.add_column()
+        for row in self.perf_values:
+            values.add_row(*row)
+
+        grid = Table.grid(padding=(0, 4))
+        grid.add_row(histograms, values)
+        return Panel(grid, title="Performance", subtitle="P to dump")
+
+    def toggle_history(self):
+        self.show_history = not self.show_history
+
     def prepare_footer(self):
+        if self.filter_prompt is not None:
+            text = Text("Filter: ", style=self.config.tui_header_color)
+            text.append(self.filter_prompt)
+            text.append(" ", style="black on cyan")
+            return text
+
         grid = Table.grid(padding=(1, 1))
 
         options_dict = {
-            "w": "Up     ",
-            "s": "Down   ",
+            "w/s": "Up/Down",
+            "␣/A": "Select ",
             "1": "Start  ",
             "2": "Stop   ",
             "3": "Restart",
             "4": "Kill   ",
             "5": "Pause  ",
             "6": "Resume ",
+            "h": "History",
+            "p": "Perf   ",
+            "c/m/i/n": "Sort   ",
+            "/": "Filter ",
             "q": "Quit   "
         }
         rendering_list = []
@@ -63,19 +169,70 @@ class cDockRichScreen:
         grid.add_row(*rendering_list)
         return grid
 
-    def update_container_table(self, container_views, index):
+    def scroll_to(self, index: int, row_count: int) -> int:
+        """
+        Moves the scroll window as little as possible to show the row at `index`, keeping the window full if possible.
+
+        :param index: The selected row
+        :param row_count: The total number of rows
+        :return: The new scroll offset
+        """
+        visible_rows = self.get_visible_row_count()
+        if index < self.scroll_offset:
+            self.scroll_offset = index
+        elif index >= self.scroll_offset + visible_rows:
+            self.scroll_offset = index - visible_rows + 1
+        self.scroll_offset = max(min(self.scroll_offset, row_count - visible_rows), 0)
+        return self.scroll_offset
+
+    def get_scroll_indicator(self, row_count: int) -> str:
+        """
+        Returns the range of the rows shown, with arrows if rows are hidden above or below, empty if all rows fit
+        """
+        first, last = self.scroll_offset, self.scroll_offset + len(self.visible_views)
+        if first == 0 and last >= row_count:
+            return ""
+        return f"{'▲' if first > 0 else ' '} {first + 1}-{last} of {row_count} {'▼' if last < row_count else ' '}"
+
+    def update_container_table(self, container_views, index, status: str = '', marked_keys: Collection[str] = (),
+                               alert_keys: Collection[str] = ()):
+        """
+        Builds the table of the containers in the scroll window around the selected row
+
+        :param container_views: The views of all listed containers, in order
+        :param index: The selected row
+        :param status: Shown in the title, ie: the sort and filter of the table
+        :param marked_keys: The IDs of the containers selected for bulk actions
+        :param alert_keys: The IDs of the containers with a firing alert
+        """
+        offset = self.scroll_to(index, len(container_views))
+        self.visible_views = container_views[offset:offset + self.get_visible_row_count()]
+
         title = f"CONTAINERS ({len(container_views)}) - cDock"
+        if status:
+            title = f"{title} - {status}"
+        scroll_indicator = self.get_scroll_indicator(len(container_views))
+        if scroll_indicator:
+            title = f"{title} {scroll_indicator}"
         table = Table(box=box.SIMPLE, header_style=self.config.tui_header_color, expand=True, title=title)
         for i, column in enumerate(self.formatter.get_header_row()):
             table.add_column(column)
 
-        for i, view in enumerate(container_views):
+        self.formatter.prune(view.id for view in container_views)
+        for i, view in enumerate(self.visible_views, offset):
             row = self.formatter.get_container_row(view)
             if i == index:
                 table.add_row(*row, style=self.config.selected_row_style)
+            elif view.id in marked_keys:
+                table.add_row(*row, style=self.config.marked_row_style)
+            elif view.id in alert_keys:
+                table.add_row(*row, style=self.config.alert_row_style)
+            elif view.stale:
+                table.add_row(*row, style=self.config.stale_row_style)
             else:
                 table.add_row(*row)
         self.container_table = table
+        self.selected_view = container_views[index] if 0 <= index < len(container_views) else None
 
     def stop(self):
         self.live.stop()
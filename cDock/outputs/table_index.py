@@ -0,0 +1,161 @@
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from cDock.snapshot import ContainerSnapshot
+
+
+def get_io_rate(view: ContainerSnapshot) -> Optional[float]:
+    """
+    Returns the sum of the network and disk IO rates of the container, None if none is known
+    """
+    rates = []
+    if view.net_io_stats:
+        rates += [view.net_io_stats.rx_rate, view.net_io_stats.tx_rate]
+    if view.disk_io_stats:
+        rates += [view.disk_io_stats.ior_rate, view.disk_io_stats.iow_rate]
+    rates = [rate for rate in rates if rate is not None]
+    return sum(rates) if rates else None
+
+
+class ContainerTableIndex:
+    """
+    Keeps the container views of the table sorted and filtered. The sort keys of all containers are held in a sorted
+    list, and on a refresh where few sort keys changed (ie: sorted by creation or name, while containers come and go)
+    only those containers are moved (bisect). Moving one costs a shift of the list, so when more than
+    `REBUILD_FRACTION` of the keys changed (ie: sorted by a stat, which changes with every sample) the list is sorted
+    again at once instead. The filter is matched again only for containers whose name, image or status changed, or
+    when the filter itself changes.
+
+    Containers without a value for the sort key (ie: no stats yet) are listed last, ties are broken by container ID.
+    """
+
+    SORT_CREATED = 'created'
+    SORT_CPU = 'cpu'
+    SORT_MEMORY = 'mem'
+    SORT_IO = 'io'
+    SORT_NAME = 'name'
+    # Above this fraction of changed sort keys, a sort of the whole list is cheaper than moving them one by one
+    REBUILD_FRACTION = 0.2
+
+    # Sort -> (value of a view, descending)
+    SORTS: Dict[str, Tuple[Callable[[ContainerSnapshot], Union[float, str, None]], bool]] = {
+        SORT_CREATED: (lambda view: view.created_at.timestamp() if view.created_at else None, True),
+        SORT_CPU: (lambda view: view.cpu_stats.usage if view.cpu_stats else None, True),
+        SORT_MEMORY: (lambda view: view.memory_stats.usage if view.memory_stats else None, True),
+        SORT_IO: (get_io_rate, True),
+        SORT_NAME: (lambda view: view.name.lower() if view.name else None, False),
+    }
+
+    def __init__(self, sort: str = SORT_CREATED, filter_text: str = ''):
+        """
+        :param sort: One of SORTS, the newest containers come first by default, like the daemon lists them
+        :param filter_text: Only containers with this text in their name, image or status are listed
+        """
+        if sort not in self.SORTS:
+            raise Exception(f"Unknown sort `{sort}`")
+        self.sort = sort
+        self.filter_text = filter_text
+
+        self.__views: Dict[str, ContainerSnapshot] = {}
+        # Container ID -> its sort key, and all sort keys in order. A sort key ends with the container ID.
+        self.__sort_keys: Dict[str, Tuple] = {}
+        self.__order: List[Tuple] = []
+        # Container ID -> the fields the filter is matched against, and whether they match
+        self.__filter_fields: Dict[str, Tuple[str, ...]] = {}
+        self.__matches: Dict[str, bool] = {}
+
+    def __len__(self) -> int:
+        return len(self.__views)
+
+    def __get_sort_key(self, view: ContainerSnapshot) -> Tuple:
+        get_value, descending = self.SORTS[self.sort]
+        value = get_value(view)
+        if value is None:
+            return True, 0 if descending else '', view.id
+        return False, -value if descending else value, view.id
+
+    def __match(self, fields: Tuple[str, ...]) -> bool:
+        text = self.filter_text.lower()
+        return not text or any(text in field.lower() for field in fields if field)
+
+    def __remove(self, container_id: str) -> Tuple:
+        """
+        Forgets the container and returns its sort key, which is left in the order for the caller to remove
+        """
+        self.__views.pop(container_id)
+        self.__filter_fields.pop(container_id)
+        self.__matches.pop(container_id)
+        return self.__sort_keys.pop(container_id)
+
+    def update(self, views: Iterable[ContainerSnapshot]) -> None:
+        """
+        Applies a refresh: adds new containers, moves the ones whose sort key changed and removes the ones missing
+        from `views`.
+
+        :param views: The views of all containers
+        """
+        seen = set()
+        # The (previous, new) sort keys of the containers which moved, None for additions and removals
+        moves: List[Tuple[Optional[Tuple], Optional[Tuple]]] = []
+        for view in views:
+            container_id = view.id
+            seen.add(container_id)
+            self.__views[container_id] = view
+
+            sort_key = self.__get_sort_key(view)
+            previous_key = self.__sort_keys.get(container_id)
+            if sort_key != previous_key:
+                moves.append((previous_key, sort_key))
+                self.__sort_keys[container_id] = sort_key
+
+            fields = (view.name, view.image, view.status)
+            if self.__filter_fields.get(container_id) != fields:
+                self.__filter_fields[container_id] = fields
+                self.__matches[container_id] = self.__match(fields)
+
+        for container_id in [i for i in self.__views if i not in seen]:
+            moves.append((self.__remove(container_id), None))
+
+        if len(moves) > len(self.__order) * self.REBUILD_FRACTION:
+            self.__order = sorted(self.__sort_keys.values())
+            return
+        for previous_key, sort_key in moves:
+            if previous_key is not None:
+                del self.__order[bisect_left(self.__order, previous_key)]
+            if sort_key is not None:
+                insort(self.__order, sort_key)
+
+    def set_sort(self, sort: str) -> None:
+        """
+        Changes the sort, which sorts all containers once
+        """
+        if sort not in self.SORTS:
+            raise Exception(f"Unknown sort `{sort}`")
+        if sort == self.sort:
+            return
+        self.sort = sort
+        self.__sort_keys = {container_id: self.__get_sort_key(view) for container_id, view in self.__views.items()}
+        self.__order = sorted(self.__sort_keys.values())
+
+    def set_filter(self, filter_text: str) -> None:
+        """
+        Changes the filter, which matches all containers once
+        """
+        if filter_text == self.filter_text:
+            return
+        self.filter_text = filter_text
+        self.__matches = {container_id: self.__match(fields) for container_id, fields in self.__filter_fields.items()}
+
+    def get_views(self, limit: Optional[int] = None) -> List[ContainerSnapshot]:
+        """
+        Returns the views matching the filter in order, ie: the top `limit` consumers when sorted by a stat
+
+        :param limit: The maximum number of views returned, all if None
+        """
+        views = []
+        for sort_key in self.__order:
+            if limit is not None and len(views) >= limit:
+                break
+            if self.__matches[sort_key[-1]]:
+                views.append(self.__views[sort_key[-1]])
+        return views
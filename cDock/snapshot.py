@@ -0,0 +1,136 @@
+import re
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from cDock.models import ContainerView
+
+# Docker reports nanoseconds, datetime only accepts up to microseconds
+TIMESTAMP_FRACTION_PATTERN = re.compile(r'(\.\d{1,6})\d*')
+
+
+def parse_docker_timestamp(timestamp_str: str) -> datetime:
+    """
+    Converts a Docker API timestamp (RFC 3339 with nanoseconds) into a timezone aware datetime.
+
+    :param timestamp_str: The timestamp, ie: `2021-10-01T00:00:00.123456789Z`
+    :return: The corresponding datetime
+    """
+    timestamp_str = TIMESTAMP_FRACTION_PATTERN.sub(r'\1', timestamp_str.replace('Z', '+00:00'), count=1)
+    timestamp = datetime.fromisoformat(timestamp_str)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+class SnapshotRecord:
+    """
+    A plain record with `__slots__`, used on the refresh path instead of pydantic models. Records carry the same
+    attribute names as their `model`, which is only built (and validated) on demand through `to_model`. The model is
+    named rather than referenced, so pydantic is only imported by the code paths building models.
+    """
+    __slots__ = ()
+    model = None
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_model(self):
+        from cDock import models
+        fields = {name: value.to_model() if isinstance(value, SnapshotRecord) else value
+                  for name, value in self.to_dict().items() if value is not None}
+        return getattr(models, self.model)(**fields)
+
+
+class CPUSnapshot(SnapshotRecord):
+    __slots__ = ('usage', 'cores')
+    model = 'CPUStats'
+
+
+class MemorySnapshot(SnapshotRecord):
+    __slots__ = ('usage', 'limit', 'cache', 'max_usage')
+    model = 'MemoryStats'
+
+
+class NetIOSnapshot(SnapshotRecord):
+    __slots__ = ('total_rx', 'total_tx', 'read_time', 'rx', 'tx', 'duration', 'rx_rate', 'tx_rate')
+    model = 'NetIOStats'
+
+
+class DiskIOSnapshot(SnapshotRecord):
+    __slots__ = ('total_ior', 'total_iow', 'read_time', 'ior', 'iow', 'duration', 'ior_rate', 'iow_rate')
+    model = 'DiskIOStats'
+
+
+class ContainerSnapshot(SnapshotRecord):
+    __slots__ = ('status', 'name', 'id', 'image', 'cpu_stats', 'memory_stats', 'net_io_stats', 'disk_io_stats',
+                 'created_at', 'started_at', 'published_ports', 'command', 'history', 'host', 'stale')
+    model = 'ContainerView'
+
+    def __init__(self, **fields):
+        super().__init__(**fields)
+        if self.published_ports is None:
+            self.published_ports = []
+        if self.command is None:
+            self.command = []
+        # Set when the stats stream of the container stopped delivering samples, the stats are the last received
+        if self.stale is None:
+            self.stale = False
+
+
+class ContainerDetails:
+    """
+    The parts of a container's attrs which only change when the container is recreated or restarted, with the
+    timestamps parsed once instead of on every refresh.
+    """
+    __slots__ = ('raw_timestamps', 'created_at', 'started_at', 'command', 'published_ports')
+
+    def __init__(self, attrs: Dict):
+        self.raw_timestamps: Tuple[str, str] = self.get_raw_timestamps(attrs)
+        self.created_at: datetime = parse_docker_timestamp(attrs['Created'])
+        started_at = attrs.get('State', {}).get('StartedAt')
+        self.started_at: Optional[datetime] = parse_docker_timestamp(started_at) if started_at else None
+
+        config = attrs.get('Config') or {}
+        self.command: List[str] = list(config.get('Entrypoint') or []) + list(config.get('Cmd') or [])
+        self.published_ports: List[str] = list((config.get('ExposedPorts') or {}).keys())
+
+    @staticmethod
+    def get_raw_timestamps(attrs: Dict) -> Tuple[str, str]:
+        return attrs.get('Created', ''), attrs.get('State', {}).get('StartedAt', '')
+
+    def is_current(self, attrs: Dict) -> bool:
+        """
+        Returns False if the attrs belong to a newer start of the container than these details
+        """
+        return self.raw_timestamps == self.get_raw_timestamps(attrs)
+
+
+class Snapshot:
+    """
+    An immutable set of container snapshots taken by one refresh. A new Snapshot is built completely before being
+    published by replacing the reference to the previous one, so readers never see a partially updated snapshot.
+    """
+    __slots__ = ('version', 'container_views', 'timestamp')
+
+    def __init__(self, version: Optional[Dict], container_views: List[ContainerSnapshot]):
+        self.version: Optional[Dict] = version
+        self.container_views: Tuple[ContainerSnapshot, ...] = tuple(container_views)
+        self.timestamp: float = time.time()
+
+    def to_models(self) -> List['ContainerView']:
+        """
+        Builds the pydantic ContainerView of every container, for use at API boundaries
+        """
+        return [view.to_model() for view in self.container_views]
+
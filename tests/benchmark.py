@@ -0,0 +1,272 @@
+"""
+Benchmarks cDock against a fake Docker daemon (see fake_docker_daemon.py) for several container counts.
+
+Measures the refresh latency of `get_version_and_container_views`, the container table build and render times, the
+threads and daemon connections used and the RSS of the process. Results are written as JSON to the results
+directory and compared with the previous run made with the same options.
+
+Usage: python tests/benchmark.py --sizes 10,100,1000 [--stats-backend api] [--inventory-mode poll]
+"""
+import argparse
+import glob
+import http.client
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+from rich.console import Console  # noqa: E402
+
+from cDock.config import Config  # noqa: E402
+from cDock.docker_client import DockerDaemonClient  # noqa: E402
+from cDock.outputs.screen import cDockRichScreen  # noqa: E402
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(TESTS_DIR), '.benchmarks')
+# Metrics where a larger value is a regression, with the relative change tolerated before reporting it
+COMPARED_METRICS = ['first_refresh_ms', 'refresh_p50_ms', 'refresh_p95_ms', 'table_build_ms', 'table_render_ms',
+                    'threads', 'connections', 'rss_mb']
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str):
+        super().__init__('localhost')
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def get_daemon_stats(socket_path: str) -> Dict:
+    connection = UnixHTTPConnection(socket_path)
+    try:
+        connection.request('GET', '/_fake/stats')
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def get_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # Peak instead of current RSS, in KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def start_fake_daemon(socket_path: str, container_count: int, stats_interval: float) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, os.path.join(TESTS_DIR, 'fake_docker_daemon.py'),
+                                '--socket', socket_path, '--containers', str(container_count),
+                                '--stats-interval', str(stats_interval)])
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise Exception(f"Fake daemon failed to start on {socket_path}")
+        time.sleep(0.05)
+    return process
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run_size(args, container_count: int) -> Dict:
+    socket_path = os.path.join(tempfile.mkdtemp(prefix='cdock-bench-'), 'docker.sock')
+    daemon = start_fake_daemon(socket_path, container_count, args.stats_interval)
+    threads_before = threading.active_count()
+    rss_before = get_rss_mb()
+
+    config = Config.load_env_from_file(os.path.join(TESTS_DIR, 'test.env'))
+    config.docker_socket_url = f'unix://{socket_path}'
+    config.client_list_all_containers = True
+    config.client_inventory_mode = args.inventory_mode
+    config.stats_backend = args.stats_backend
+    client = DockerDaemonClient(config)
+    screen = cDockRichScreen(config)
+    screen.console = Console(file=io.StringIO(), width=200, height=60)
+
+    try:
+        if not client.connect():
+            raise Exception(f"Failed to connect to the fake daemon on {socket_path}")
+
+        start = time.perf_counter()
+        views = client.get_version_and_container_views().get('container_views', [])
+        first_refresh = time.perf_counter() - start
+        if args.visible:
+            # Like the TUI, only a screen of containers is streamed and the others are polled
+            client.set_visible_containers(view.id for view in views[:args.visible])
+
+        # Letting the stats streams deliver a few samples before measuring steady state refreshes
+        time.sleep(args.warmup)
+        refreshes, table_builds, table_renders = [], [], []
+        for _ in range(args.refreshes):
+            start = time.perf_counter()
+            views = client.get_version_and_container_views().get('container_views', [])
+            refreshes.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            screen.update_container_table(views, 0)
+            table_builds.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            screen.console.print(screen.container_table)
+            table_renders.append(time.perf_counter() - start)
+            screen.console.file.seek(0)
+            screen.console.file.truncate()
+            time.sleep(args.interval)
+
+        daemon_stats = get_daemon_stats(socket_path)
+        return {
+            'containers': container_count,
+            'views': len(views),
+            'views_with_stats': sum(1 for view in views if view.cpu_stats is not None),
+            'first_refresh_ms': first_refresh * 1000,
+            'refresh_p50_ms': statistics.median(refreshes) * 1000,
+            'refresh_p95_ms': percentile(refreshes, 0.95) * 1000,
+            'table_build_ms': statistics.median(table_builds) * 1000,
+            'table_render_ms': statistics.median(table_renders) * 1000,
+            'threads': threading.active_count() - threads_before,
+            'connections': daemon_stats['open_connections'],
+            'total_connections': daemon_stats['total_connections'],
+            'requests': sum(daemon_stats['request_counts'].values()),
+            'rss_mb': get_rss_mb() - rss_before,
+        }
+    finally:
+        client.disconnect()
+        daemon.terminate()
+        daemon.wait()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.rmdir(os.path.dirname(socket_path))
+
+
+def run_size_in_subprocess(args, container_count: int) -> Dict:
+    """
+    Every size runs in a fresh interpreter, so the threads, RSS and class level state of one size do not leak into
+    the measurements of the next one.
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--run-size', str(container_count),
+               '--stats-backend', args.stats_backend, '--inventory-mode', args.inventory_mode,
+               '--stats-interval', str(args.stats_interval), '--refreshes', str(args.refreshes),
+               '--interval', str(args.interval), '--warmup', str(args.warmup), '--visible', str(args.visible)]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def get_options(args) -> Dict:
+    return {'stats_backend': args.stats_backend, 'inventory_mode': args.inventory_mode,
+            'stats_interval': args.stats_interval, 'refreshes': args.refreshes, 'visible': args.visible}
+
+
+def load_previous_result(results_dir: str, options: Dict) -> Optional[Dict]:
+    for path in sorted(glob.glob(os.path.join(results_dir, 'benchmark-*.json')), reverse=True):
+        with open(path) as file:
+            result = json.load(file)
+        if result.get('options') == options:
+            return result
+    return None
+
+
+def compare(previous: Dict, current: Dict, tolerance: float) -> List[str]:
+    """
+    Compares two runs size by size and returns a line for every metric which grew more than the tolerance.
+    """
+    regressions = []
+    previous_sizes = {size['containers']: size for size in previous['sizes']}
+    for size in current['sizes']:
+        before = previous_sizes.get(size['containers'])
+        if not before:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), size.get(metric)
+            # Tiny values are dominated by noise
+            if old is None or new is None or max(old, new) < 1:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(f"{size['containers']} containers: {metric} {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def print_result(result: Dict, previous: Optional[Dict]) -> None:
+    previous_sizes = {size['containers']: size for size in previous['sizes']} if previous else {}
+    for size in result['sizes']:
+        print(f"\n{size['containers']} containers ({size['views_with_stats']}/{size['views']} with stats)")
+        for metric in COMPARED_METRICS + ['total_connections', 'requests']:
+            line = f"  {metric:<18} {size[metric]:>10.2f}"
+            before = previous_sizes.get(size['containers'], {}).get(metric)
+            if before:
+                line += f"  ({(size[metric] - before) / before * 100:+.1f}%)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cDock against a fake Docker daemon")
+    parser.add_argument('--sizes', default='10,100,1000', help="Comma separated container counts")
+    parser.add_argument('--stats-backend', default=DockerDaemonClient.STATS_BACKEND_API,
+                        choices=[DockerDaemonClient.STATS_BACKEND_API, DockerDaemonClient.STATS_BACKEND_ASYNC])
+    parser.add_argument('--inventory-mode', default=DockerDaemonClient.INVENTORY_MODE_POLL,
+                        choices=[DockerDaemonClient.INVENTORY_MODE_POLL, DockerDaemonClient.INVENTORY_MODE_EVENTS])
+    parser.add_argument('--stats-interval', type=float, default=1.0, help="Seconds between stats samples")
+    parser.add_argument('--refreshes', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.1, help="Seconds between refreshes")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Seconds to wait before measuring refreshes")
+    parser.add_argument('--visible', type=int, default=0,
+                        help="Containers streamed at full rate, the others are polled (0 streams all)")
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Relative growth reported as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size is not None:
+        print(json.dumps(run_size(args, args.run_size)))
+        return
+
+    options = get_options(args)
+    previous = load_previous_result(args.results_dir, options)
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': options,
+        'sizes': [run_size_in_subprocess(args, int(size)) for size in args.sizes.split(',')],
+    }
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as file:
+        json.dump(result, file, indent=2)
+
+    print_result(result, previous)
+    print(f"\nResults written to {path}")
+    if previous:
+        regressions = compare(previous, result, args.tolerance)
+        if regressions:
+            print(f"\nRegressions compared to the run of {previous['timestamp']}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""
+A stand-in Docker daemon serving the endpoints used by cDock over a local unix socket, for tests and benchmarks.
+
+Run standalone with: python tests/fake_docker_daemon.py --socket /tmp/fake-docker.sock --containers 100
+"""
+import argparse
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+API_VERSION = '1.41'
+IMAGE_ID = 'sha256:' + 'f' * 64
+IMAGE_TAG = 'fake/app:latest'
+CREATED_AT = 1633046400
+
+ROUTE_PATTERN = re.compile(r'^(?:/v[\d.]+)?(/[^?]*)')
+
+
+class FakeContainer:
+    def __init__(self, index: int, status: str = 'running'):
+        self.index = index
+        self.id = f'{index:064x}'
+        self.name = f'fake-{index}'
+        self.status = status
+        self.samples = 0
+        # Newer containers are created later, so they are listed first
+        self.created = CREATED_AT + index
+
+    def get_summary(self) -> Dict:
+        return {'Id': self.id, 'Names': [f'/{self.name}'], 'Image': IMAGE_TAG, 'ImageID': IMAGE_ID,
+                'Command': 'sleep infinity', 'Created': self.created, 'State': self.status, 'Status': self.status}
+
+    def get_attrs(self) -> Dict:
+        created = datetime.fromtimestamp(self.created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000000000Z')
+        return {
+            'Id': self.id, 'Name': f'/{self.name}', 'Created': created, 'Image': IMAGE_ID, 'RestartCount': 0,
+            'State': {'Status': self.status, 'Running': self.status == 'running', 'Paused': self.status == 'paused',
+                      'Pid': 1000 + self.index, 'StartedAt': created},
+            'Config': {'Image': IMAGE_TAG, 'Entrypoint': None, 'Cmd': ['sleep', 'infinity'],
+                       'ExposedPorts': {'80/tcp': {}}},
+        }
+
+    def get_stats(self) -> Dict:
+        """
+        Returns the next sample of steadily growing counters, the container uses about 10% of one CPU
+        """
+        self.samples += 1
+        read = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        system, total = self.samples * 2 * 10 ** 9, self.samples * 10 ** 8 * (1 + self.index % 3)
+        return {
+            'read': read,
+            'cpu_stats': {'cpu_usage': {'total_usage': total}, 'system_cpu_usage': system, 'online_cpus': 2},
+            'precpu_stats': {'cpu_usage': {'total_usage': total - 10 ** 8 * (1 + self.index % 3)},
+                             'system_cpu_usage': system - 2 * 10 ** 9} if self.samples > 1 else {},
+            'memory_stats': {'usage': (self.index + 1) * 1024 * 1024, 'limit': 2 * 1024 ** 3},
+            'networks': {'eth0': {'rx_bytes': self.samples * 1500, 'tx_bytes': self.samples * 500}},
+            'blkio_stats': {'io_service_bytes_recursive': [{'op': 'Read', 'value': self.samples * 4096},
+                                                           {'op': 'Write', 'value': self.samples * 8192}]},
+        }
+
+
+class FakeDockerRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeDockerDaemon'
+
+    def setup(self):
+        super().setup()
+        self.server.track_connection(1)
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            self.server.track_connection(-1)
+
+    def address_string(self):
+        return self.server.socket_path
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status: int = 200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunk(self, body) -> None:
+        data = json.dumps(body).encode() + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def end_stream(self):
+        self.wfile.write(b'0\r\n\r\n')
+
+    def get_container(self, container_id: str) -> Optional[FakeContainer]:
+        container = self.server.containers.get(container_id)
+        if container is None:
+            self.send_json({'message': f'No such container: {container_id}'}, 404)
+        return container
+
+    def do_GET(self):
+        path = ROUTE_PATTERN.match(self.path).group(1)
+        query = parse_qs(urlparse(self.path).query)
+
+        if path == '/_fake/stats':
+            # Not counted as a request, the connection used to ask is not counted as open either
+            self.send_json({'open_connections': self.server.open_connections - 1,
+                            'max_open_connections': self.server.max_open_connections,
+                            'total_connections': self.server.total_connections,
+                            'request_counts': self.server.request_counts})
+            return
+        self.server.count_request(re.sub(r'/(sha256:)?[0-9a-f]{12,}', '/{id}', path))
+
+        if path in ('/version', '/_ping'):
+            self.send_json({'Version': 'fake', 'ApiVersion': API_VERSION, 'MinAPIVersion': '1.12'})
+        elif path == '/containers/json':
+            time.sleep(self.server.list_delay)
+            list_all = query.get('all', ['0'])[0] in ('1', 'true', 'True')
+            self.send_json([c.get_summary() for c in self.server.get_containers()
+                            if list_all or c.status in ('running', 'paused', 'restarting')])
+        elif match := re.match(r'^/containers/([^/]+)/json$', path):
+            if container := self.get_container(match.group(1)):
+                self.send_json(container.get_attrs())
+        elif match := re.match(r'^/containers/([^/]+)/stats$', path):
+            if container := self.get_container(match.group(1)):
+                if query.get('stream', ['1'])[0] in ('0', 'false', 'False'):
+                    self.send_json(self.get_one_shot_stats(container))
+                else:
+                    self.stream_stats(container)
+        elif match := re.match(r'^/images/([^/]+)/json$', path):
+            self.send_json({'Id': IMAGE_ID, 'RepoTags': [IMAGE_TAG]})
+        elif path == '/events':
+            self.stream_events()
+        else:
+            self.send_json({'message': 'page not found'}, 404)
+
+    def do_POST(self):
+        path = ROUTE_PATTERN.match(self.path).group(1)
+        self.server.count_request(re.sub(r'/(sha256:)?[0-9a-f]{12,}', '/{id}', path))
+        if int(self.headers.get('Content-Length') or 0):
+            self.rfile.read(int(self.headers['Content-Length']))
+
+        match = re.match(r'^/containers/([^/]+)/(start|stop|restart|kill|pause|unpause)$', path)
+        if not match:
+            self.send_json({'message': 'page not found'}, 404)
+        elif container := self.get_container(match.group(1)):
+            time.sleep(self.server.action_delay)
+            self.server.apply_action(container, match.group(2))
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def get_one_shot_stats(self, container: FakeContainer) -> Dict:
+        """
+        Like Docker, answers with the next sample after one stats interval, holding the CPU counters of the previous one
+        """
+        if container.samples == 0:
+            container.get_stats()
+        self.server.is_stopping.wait(self.server.stats_interval)
+        return container.get_stats()
+
+    def stream_stats(self, container: FakeContainer):
+        generation = self.server.stats_generation
+        self.start_stream()
+        try:
+            while not self.server.is_stopping.is_set() and container.id in self.server.containers and \
+                    generation == self.server.stats_generation:
+                if not self.server.stall_stats:
+                    self.send_chunk(container.get_stats())
+                if self.server.is_stopping.wait(self.server.stats_interval):
+                    break
+            self.end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def stream_events(self):
+        subscriber: List[Dict] = []
+        condition = self.server.subscribe_events(subscriber)
+        self.start_stream()
+        try:
+            while not self.server.is_stopping.is_set():
+                with condition:
+                    condition.wait_for(lambda: subscriber or self.server.is_stopping.is_set(), timeout=0.5)
+                    events, subscriber[:] = list(subscriber), []
+                for event in events:
+                    self.send_chunk(event)
+            self.end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.unsubscribe_events(subscriber)
+
+
+class FakeDockerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves `/version`, `/containers/json`, `/containers/{id}/json`, `/containers/{id}/stats`, `/images/{id}/json`,
+    `/events` and the container actions for `container_count` synthetic containers. Counts requests and connections,
+    which are reported by `/_fake/stats` when the daemon runs in another process.
+    """
+    daemon_threads = True
+    # dockerd listens with the system's maximum backlog, clients opening many connections at once are not refused
+    request_queue_size = 1024
+
+    def __init__(self, socket_path: str, container_count: int = 10, stats_interval: float = 1.0,
+                 action_delay: float = 0.0, list_delay: float = 0.0):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, FakeDockerRequestHandler)
+        self.socket_path = socket_path
+        self.stats_interval = stats_interval
+        self.action_delay = action_delay
+        # To simulate a slow daemon
+        self.list_delay = list_delay
+        # To simulate a daemon hiccup: the open stats streams end when the generation changes, and no sample is sent
+        # while stalled
+        self.stats_generation = 0
+        self.stall_stats = False
+        self.containers: Dict[str, FakeContainer] = {}
+        for index in range(container_count):
+            self.add_container(emit_event=False)
+
+        self.is_stopping = threading.Event()
+        self.__lock = threading.Lock()
+        self.__event_condition = threading.Condition()
+        self.__subscribers: List[List[Dict]] = []
+        self.open_connections = 0
+        self.max_open_connections = 0
+        self.total_connections = 0
+        self.request_counts: Dict[str, int] = {}
+        self.__thread: Optional[threading.Thread] = None
+
+    def handle_error(self, request, client_address):
+        # Clients dropping their connections is expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self) -> 'FakeDockerDaemon':
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.is_stopping.set()
+        with self.__event_condition:
+            self.__event_condition.notify_all()
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def drop_stats_streams(self) -> None:
+        """
+        Ends every open stats stream, like a daemon restart would
+        """
+        self.stats_generation += 1
+
+    def get_containers(self) -> List[FakeContainer]:
+        # Newest first, like the daemon
+        return sorted(self.containers.values(), key=lambda c: c.index, reverse=True)
+
+    def track_connection(self, delta: int) -> None:
+        with self.__lock:
+            self.open_connections += delta
+            self.max_open_connections = max(self.max_open_connections, self.open_connections)
+            if delta > 0:
+                self.total_connections += 1
+
+    def count_request(self, route: str) -> None:
+        with self.__lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+    def subscribe_events(self, subscriber: List[Dict]) -> threading.Condition:
+        with self.__event_condition:
+            self.__subscribers.append(subscriber)
+        return self.__event_condition
+
+    def unsubscribe_events(self, subscriber: List[Dict]) -> None:
+        with self.__event_condition:
+            self.__subscribers.remove(subscriber)
+
+    def emit_event(self, event_type: str, action: str, actor_id: str) -> None:
+        event = {'Type': event_type, 'Action': action, 'Actor': {'ID': actor_id, 'Attributes': {}},
+                 'status': action, 'id': actor_id, 'time': int(time.time()), 'timeNano': time.time_ns()}
+        with self.__event_condition:
+            for subscriber in self.__subscribers:
+                subscriber.append(event)
+            self.__event_condition.notify_all()
+
+    def add_container(self, status: str = 'running', emit_event: bool = True) -> FakeContainer:
+        container = FakeContainer(max([c.index for c in self.containers.values()], default=-1) + 1, status)
+        self.containers[container.id] = container
+        if emit_event:
+            self.emit_event('container', 'create', container.id)
+            if status == 'running':
+                self.emit_event('container', 'start', container.id)
+        return container
+
+    def remove_container(self, container_id: str) -> None:
+        container = self.containers.pop(container_id)
+        if container.status == 'running':
+            self.emit_event('container', 'die', container_id)
+        self.emit_event('container', 'destroy', container_id)
+
+    def apply_action(self, container: FakeContainer, action: str) -> None:
+        status, event = {
+            'start': ('running', 'start'), 'restart': ('running', 'start'), 'unpause': ('running', 'unpause'),
+            'stop': ('exited', 'die'), 'kill': ('exited', 'die'), 'pause': ('paused', 'pause'),
+        }[action]
+        container.status = status
+        self.emit_event('container', event, container.id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a fake Docker daemon on a unix socket")
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--containers', type=int, default=10)
+    parser.add_argument('--stats-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    daemon = FakeDockerDaemon(args.socket, args.containers, args.stats_interval)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        daemon.stop()
@@ -0,0 +1,163 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from cDock.alerts import AlertEngine, AlertEvent, AlertRule, SlidingWindow, parse_rules
+from cDock.metrics_history import MetricsHistory
+from cDock.snapshot import ContainerSnapshot, CPUSnapshot, MemorySnapshot
+
+STARTED_AT = datetime(2021, 10, 1, tzinfo=timezone.utc)
+
+
+class FakeContainer:
+    """
+    Produces the views of a container, a new sample every call
+    """
+
+    def __init__(self, container_id: str):
+        self.id = container_id
+        self.history = MetricsHistory(1)
+        self.samples = 0
+        self.started_at = STARTED_AT
+
+    def view(self, cpu: float = 0.0, mem: int = 0, new_sample: bool = True) -> ContainerSnapshot:
+        if new_sample:
+            self.samples += 1
+            self.history.append(self.samples, cpu=cpu)
+        return ContainerSnapshot(status='running', name=f'name-{self.id}', id=self.id, history=self.history,
+                                 cpu_stats=CPUSnapshot(usage=cpu, cores=1),
+                                 memory_stats=MemorySnapshot(usage=mem, limit=1000), started_at=self.started_at)
+
+
+class TestAlertRules(unittest.TestCase):
+
+    def test_parse(self):
+        rules = parse_rules("high-cpu: cpu > 90% for 30s; mem_percent>95; restarts > 3 in 5m;"
+                            "avg(rx, 1m) >= 10M clear 8M")
+        self.assertEqual([rule.name for rule in rules],
+                         ['high-cpu', 'mem_percent>95', 'restarts > 3 in 5m', 'avg(rx, 1m) >= 10M clear 8M'])
+        self.assertEqual((rules[0].metric, rules[0].threshold, rules[0].duration, rules[0].clear), ('cpu', 90, 30, 81))
+        self.assertEqual((rules[2].aggregate, rules[2].window), ('sum', 300))
+        self.assertEqual((rules[3].aggregate, rules[3].window, rules[3].threshold, rules[3].clear),
+                         ('avg', 60, 10 * 1024 ** 2, 8 * 1024 ** 2))
+        self.assertEqual(parse_rules(None), [])
+
+    def test_percent_thresholds(self):
+        # Not 95 bytes
+        rule = AlertRule.parse("mem > 95%")
+        self.assertEqual((rule.metric, rule.threshold), ('mem_percent', 95))
+        self.assertEqual(AlertRule.parse("avg(mem, 1m) > 90%").source, ('mem_percent', 'avg', 60))
+        self.assertEqual(AlertRule.parse("cpu > 90 clear 50%").metric, 'cpu')
+        self.assertEqual(AlertRule.parse("mem > 1G").metric, 'mem')
+
+    def test_invalid_rules(self):
+        for rule in ['cpu >> 90', 'uptime > 5', 'median(cpu, 1m) > 5', 'cpu > 90 in 5m', 'avg(cpu, 0) > 5',
+                     'rx > 50%', 'restarts > 3% in 5m', 'mem > 1G%', 'iow > 5 clear 2%']:
+            with self.assertRaises(Exception, msg=rule):
+                AlertRule.parse(rule)
+
+    def test_sliding_window_matches_a_rescan(self):
+        random.seed(7)
+        windows = {aggregate: SlidingWindow(10, aggregate) for aggregate in ('avg', 'min', 'max', 'sum')}
+        values = []
+        for t in range(200):
+            value = random.uniform(0, 100)
+            values.append((t, value))
+            for window in windows.values():
+                window.push(t, value)
+                window.expire(t)
+            in_window = [v for timestamp, v in values if timestamp > t - 10]
+            self.assertAlmostEqual(windows['avg'].get(), sum(in_window) / len(in_window))
+            self.assertEqual(windows['min'].get(), min(in_window))
+            self.assertEqual(windows['max'].get(), max(in_window))
+            self.assertAlmostEqual(windows['sum'].get(), sum(in_window))
+
+
+class TestAlertEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.container = FakeContainer('a')
+
+    def test_sustained_condition_with_hysteresis(self):
+        engine = AlertEngine(parse_rules("cpu > 90 for 30s"))
+        self.assertEqual(engine.update([self.container.view(cpu=95)], now=0), [])
+        self.assertEqual(engine.update([self.container.view(cpu=95)], now=20), [])
+        events = engine.update([self.container.view(cpu=95)], now=30)
+        self.assertEqual([event.state for event in events], [AlertEvent.FIRING])
+        self.assertEqual(engine.get_firing(), {'a': ['cpu > 90 for 30s']})
+
+        # Still firing between the clear threshold and the threshold
+        self.assertEqual(engine.update([self.container.view(cpu=85)], now=31), [])
+        events = engine.update([self.container.view(cpu=80)], now=32)
+        self.assertEqual([(event.state, event.value) for event in events], [(AlertEvent.RESOLVED, 80)])
+        self.assertEqual(engine.get_firing(), {})
+
+        # A dip restarts the duration
+        engine.update([self.container.view(cpu=95)], now=40)
+        engine.update([self.container.view(cpu=50)], now=50)
+        self.assertEqual(engine.update([self.container.view(cpu=95)], now=75), [])
+
+    def test_memory_percent_of_limit(self):
+        engine = AlertEngine(parse_rules("mem_percent > 95%"))
+        self.assertEqual(engine.update([self.container.view(mem=900)], now=0), [])
+        self.assertEqual(len(engine.update([self.container.view(mem=960)], now=1)), 1)
+
+    def test_restarts_in_window(self):
+        engine = AlertEngine(parse_rules("restarts > 3 in 5m"))
+        engine.update([self.container.view()], now=0)
+        for i in range(1, 5):
+            self.container.started_at = STARTED_AT + timedelta(minutes=i)
+            events = engine.update([self.container.view(new_sample=False)], now=i * 10)
+        self.assertEqual([(event.state, event.value) for event in events], [(AlertEvent.FIRING, 4)])
+
+        # Resolved once the restarts leave the window, without any new sample
+        self.assertEqual(engine.update([self.container.view(new_sample=False)], now=305), [])
+        events = engine.update([self.container.view(new_sample=False)], now=325)
+        self.assertEqual([(event.state, event.value) for event in events], [(AlertEvent.RESOLVED, 2)])
+
+    def test_windowed_average(self):
+        engine = AlertEngine(parse_rules("avg(cpu, 10s) > 50"))
+        states = []
+        for t, cpu in enumerate([100, 0, 0, 0]):
+            states.append([event.state for event in engine.update([self.container.view(cpu=cpu)], now=t)])
+        # The average is 50 then 33, above then below the clear threshold
+        self.assertEqual(states, [[AlertEvent.FIRING], [], [AlertEvent.RESOLVED], []])
+
+    def test_removed_containers_are_forgotten(self):
+        engine = AlertEngine(parse_rules("cpu > 90"))
+        engine.update([self.container.view(cpu=95)], now=0)
+        engine.update([], now=1)
+        self.assertEqual(engine.get_firing(), {})
+
+    def test_command_hook(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'alerts')
+            command = f'echo "$CDOCK_ALERT_STATE $CDOCK_ALERT_CONTAINER_NAME $CDOCK_ALERT_VALUE" >> {output}'
+            engine = AlertEngine(parse_rules("cpu > 90"), command)
+            engine.update([self.container.view(cpu=95)], now=0)
+            deadline = time.monotonic() + 5
+            while not os.path.exists(output) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.1)
+            with open(output) as f:
+                self.assertEqual(f.read(), "firing name-a 95\n")
+
+    def test_idle_containers_are_not_evaluated(self):
+        rules = parse_rules(";".join(f"cpu > {threshold} for 10s" for threshold in range(100, 300)))
+        containers = [FakeContainer(str(i)) for i in range(300)]
+        engine = AlertEngine(rules)
+        views = [container.view(cpu=1.0) for container in containers]
+        engine.update(views, now=0)
+
+        start = time.perf_counter()
+        for t in range(1, 11):
+            engine.update(views, now=t)
+        # Ten updates of 300 containers without a new sample, against 200 rules
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
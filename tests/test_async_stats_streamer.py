@@ -0,0 +1,58 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from cDock.docker_client.async_stats_streamer import AsyncStatsStreamer, get_unix_socket_path
+from fake_docker_daemon import FakeDockerDaemon
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+class TestAsyncStatsStreamer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, 'docker.sock')
+        self.daemon = FakeDockerDaemon(self.socket_path, container_count=1, stats_interval=0.05).start()
+        self.container = MagicMock()
+        self.container.id = self.daemon.get_containers()[0].id
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.directory.cleanup()
+
+    def test_get_unix_socket_path(self):
+        self.assertEqual(get_unix_socket_path('unix://var/run/docker.sock'), '/var/run/docker.sock')
+        self.assertEqual(get_unix_socket_path('http+unix:///var/run/docker.sock'), '/var/run/docker.sock')
+        self.assertIsNone(get_unix_socket_path('tcp://10.0.0.2:2376'))
+
+    def test_streams_samples_until_stopped(self):
+        streamer = AsyncStatsStreamer(self.container, self.socket_path)
+        streamer.start_stream()
+        self.assertTrue(wait_for(lambda: streamer.get_memory_stats() is not None))
+        self.assertTrue(streamer.is_streaming())
+        read = streamer.stats['read']
+        self.assertTrue(wait_for(lambda: streamer.stats['read'] != read))
+
+        streamer.stop_stream()
+        self.assertTrue(wait_for(lambda: not streamer.is_streaming()))
+        self.assertTrue(wait_for(lambda: self.daemon.open_connections == 0))
+
+    def test_unreachable_socket_is_logged(self):
+        streamer = AsyncStatsStreamer(self.container, os.path.join(self.directory.name, 'missing.sock'))
+        with self.assertLogs(level='ERROR') as logs:
+            streamer.start_stream()
+            self.assertTrue(wait_for(lambda: not streamer.is_streaming()))
+        self.assertIn('AsyncStatsStreamer - Exiting', logs.output[0])
+        self.assertIsNone(streamer.last_sample_time)
+
+
+if __name__ == "__main__":
+    unittest.main()
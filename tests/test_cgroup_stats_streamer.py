@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from cDock.docker_client.cgroup_stats_streamer import CgroupStatsStreamer
+
+CONTAINER_ID = "4f1c5e0b7a2d"
+PID = 4242
+
+PROC_STAT = """cpu  100 0 100 700 100 0 0 0 0 0
+cpu0 50 0 50 350 50 0 0 0 0 0
+cpu1 50 0 50 350 50 0 0 0 0 0
+intr 0
+"""
+NET_DEV = """Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:     100       1    0    0    0     0          0         0      100       1    0    0    0     0       0          0
+  eth0:    2048      10    0    0    0     0          0         0     4096      20    0    0    0     0       0          0
+"""
+
+
+def write_file(root: str, path: str, content: str):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestCgroupStatsStreamer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cgroup_root = os.path.join(self.temp_dir.name, 'cgroup')
+        self.proc_root = os.path.join(self.temp_dir.name, 'proc')
+        write_file(self.proc_root, 'stat', PROC_STAT)
+        write_file(self.proc_root, 'meminfo', "MemTotal:       2048 kB\n")
+        write_file(self.proc_root, f'{PID}/net/dev', NET_DEV)
+
+        self.container = MagicMock()
+        self.container.id = CONTAINER_ID
+        self.container.attrs = {'State': {'Pid': PID}}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_streamer(self):
+        return CgroupStatsStreamer(self.container, self.cgroup_root, self.proc_root)
+
+    def write_cgroup_v2(self, usage_usec: int):
+        write_file(self.cgroup_root, 'cgroup.controllers', "cpu io memory\n")
+        cgroup = f'system.slice/docker-{CONTAINER_ID}.scope'
+        write_file(self.cgroup_root, f'{cgroup}/cpu.stat', f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n")
+        write_file(self.cgroup_root, f'{cgroup}/memory.current', "1024\n")
+        write_file(self.cgroup_root, f'{cgroup}/memory.max', "max\n")
+        write_file(self.cgroup_root, f'{cgroup}/io.stat', "8:0 rbytes=100 wbytes=200 rios=1 wios=2\n"
+                                                          "8:16 rbytes=1 wbytes=2 rios=1 wios=1\n")
+
+    def write_cgroup_v1(self):
+        write_file(self.cgroup_root, f'cpu,cpuacct/docker/{CONTAINER_ID}/cpuacct.usage', "5000\n")
+        write_file(self.cgroup_root, f'memory/docker/{CONTAINER_ID}/memory.usage_in_bytes', "1024\n")
+        write_file(self.cgroup_root, f'memory/docker/{CONTAINER_ID}/memory.limit_in_bytes', "512\n")
+        write_file(self.cgroup_root, f'blkio/docker/{CONTAINER_ID}/blkio.throttle.io_service_bytes',
+                   "8:0 Read 300\n8:0 Write 400\n8:0 Total 700\nTotal 700\n")
+
+    def test_cgroup_v2(self):
+        self.write_cgroup_v2(usage_usec=1000)
+        streamer = self.get_streamer()
+        self.assertTrue(streamer.is_readable())
+
+        streamer.stats = streamer.read_stats()
+        self.assertIsNone(streamer.get_cpu_stats())
+
+        memory_stats = streamer.get_memory_stats()
+        self.assertEqual(memory_stats.usage, 1024)
+        self.assertEqual(memory_stats.limit, 2048 * 1024)
+
+        net_io = streamer.get_network_io()
+        self.assertEqual((net_io.total_rx, net_io.total_tx), (2048, 4096))
+
+        disk_io = streamer.get_disk_io()
+        self.assertEqual((disk_io.total_ior, disk_io.total_iow), (101, 202))
+
+    def test_cgroup_v2_cpu_usage(self):
+        self.write_cgroup_v2(usage_usec=1000)
+        streamer = self.get_streamer()
+        precpu_stats = streamer.read_stats()['cpu_stats']
+
+        # The container used 1/4 of the host's CPU time between both samples
+        self.write_cgroup_v2(usage_usec=1000 + 25 * 10 ** 6 // os.sysconf('SC_CLK_TCK'))
+        write_file(self.proc_root, 'stat', PROC_STAT.replace("cpu  100 0 100 700", "cpu  150 0 150 700"))
+        streamer.stats = streamer.read_stats(precpu_stats)
+
+        cpu_stats = streamer.get_cpu_stats()
+        self.assertEqual(cpu_stats.cores, 2)
+        self.assertAlmostEqual(cpu_stats.usage, 25 * 2, places=3)
+
+    def test_cgroup_v1(self):
+        self.write_cgroup_v1()
+        streamer = self.get_streamer()
+        streamer.stats = streamer.read_stats()
+
+        self.assertEqual(streamer.stats['cpu_stats']['cpu_usage']['total_usage'], 5000)
+        self.assertEqual(streamer.get_memory_stats().limit, 512)
+        disk_io = streamer.get_disk_io()
+        self.assertEqual((disk_io.total_ior, disk_io.total_iow), (300, 400))
+
+    def test_unreadable_cgroup(self):
+        write_file(self.cgroup_root, 'cgroup.controllers', "cpu io memory\n")
+        self.assertFalse(self.get_streamer().is_readable())
+
+
+if __name__ == "__main__":
+    unittest.main()
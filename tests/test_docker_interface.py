@@ -0,0 +1,278 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from cDock.config import Config
+from cDock.docker_client import DockerDaemonClient
+from fake_docker_daemon import IMAGE_TAG, FakeDockerDaemon
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+
+class FakeEventStream:
+    def __init__(self, events):
+        self.events = iter(list(events))
+
+    def __iter__(self):
+        return self.events
+
+    def close(self):
+        pass
+
+
+def make_container(container_id: str, status: str = 'exited', created: str = '2021-10-01T00:00:00.000000000Z'):
+    container = MagicMock()
+    container.id = container_id
+    container.name = container_id
+    container.status = status
+    container.attrs = {'Created': created, 'State': {'Status': status}, 'Config': {}, 'Image': 'sha256:1'}
+    return container
+
+
+class TestEventsInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.config = Config.load_env_from_file(TEST_ENV_PATH)
+        self.config.client_list_all_containers = True
+        self.config.client_inventory_mode = DockerDaemonClient.INVENTORY_MODE_EVENTS
+
+        self.events = []
+        self.docker = MagicMock()
+        self.docker.version.return_value = {'Version': 'test'}
+        self.docker.images.get.return_value.tags = ['image:latest']
+        self.docker.containers.list.return_value = [make_container('a'), make_container('b')]
+        self.docker.events.side_effect = lambda **kwargs: FakeEventStream(self.events)
+
+        with patch('cDock.docker_client.docker_daemon_client.create_docker_client', return_value=self.docker):
+            self.client = DockerDaemonClient(self.config)
+            self.client.connect()
+
+    def wait_for_events(self):
+        """
+        Waits for the listener to handle all events. The finished fake event stream would force a resync, so the
+        listener is kept alive for the following refresh.
+        """
+        self.client._DockerDaemonClient__events_thread.join()
+        self.client._DockerDaemonClient__needs_resync = False
+        self.client._DockerDaemonClient__events_thread = MagicMock()
+
+    def get_view_ids(self):
+        return [view.id for view in self.client.get_version_and_container_views()['container_views']]
+
+    def test_lists_containers_once(self):
+        self.events.append({'Type': 'container', 'Action': 'create', 'Actor': {'ID': 'c'}})
+        self.docker.containers.get.return_value = make_container('c', created='2021-10-02T00:00:00.000000000Z')
+        self.get_view_ids()
+        self.wait_for_events()
+
+        self.assertEqual(self.get_view_ids(), ['c', 'a', 'b'])
+        self.assertEqual(self.docker.containers.list.call_count, 1)
+
+    def test_destroy_event_removes_container(self):
+        self.events.append({'Type': 'container', 'Action': 'destroy', 'Actor': {'ID': 'a'}})
+        self.get_view_ids()
+        self.wait_for_events()
+
+        self.assertEqual(self.get_view_ids(), ['b'])
+
+    def test_interrupted_stream_resyncs(self):
+        self.get_view_ids()
+        self.client._DockerDaemonClient__events_thread.join()
+        self.get_view_ids()
+        self.assertEqual(self.docker.containers.list.call_count, 2)
+
+    def test_image_is_looked_up_once(self):
+        self.get_view_ids()
+        self.wait_for_events()
+        for _ in range(3):
+            views = self.client.get_version_and_container_views()['container_views']
+            self.assertEqual([view.image for view in views], ['image:latest', 'image:latest'])
+        self.assertEqual(self.docker.images.get.call_count, 1)
+
+    def test_image_event_invalidates_cache(self):
+        self.get_view_ids()
+        self.wait_for_events()
+
+        self.events.append({'Type': 'image', 'Action': 'tag', 'Actor': {'ID': 'sha256:1'}})
+        self.client._DockerDaemonClient__start_events_listener(0)
+        self.wait_for_events()
+        self.get_view_ids()
+        self.assertEqual(self.docker.images.get.call_count, 2)
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+class TestFakeDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        socket_path = os.path.join(self.directory.name, 'docker.sock')
+        self.daemon = FakeDockerDaemon(socket_path, container_count=3, stats_interval=0.1).start()
+
+        self.config = Config.load_env_from_file(TEST_ENV_PATH)
+        self.config.docker_socket_url = f'unix://{socket_path}'
+        self.config.client_list_all_containers = True
+        # Streams over its own connections to the socket, leaving the shared stats executor alone
+        self.config.stats_backend = DockerDaemonClient.STATS_BACKEND_ASYNC
+        self.client = DockerDaemonClient(self.config)
+
+    def tearDown(self):
+        self.client.disconnect()
+        self.daemon.stop()
+        self.directory.cleanup()
+
+    def get_views(self):
+        return self.client.get_version_and_container_views()['container_views']
+
+    def test_poll_inventory(self):
+        self.client.connect()
+        views = self.get_views()
+        self.assertEqual([view.name for view in views], ['fake-2', 'fake-1', 'fake-0'])
+        self.assertEqual({view.image for view in views}, {IMAGE_TAG})
+
+        self.daemon.add_container(status='exited')
+        self.assertEqual(len(self.get_views()), 4)
+
+    def test_events_inventory(self):
+        self.config.client_inventory_mode = DockerDaemonClient.INVENTORY_MODE_EVENTS
+        self.client.connect()
+        self.assertEqual(len(self.get_views()), 3)
+
+        container = self.daemon.add_container()
+        self.assertTrue(wait_until(lambda: self.get_views()[0].id == container.id))
+        self.daemon.remove_container(container.id)
+        self.assertTrue(wait_until(lambda: len(self.get_views()) == 3))
+        self.assertEqual(self.daemon.request_counts['/containers/json'], 1)
+
+    def test_streams_use_their_own_pool(self):
+        self.config.client_inventory_mode = DockerDaemonClient.INVENTORY_MODE_EVENTS
+        self.client.connect()
+        for _ in range(5):
+            self.get_views()
+
+        pool_stats = self.client.get_pool_stats()
+        # Requests to all endpoints reuse one connection, while the events stream holds its own
+        self.assertEqual((pool_stats['control']['pools'], pool_stats['control']['idle']), (1, 1))
+        self.assertEqual(pool_stats['stream']['in_use'], 1)
+        self.assertEqual(pool_stats['stream']['max_size'], self.config.client_stream_pool_size)
+        # Plus the connection of every async stats stream
+        self.assertEqual(self.daemon.open_connections, 2 + len(self.get_views()))
+
+    def test_async_stats_backend(self):
+        self.client.connect()
+        self.get_views()
+        self.assertTrue(wait_until(lambda: all(view.cpu_stats for view in self.get_views())))
+        self.assertEqual(self.get_views()[0].memory_stats.usage, 3 * 1024 * 1024)
+
+    def test_adaptive_sampling(self):
+        self.client.connect()
+        views = self.get_views()
+        self.client.set_visible_containers([views[0].id])
+        modes = self.client.get_sampling_modes()
+        self.assertEqual(modes[views[0].id], DockerDaemonClient.SAMPLING_STREAM)
+        self.assertEqual({modes[view.id] for view in views[1:]}, {DockerDaemonClient.SAMPLING_POLL})
+
+        # Containers without a sample are polled on the next refresh
+        self.assertTrue(wait_until(lambda: all(view.memory_stats for view in self.get_views())))
+        polled_view = self.get_views()[2]
+        polled_samples = len(polled_view.history)
+
+        # Promoted containers keep their stats and history
+        self.client.set_visible_containers(None)
+        self.assertEqual(self.client.get_sampling_modes()[polled_view.id], DockerDaemonClient.SAMPLING_STREAM)
+        self.assertTrue(wait_until(lambda: len(self.get_views()[2].history) > polled_samples))
+        self.assertIs(self.get_views()[2].history, polled_view.history)
+
+        self.daemon.apply_action(self.daemon.containers[polled_view.id], 'pause')
+        self.get_views()
+        self.assertEqual(self.client.get_sampling_modes()[polled_view.id], DockerDaemonClient.SAMPLING_PARKED)
+
+    def test_bulk_actions(self):
+        self.config.action_workers = 2
+        self.daemon.action_delay = 0.2
+        self.client = DockerDaemonClient(self.config)
+        self.client.connect()
+        keys = [view.id for view in self.get_views()]
+
+        start = time.monotonic()
+        batch = self.client.run_actions('pause', keys + ['unknown'])
+        self.assertTrue(wait_until(batch.is_finished))
+        # Three actions on two workers take two rounds
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+        self.assertEqual((batch.total, batch.done), (4, 4))
+        self.assertEqual(list(batch.errors), ['unknown'])
+        self.assertGreaterEqual(batch.get_latencies()['p50'], 0.2)
+        self.assertEqual({self.daemon.containers[key].status for key in keys}, {'paused'})
+
+        self.client.resume(keys[0])
+        with self.assertRaises(Exception):
+            self.client.resume(keys[0])
+
+    def test_history_store(self):
+        self.config.history_db_path = os.path.join(self.directory.name, 'history.db')
+        self.config.history_db_flush_interval = 0.1
+        self.client = DockerDaemonClient(self.config)
+        self.client.connect()
+        self.assertTrue(self.client.has_history_store())
+        self.assertTrue(wait_until(lambda: all(view.cpu_stats for view in self.get_views())))
+
+        key = self.get_views()[0].id
+        self.assertTrue(wait_until(lambda: self.client.query_history(key, 'mem', time.time() - 60)))
+        self.assertEqual(self.client.query_history(key, 'mem', time.time() - 60)[-1][1:], (3 * 1024 * 1024,) * 3)
+
+    def test_api_stats_backend(self):
+        # Every stream runs on the shared executor, which used to be shut down after the first sample
+        self.config.stats_backend = DockerDaemonClient.STATS_BACKEND_API
+        self.client.connect()
+        self.assertTrue(wait_until(lambda: all(view.cpu_stats for view in self.get_views())))
+        samples = self.client.get_snapshot().container_views[0].history.last_sample_key
+        self.assertTrue(wait_until(lambda: self.get_views()[0].history.last_sample_key != samples))
+
+    def test_dead_streams_are_restarted(self):
+        self.config.stream_restart_backoff = 0.1
+        self.client = DockerDaemonClient(self.config)
+        self.client.connect()
+        self.assertTrue(wait_until(lambda: all(view.cpu_stats for view in self.get_views())))
+
+        self.daemon.drop_stats_streams()
+        self.assertTrue(wait_until(lambda: self.get_views() and
+                                   self.daemon.request_counts['/containers/{id}/stats'] == 6))
+        self.assertTrue(wait_until(lambda: max(self.client.get_sample_ages().values()) < 0.5))
+
+    def test_stale_streams_are_flagged(self):
+        self.config.stream_stale_after = 0.5
+        self.config.stream_restart_backoff = 0.2
+        self.config.stream_max_reconnects = 1
+        self.client = DockerDaemonClient(self.config)
+        self.client.connect()
+        self.assertTrue(wait_until(lambda: all(view.cpu_stats for view in self.get_views())))
+        self.assertFalse(any(view.stale for view in self.get_views()))
+
+        self.daemon.stall_stats = True
+        self.assertTrue(wait_until(lambda: all(view.stale for view in self.get_views())))
+        self.daemon.stall_stats = False
+        self.assertTrue(wait_until(lambda: not any(view.stale for view in self.get_views())))
+        # One reconnect at a time, a stream stalled for a second is restarted a few times at most
+        self.assertLess(self.daemon.request_counts['/containers/{id}/stats'], 3 + 3 * 4)
+
+    def test_action_timeout(self):
+        self.config.action_timeout = 0.1
+        self.daemon.action_delay = 0.5
+        self.client.connect()
+        # Not `stop`, which adds the container's stop grace period to the timeout
+        batch = self.client.pause(self.get_views()[0].id)
+        self.assertTrue(wait_until(batch.is_finished))
+        self.assertIn('timed out', next(iter(batch.errors.values())))
+
+
+if __name__ == "__main__":
+    unittest.main()
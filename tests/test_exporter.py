@@ -0,0 +1,65 @@
+import gzip
+import os
+import unittest
+import urllib.request
+from threading import Thread
+from unittest.mock import patch
+
+from cDock.config import Config
+from cDock.models import ContainerView, CPUStats, MemoryStats
+from cDock.outputs.exporter import MetricsHTTPServer, cDockExporter
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+
+class TestExporter(unittest.TestCase):
+
+    def setUp(self):
+        config = Config.load_env_from_file(TEST_ENV_PATH)
+        with patch('cDock.outputs.exporter.create_client') as client_class:
+            self.client = client_class.return_value
+            self.exporter = cDockExporter(config)
+
+        self.client.get_version_and_container_views.return_value = {
+            'version': {'Version': '20.10.9', 'ApiVersion': '1.41'},
+            'container_views': [
+                ContainerView(status='running', name='web "1"', id='a' * 64, image='nginx:latest',
+                              created_at='2021-10-01T00:00:00', cpu_stats=CPUStats(usage=12.5, cores=2),
+                              memory_stats=MemoryStats(usage=1024, limit=2048)),
+                ContainerView(status='exited', name='db', id='b' * 64, image='', created_at='2021-10-01T00:00:00'),
+            ]
+        }
+        self.exporter.update_snapshot()
+
+    def test_serialize(self):
+        body = self.exporter.get_serialized_metrics()[0].decode()
+        self.assertIn('cdock_daemon_info{version="20.10.9",api_version="1.41"} 1', body)
+        self.assertIn('cdock_containers 2', body)
+        self.assertIn(f'cdock_container_cpu_usage_percent{{id="{"a" * 64}",name="web \\"1\\""}} 12.5', body)
+        self.assertIn(f'cdock_container_info{{id="{"b" * 64}",name="db",image="",status="exited"}} 1', body)
+        self.assertNotIn(f'cdock_container_memory_usage_bytes{{id="{"b" * 64}"', body)
+
+    def test_serialized_once_per_snapshot(self):
+        serialized = self.exporter.get_serialized_metrics()
+        self.assertIs(self.exporter.get_serialized_metrics(), serialized)
+        self.exporter.update_snapshot()
+        self.assertIsNot(self.exporter.get_serialized_metrics(), serialized)
+
+    def test_scrape(self):
+        server = MetricsHTTPServer(('127.0.0.1', 0), self.exporter)
+        Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                self.assertEqual(response.read(), self.exporter.get_serialized_metrics()[0])
+
+            request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(gzip.decompress(response.read()), self.exporter.get_serialized_metrics()[0])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
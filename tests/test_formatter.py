@@ -0,0 +1,45 @@
+import os
+import unittest
+
+from cDock.config import Config
+from cDock.models import ContainerView, CPUStats
+from cDock.outputs.formatter import RichFormatter
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+
+def make_view(container_id: str, cpu: float) -> ContainerView:
+    return ContainerView(status='running', name=container_id, id=container_id, image='app:latest',
+                         created_at='2021-10-01T00:00:00', cpu_stats=CPUStats(usage=cpu, cores=2))
+
+
+class TestRichFormatter(unittest.TestCase):
+
+    def setUp(self):
+        self.config = Config.load_env_from_file(TEST_ENV_PATH)
+        self.config.priority_attributes = "name,status,cpu,unknown,mem_usage"
+        self.formatter = RichFormatter(self.config)
+
+    def test_column_plan_skips_unknown_attributes(self):
+        self.assertEqual(self.formatter.get_header_row(), ["Name", "Status", "CPU%", "MEM"])
+        self.assertEqual(len(self.formatter.get_container_row(make_view('a', 1))), 4)
+
+    def test_unchanged_row_is_memoized(self):
+        row = self.formatter.get_container_row(make_view('a', 1))
+        self.assertIs(self.formatter.get_container_row(make_view('a', 1)), row)
+
+    def test_only_changed_cells_are_formatted(self):
+        row = self.formatter.get_container_row(make_view('a', 1))
+        changed_row = self.formatter.get_container_row(make_view('a', 2.5))
+
+        self.assertEqual(changed_row[2], "2.50")
+        self.assertIs(changed_row[1], row[1])
+
+    def test_prune(self):
+        row = self.formatter.get_container_row(make_view('a', 1))
+        self.formatter.prune(['b'])
+        self.assertIsNot(self.formatter.get_container_row(make_view('a', 1)), row)
+
+
+if __name__ == "__main__":
+    unittest.main()
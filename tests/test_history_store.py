@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+import unittest
+
+from cDock.history_store import RESOLUTION_HOUR, RESOLUTION_MINUTE, RESOLUTION_RAW, HistoryStore
+
+# The start of an hour, an hour ago
+HOUR = (int(time.time()) // 3600 - 1) * 3600
+
+
+def values(cpu: float = None, mem: float = None):
+    return {'cpu': cpu, 'mem': mem}
+
+
+class TestHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'history.db')
+        # The writer thread never flushes on its own during a test
+        self.store = HistoryStore(self.path, flush_interval=3600, raw_retention=7200)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_samples_are_buffered_until_flushed(self):
+        self.store.record(None, 'a', 'web', HOUR + 1, values(cpu=10.0))
+        self.assertEqual(self.store.query('a', 'cpu', HOUR, HOUR + 60, resolution=RESOLUTION_RAW), [])
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(self.store.query('a', 'cpu', HOUR, HOUR + 60, resolution=RESOLUTION_RAW),
+                         [(HOUR + 1, 10.0, 10.0, 10.0)])
+
+    def test_minute_and_hour_rollups(self):
+        for second, cpu in enumerate([10.0, 20.0, 30.0]):
+            self.store.record(None, 'a', 'web', HOUR + second, values(cpu=cpu))
+        self.store.record(None, 'a', 'web', HOUR + 60, values(cpu=70.0))
+        self.store.record(None, 'b', 'db', HOUR, values(cpu=99.0))
+        self.store.flush()
+
+        self.assertEqual(self.store.query('a', 'cpu', HOUR, HOUR + 3600, resolution=RESOLUTION_MINUTE),
+                         [(HOUR, 10.0, 20.0, 30.0), (HOUR + 60, 70.0, 70.0, 70.0)])
+        # Averages of the minutes are weighted by their number of samples
+        self.assertEqual(self.store.query('a', 'cpu', HOUR, HOUR + 3600, resolution=RESOLUTION_HOUR),
+                         [(HOUR, 10.0, 32.5, 70.0)])
+
+        # A sample flushed later still counts in its minute
+        self.store.record(None, 'a', 'web', HOUR + 3, values(cpu=40.0))
+        self.store.flush()
+        self.assertEqual(self.store.query('a', 'cpu', HOUR, HOUR + 59, resolution=RESOLUTION_MINUTE),
+                         [(HOUR, 10.0, 25.0, 40.0)])
+
+    def test_hosts_are_kept_apart(self):
+        self.store.record('web', 'a', 'app', HOUR, values(mem=1.0))
+        self.store.record('db', 'a', 'app', HOUR, values(mem=2.0))
+        self.store.flush()
+        self.assertEqual(self.store.query('a', 'mem', HOUR, HOUR + 1, host='db', resolution=RESOLUTION_RAW),
+                         [(HOUR, 2.0, 2.0, 2.0)])
+
+    def test_expired_samples_are_pruned(self):
+        old = HOUR - 7200
+        self.store.record(None, 'a', 'web', old, values(cpu=1.0))
+        self.store.record(None, 'a', 'web', HOUR, values(cpu=2.0))
+        self.store.flush()
+        self.assertEqual(len(self.store.query('a', 'cpu', old, HOUR, resolution=RESOLUTION_RAW)), 1)
+        self.assertEqual(len(self.store.query('a', 'cpu', old, HOUR, resolution=RESOLUTION_MINUTE)), 2)
+
+    def test_pick_resolution(self):
+        now = time.time()
+        self.assertEqual(self.store.pick_resolution(now - 600, now), RESOLUTION_RAW)
+        self.assertEqual(self.store.pick_resolution(now - 86400, now), RESOLUTION_MINUTE)
+        self.assertEqual(self.store.pick_resolution(now - 7 * 86400, now), RESOLUTION_HOUR)
+
+    def test_history_survives_a_restart(self):
+        self.store.record(None, 'a', 'web', HOUR, values(cpu=5.0))
+        self.store.close()
+        self.store = HistoryStore(self.path, flush_interval=3600)
+        self.assertEqual(len(self.store.query('a', 'cpu', HOUR, HOUR + 1, resolution=RESOLUTION_RAW)), 1)
+
+    def test_unknown_metric(self):
+        with self.assertRaises(Exception):
+            self.store.query('a', 'uptime', HOUR)
+
+
+if __name__ == "__main__":
+    unittest.main()
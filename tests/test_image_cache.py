@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from docker.errors import ImageNotFound
+
+from cDock.docker_client.image_cache import ImageCache
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.images = {'sha256:1': ['app:latest', 'app:1.0'], 'sha256:2': ['db:latest'], 'sha256:3': []}
+        self.loader = MagicMock(side_effect=self.load)
+
+    def load(self, image_id):
+        if image_id not in self.images:
+            raise ImageNotFound(image_id)
+        return self.images[image_id]
+
+    def test_caches_lookups(self):
+        cache = ImageCache(self.loader)
+        for _ in range(3):
+            self.assertEqual(cache.get_tags('sha256:1'), ['app:latest', 'app:1.0'])
+        self.assertEqual(cache.get_tags('sha256:4'), [])
+        self.assertEqual(cache.get_tags('sha256:4'), [])
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = ImageCache(self.loader, max_size=2)
+        cache.get_tags('sha256:1')
+        cache.get_tags('sha256:2')
+        cache.get_tags('sha256:1')
+        cache.get_tags('sha256:3')
+        self.assertEqual(len(cache), 2)
+
+        cache.get_tags('sha256:1')
+        self.assertEqual(self.loader.call_count, 3)
+        cache.get_tags('sha256:2')
+        self.assertEqual(self.loader.call_count, 4)
+
+    def test_invalidate_by_id_and_tag(self):
+        cache = ImageCache(self.loader)
+        cache.get_tags('sha256:1')
+        cache.get_tags('sha256:2')
+
+        cache.invalidate('sha256:1')
+        cache.invalidate('db:latest')
+        self.assertEqual(len(cache), 0)
+
+    def test_expires_after_ttl(self):
+        cache = ImageCache(self.loader, ttl=10)
+        with patch('cDock.docker_client.image_cache.time.monotonic', side_effect=[0, 5, 20, 20]):
+            cache.get_tags('sha256:1')
+            cache.get_tags('sha256:1')
+            cache.get_tags('sha256:1')
+        self.assertEqual(self.loader.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from cDock.config import Config
+from cDock.docker_client import DockerDaemonClient
+from cDock.instrumentation import NULL_TIMER, Histogram, Instrumentation, instruments, summarize_ages
+from cDock.outputs.formatter import RichFormatter
+from fake_docker_daemon import FakeDockerDaemon
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles_are_bucket_upper_bounds(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.record(value)
+        # 50 falls in the bucket of 32-63, 99 in the bucket of 64-127 capped to the largest value
+        self.assertEqual(histogram.get_percentile(50), 63)
+        self.assertEqual(histogram.get_percentile(99), 100)
+        stats = histogram.to_dict()
+        self.assertEqual((stats['count'], stats['mean'], stats['max']), (100, 50.5, 100))
+        self.assertEqual(sum(stats['buckets'].values()), 100)
+
+    def test_zero_and_empty(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.get_percentile(99), 0)
+        histogram.record(0)
+        self.assertEqual(histogram.to_dict()['buckets'], {0: 1})
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_disabled_probes_record_nothing(self):
+        instrumentation = Instrumentation()
+        self.assertIs(instrumentation.timer('refresh'), NULL_TIMER)
+        with instrumentation.timer('refresh'):
+            instrumentation.increment('api.calls')
+            instrumentation.record('refresh.api_calls', 3)
+        stats = instrumentation.get_stats()
+        self.assertEqual((stats['histograms'], stats['counters']), ({}, {}))
+
+    def test_timers_and_counters(self):
+        instrumentation = Instrumentation(enabled=True)
+        with instrumentation.timer('refresh'):
+            time.sleep(0.01)
+        instrumentation.increment('api.calls', 2)
+        instrumentation.add_gauge('threads', lambda: 7)
+        instrumentation.add_gauge('broken', lambda: 1 / 0)
+
+        stats = instrumentation.get_stats()
+        self.assertGreaterEqual(stats['histograms']['refresh']['max'], 10000)
+        self.assertEqual(stats['counters'], {'api.calls': 2})
+        self.assertEqual(stats['gauges']['threads'], 7)
+        self.assertTrue(stats['gauges']['broken'].startswith('error'))
+
+        rows = RichFormatter.get_perf_rows(stats)
+        self.assertEqual(rows[0][:2], ['refresh', '1'])
+        self.assertIn(['api.calls', '2'], RichFormatter.get_perf_values(stats))
+
+    def test_nested_gauges_get_a_row_per_dict(self):
+        instrumentation = Instrumentation(enabled=True)
+        instrumentation.add_gauge('connection_pools', lambda: {'web': {'control': {'pools': 1, 'idle': 2}},
+                                                               'db': {}})
+        self.assertEqual(RichFormatter.get_perf_values(instrumentation.get_stats()),
+                         [['connection_pools.web.control', 'pools 1, idle 2'], ['connection_pools.db', '']])
+
+    def test_dump(self):
+        instrumentation = Instrumentation(enabled=True)
+        instrumentation.record('render.live', 250)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'perf.json')
+            instrumentation.dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['histograms']['render.live']['p50'], 250)
+
+    def test_summarize_ages(self):
+        self.assertEqual(summarize_ages({'a': 1.0, 'b': 3.0, 'c': None, 'd': 2.0}),
+                         {'streams': 4, 'without_sample': 1, 'median': 2.0, 'max': 3.0})
+
+
+class TestClientInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        socket_path = os.path.join(self.directory.name, 'docker.sock')
+        self.daemon = FakeDockerDaemon(socket_path, container_count=3, stats_interval=0.1).start()
+
+        config = Config.load_env_from_file(TEST_ENV_PATH)
+        config.docker_socket_url = f'unix://{socket_path}'
+        config.stats_backend = DockerDaemonClient.STATS_BACKEND_ASYNC
+        self.client = DockerDaemonClient(config)
+        instruments.reset()
+        instruments.enabled = True
+
+    def tearDown(self):
+        instruments.enabled = False
+        instruments.reset()
+        self.client.disconnect()
+        self.daemon.stop()
+        self.directory.cleanup()
+
+    def test_refresh_is_instrumented(self):
+        self.client.connect()
+        for _ in range(3):
+            self.client.get_version_and_container_views()
+
+        stats = instruments.get_stats()
+        self.assertEqual({name for name in stats['histograms']}, {'refresh.daemon', 'refresh.metrics', 'refresh.views'})
+        self.assertEqual(stats['histograms']['refresh.daemon']['count'], 3)
+        # docker-py inspects every listed container: a version, a list and 3 inspects per refresh, and the image once
+        self.assertEqual(stats['counters']['api.control'], 3 * 5 + 1)
+        self.assertEqual(self.daemon.request_counts['/containers/{id}/json'], 9)
+
+    def test_sample_ages(self):
+        self.client.connect()
+        self.client.get_version_and_container_views()
+        deadline = time.monotonic() + 5
+        while None in self.client.get_sample_ages().values() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        ages = self.client.get_sample_ages()
+        self.assertEqual(len(ages), 3)
+        self.assertLess(max(ages.values()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
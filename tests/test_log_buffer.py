@@ -0,0 +1,46 @@
+import unittest
+
+from cDock.docker_client.log_buffer import LogBuffer
+
+
+class TestLogBuffer(unittest.TestCase):
+
+    def test_lines_and_tail(self):
+        buffer = LogBuffer()
+        for chunk in [b'first\nsec', b'ond\nthird\n', b'partial']:
+            buffer.append(chunk)
+
+        self.assertEqual(buffer.line_count, 4)
+        self.assertEqual(buffer.get_lines(1, 2), [b'second', b'third'])
+        self.assertEqual(buffer.tail(2), [b'third', b'partial'])
+        self.assertEqual(buffer.tail(10), [b'first', b'second', b'third', b'partial'])
+
+    def test_read_new(self):
+        buffer = LogBuffer()
+        buffer.append(b'a\n')
+        self.assertEqual(buffer.read_new(), b'a\n')
+        self.assertEqual(buffer.read_new(), b'')
+        buffer.append(b'b\n')
+        self.assertEqual(buffer.read_new(), b'b\n')
+
+    def test_memory_cap(self):
+        buffer = LogBuffer(max_size=1000)
+        buffer.CHUNK_SIZE = 100
+        for i in range(1000):
+            buffer.append(b'line %04d\n' % i)
+
+        self.assertLessEqual(len(buffer), 1000)
+        self.assertEqual(buffer.tail(1), [b'line 0999'])
+        self.assertTrue(all(line.startswith(b'line ') for line in buffer.get_lines(0, 1000)))
+        self.assertEqual(buffer.line_count, len(buffer.get_lines(0, 1000)))
+
+    def test_chunk_larger_than_cap(self):
+        buffer = LogBuffer(max_size=10)
+        buffer.append(b'0123456789abcdef\nxyz')
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.read_new(), b'89abcdef\nxyz'[-10:])
+        self.assertEqual(buffer.tail(1), [b'xyz'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from cDock.docker_client.log_spool import LogSpool, parse_log_timestamp
+from cDock.docker_client.logs_streamer import LogsStreamer
+
+
+def make_line(second: int, nanos: str, message: str) -> bytes:
+    return f"2021-10-01T12:00:{second:02d}.{nanos}Z {message}\n".encode()
+
+
+class TestLogSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, 'container')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse_log_timestamp(self):
+        self.assertEqual(parse_log_timestamp(make_line(1, "5", "a")), (1633089601, 500000000))
+        self.assertLess(parse_log_timestamp(make_line(1, "05", "a")), parse_log_timestamp(make_line(1, "5", "a")))
+        self.assertIsNone(parse_log_timestamp(b"no timestamp\n"))
+
+    def test_rotation_compression_and_retention(self):
+        spool = LogSpool(self.directory, segment_size=100, max_segments=5)
+        for i in range(60):
+            spool.append(make_line(i, "1", f"message {i}"))
+
+        segments = spool.get_segments()
+        self.assertEqual(len(segments), 5)
+        names = sorted(os.listdir(self.directory))
+        self.assertTrue(names[0].endswith('.log.gz'))
+        self.assertTrue(names[-1].endswith('.log'))
+
+        # Compressed and mmap-ed segments are both readable
+        self.assertEqual(spool.get_lines(segments[0], 0, 1), [make_line(47, "1", "message 47")[:-1]])
+        [(segment, line)] = spool.search(b'message 59')
+        self.assertEqual(line, make_line(59, "1", "message 59")[:-1])
+        self.assertEqual(spool.get_lines(segment, -1, 1), [line])
+        spool.close()
+
+    def test_resume_after_last_line(self):
+        spool = LogSpool(self.directory)
+        spool.append(make_line(1, "1", "a") + make_line(1, "2", "b"))
+        spool.close()
+
+        spool = LogSpool(self.directory)
+        self.assertEqual(spool.last_timestamp, parse_log_timestamp(make_line(1, "2", "b")))
+
+        container = MagicMock()
+        streamer = LogsStreamer(container, spool=spool)
+        streamer.get_stream_generator()
+        container.logs.assert_called_with(stream=True, timestamps=True, since=1633089601)
+
+        # Lines of the last spooled second are streamed again, only newer lines are kept
+        streamer.stream_handler(make_line(1, "1", "a") + make_line(1, "2", "b") + make_line(1, "3", "c")[:10])
+        streamer.stream_handler(make_line(1, "3", "c")[10:])
+        self.assertEqual(spool.get_lines(spool.get_segments()[-1], 0, 10), [
+            make_line(1, "1", "a")[:-1], make_line(1, "2", "b")[:-1], make_line(1, "3", "c")[:-1]])
+        self.assertEqual(streamer.get_streamed_logs(), make_line(1, "3", "c").decode())
+        spool.close()
+
+    def test_stopped_streamer_closes_the_spool(self):
+        spool = LogSpool(self.directory)
+        container = MagicMock()
+        container.logs.return_value = (line for line in [make_line(1, "1", "a")])
+        streamer = LogsStreamer(container, spool=spool)
+        streamer.start_stream()
+        deadline = time.monotonic() + 5
+        while not spool.last_timestamp and time.monotonic() < deadline:
+            time.sleep(0.01)
+        streamer.stop_stream()
+        self.assertTrue(spool.closed)
+
+        # The next session of the container appends to the same spool
+        spool.append(make_line(2, "1", "b"))
+        self.assertFalse(spool.closed)
+        self.assertEqual(spool.get_line_count(spool.get_segments()[-1]), 2)
+        spool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import MagicMock
+
+from cDock.docker_client.metrics_engine import MetricsEngine
+from cDock.docker_client.stats_streamer import StatsStreamer
+
+
+def make_sample(second: int, cpu_total: int, rx: int, ior: int = 0) -> dict:
+    return {
+        'read': f'2021-10-01T00:00:{second:02d}.000000000Z',
+        'cpu_stats': {'cpu_usage': {'total_usage': cpu_total}, 'system_cpu_usage': second * 1000, 'online_cpus': 2},
+        'precpu_stats': {'cpu_usage': {'total_usage': 0}, 'system_cpu_usage': 0},
+        'memory_stats': {'usage': 10, 'limit': 100},
+        'networks': {'eth0': {'rx_bytes': rx, 'tx_bytes': 0}},
+        'blkio_stats': {'io_service_bytes_recursive': [{'op': 'Read', 'value': ior}, {'op': 'Write', 'value': 0}]},
+    }
+
+
+class TestMetricsEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = MetricsEngine()
+        self.streamer = StatsStreamer(MagicMock())
+        self.streamers = {'a': self.streamer}
+
+    def push(self, sample: dict, streamer: StatsStreamer = None):
+        (streamer or self.streamer).stats = sample
+        return self.engine.update(self.streamers)
+
+    def test_cpu_and_memory(self):
+        self.push(make_sample(10, 5000, 0))
+        cpu_stats, memory_stats, _, _ = self.engine.get_stats('a')
+        self.assertAlmostEqual(cpu_stats.usage, 5000 / 10000 * 2 * 100)
+        self.assertEqual(cpu_stats.cores, 2)
+        self.assertEqual((memory_stats.usage, memory_stats.limit), (10, 100))
+
+    def test_rates_are_normalized_by_interval(self):
+        self.push(make_sample(10, 0, 1000, 100))
+        net_io = self.engine.get_stats('a')[2]
+        self.assertEqual(net_io.total_rx, 1000)
+        self.assertIsNone(net_io.rx_rate)
+
+        self.push(make_sample(12, 0, 5000, 300))
+        _, _, net_io, disk_io = self.engine.get_stats('a')
+        self.assertEqual(net_io.rx, 4000)
+        self.assertEqual(net_io.duration.total_seconds(), 2)
+        self.assertEqual(net_io.rx_rate, 2000)
+        self.assertEqual(disk_io.ior_rate, 100)
+
+    def test_same_sample_is_computed_once(self):
+        self.assertEqual(self.push(make_sample(10, 0, 1000)), ['a'])
+        stats = self.engine.get_stats('a')
+        self.assertEqual(self.engine.update(self.streamers), [])
+        self.assertIs(self.engine.get_stats('a'), stats)
+        self.assertEqual(len(self.streamer.history), 1)
+
+    def test_streamer_accessors(self):
+        # Attached, the accessors read the engine's stats without computing them again
+        self.streamer.attach_metrics_engine(self.engine, 'a')
+        self.streamer.stats = make_sample(10, 5000, 1000)
+        self.assertIsNone(self.streamer.get_cpu_stats())
+        self.engine.update(self.streamers)
+        self.assertIs(self.streamer.get_cpu_stats(), self.engine.get_stats('a')[0])
+        self.assertEqual(len(self.streamer.history), 1)
+
+        # On its own, a streamer computes its stats once per sample
+        streamer = StatsStreamer(MagicMock())
+        streamer.stats = make_sample(10, 0, 1000)
+        streamer.get_network_io()
+        streamer.stats = make_sample(12, 0, 5000)
+        self.assertEqual(streamer.get_network_io().rx_rate, 2000)
+        self.assertEqual(streamer.get_memory_stats().limit, 100)
+        self.assertEqual(len(streamer.history), 2)
+
+    def test_malformed_sample_is_skipped(self):
+        other = StatsStreamer(MagicMock())
+        self.streamers['b'] = other
+        other.stats = make_sample(10, 0, 1000)
+        self.assertEqual(self.push({'read': 'garbage'}), ['b'])
+        self.assertEqual(self.engine.get_stats('a'), (None, None, None, None))
+        self.assertEqual(self.engine.get_stats('b')[2].total_rx, 1000)
+
+        self.assertEqual(self.push(make_sample(11, 0, 2000)), ['a'])
+        self.assertEqual(self.engine.get_stats('a')[2].total_rx, 2000)
+
+    def test_block_io_is_summed_over_devices(self):
+        sample = make_sample(10, 0, 0)
+        sample['blkio_stats']['io_service_bytes_recursive'] = [
+            {'major': 8, 'minor': 0, 'op': 'Read', 'value': 100}, {'major': 8, 'minor': 0, 'op': 'Write', 'value': 1},
+            {'major': 8, 'minor': 16, 'op': 'Read', 'value': 20}, {'major': 8, 'minor': 16, 'op': 'Write', 'value': 2}]
+        self.push(sample)
+        disk_io = self.engine.get_stats('a')[3]
+        self.assertEqual((disk_io.total_ior, disk_io.total_iow), (120, 3))
+
+    def test_counter_reset(self):
+        self.push(make_sample(10, 0, 5000))
+        self.push(make_sample(11, 0, 100))
+        self.assertIsNone(self.engine.get_stats('a')[2].rx_rate)
+
+    def test_new_streamer_resets_slot(self):
+        self.push(make_sample(10, 0, 5000))
+        self.streamers['a'] = StatsStreamer(MagicMock())
+        self.push(make_sample(11, 0, 6000), self.streamers['a'])
+        self.assertIsNone(self.engine.get_stats('a')[2].rx_rate)
+
+    def test_smoothing(self):
+        self.engine.smoothing = 1.0
+        self.push(make_sample(10, 0, 0))
+        self.push(make_sample(11, 0, 1000))
+        self.assertEqual(self.engine.get_stats('a')[2].rx_rate, 1000)
+        self.push(make_sample(12, 0, 1000))
+        # alpha = 1 - e^-1 for a 1s interval
+        self.assertAlmostEqual(self.engine.get_stats('a')[2].rx_rate, 1000 * 0.36787944, places=4)
+
+    def test_many_containers(self):
+        self.streamers = {str(i): StatsStreamer(MagicMock()) for i in range(200)}
+        for i, streamer in enumerate(self.streamers.values()):
+            streamer.stats = make_sample(10, i * 10, 0)
+        self.assertEqual(len(self.engine.update(self.streamers)), 200)
+        self.assertAlmostEqual(self.engine.get_stats('150')[0].usage, 1500 / 10000 * 2 * 100)
+
+        del self.streamers['150']
+        self.engine.update(self.streamers)
+        self.assertEqual(len(self.engine), 199)
+        self.assertEqual(self.engine.get_stats('150'), (None, None, None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from cDock.metrics_history import MetricsHistory
+
+
+class TestMetricsHistory(unittest.TestCase):
+
+    def test_keeps_latest_samples(self):
+        history = MetricsHistory(size=4)
+        for i in range(6):
+            history.append(i, cpu=i, mem=i * 10)
+
+        self.assertEqual(len(history), 4)
+        self.assertEqual(history.get('cpu'), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(history.get('mem', 2), [40.0, 50.0])
+        self.assertEqual(history.get_latest('cpu'), 5.0)
+
+    def test_skips_already_recorded_sample(self):
+        history = MetricsHistory(size=4)
+        self.assertTrue(history.append('2021-10-01T00:00:01', cpu=1))
+        self.assertFalse(history.append('2021-10-01T00:00:01', cpu=2))
+        self.assertEqual(history.get('cpu'), [1.0])
+
+    def test_missing_metrics_are_zero(self):
+        history = MetricsHistory(size=2)
+        history.append(1, cpu=None)
+        self.assertEqual(history.get('rx'), [0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+import unittest
+
+from cDock.config import Config
+from cDock.docker_client import DockerDaemonClient, MultiDaemonClient, create_client
+from cDock.docker_client.daemon_hosts import create_tls_config, parse_docker_hosts
+from fake_docker_daemon import FakeDockerDaemon
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+
+class TestMultiDaemonClient(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.daemons = {name: FakeDockerDaemon(os.path.join(self.directory.name, f'{name}.sock'), container_count=2,
+                                               stats_interval=0.1).start() for name in ('a', 'b')}
+
+        self.config = Config.load_env_from_file(TEST_ENV_PATH)
+        self.config.docker_hosts = ",".join(f"{name}=unix://{daemon.socket_path}"
+                                            for name, daemon in self.daemons.items())
+        self.config.docker_hosts_timeout = 0.5
+        self.config.client_list_all_containers = True
+        self.config.stats_backend = DockerDaemonClient.STATS_BACKEND_ASYNC
+        self.client = create_client(self.config)
+
+    def tearDown(self):
+        self.client.disconnect()
+        for daemon in self.daemons.values():
+            daemon.stop()
+        self.directory.cleanup()
+
+    def get_views(self):
+        return self.client.get_version_and_container_views()['container_views']
+
+    def test_parse_docker_hosts(self):
+        self.assertEqual(parse_docker_hosts("web=tcp://10.0.0.2:2376, unix:///var/run/docker.sock,"),
+                         {'web': 'tcp://10.0.0.2:2376', '/var/run/docker.sock': 'unix:///var/run/docker.sock'})
+
+    def test_tls_config(self):
+        self.config.docker_cert_path = self.directory.name
+        self.config.docker_tls_verify_path = None
+        ca_cert = os.path.join(self.directory.name, 'ca.pem')
+        open(ca_cert, 'w').close()
+
+        self.assertIsNone(create_tls_config(self.config, 'unix:///var/run/docker.sock'))
+        tls_config = create_tls_config(self.config, 'tcp://10.0.0.2:2376')
+        self.assertEqual(tls_config.ca_cert, ca_cert)
+        self.assertIsNone(tls_config.cert)
+        self.assertTrue(tls_config.verify)
+
+    def test_merged_view(self):
+        self.assertIsInstance(self.client, MultiDaemonClient)
+        self.assertTrue(self.client.connect())
+        views = self.get_views()
+        self.assertEqual([(view.host, view.name) for view in views],
+                         [('a', 'fake-1'), ('a', 'fake-0'), ('b', 'fake-1'), ('b', 'fake-0')])
+        self.assertEqual(set(self.client.get_version_and_container_views()['version']['Hosts']), {'a', 'b'})
+
+    def test_slow_host_does_not_stall(self):
+        self.client.connect()
+        self.get_views()
+        self.daemons['b'].list_delay = 2
+
+        start = time.monotonic()
+        views = self.get_views()
+        self.assertLess(time.monotonic() - start, 1.5)
+        # The slow host keeps its last collected containers
+        self.assertEqual(len(views), 4)
+        self.assertEqual(self.client.host_status, {'a': MultiDaemonClient.HOST_STATUS_UP,
+                                                   'b': MultiDaemonClient.HOST_STATUS_STALE})
+
+        self.daemons['a'].add_container()
+        self.assertEqual(len(self.get_views()), 5)
+        self.assertEqual(self.daemons['b'].request_counts['/containers/json'], 2)
+
+    def test_unreachable_host(self):
+        self.daemons['b'].stop()
+        self.assertTrue(self.client.connect())
+        self.assertEqual({view.host for view in self.get_views()}, {'a'})
+        self.assertEqual(self.client.host_status['b'], MultiDaemonClient.HOST_STATUS_DOWN)
+
+    def test_action_is_routed_to_host(self):
+        self.client.connect()
+        container = self.daemons['b'].containers[next(iter(self.daemons['b'].containers))]
+        self.daemons['a'].containers.pop(container.id)
+        self.get_views()
+
+        self.client.stop(container.id)
+        deadline = time.monotonic() + 5
+        while container.status != 'exited' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(container.status, 'exited')
+        self.assertEqual(self.daemons['a'].request_counts.get('/containers/{id}/stop'), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from cDock.config import Config
+from cDock.docker_client.one_shot import collect_snapshot
+from cDock.outputs.once import CSV_COLUMNS, run_once
+from fake_docker_daemon import IMAGE_TAG, FakeDockerDaemon
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATS_INTERVAL = 0.3
+
+
+class TestOneShot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, 'docker.sock')
+        self.daemon = FakeDockerDaemon(self.socket_path, container_count=3, stats_interval=STATS_INTERVAL).start()
+        self.daemon.add_container(status='exited', emit_event=False)
+
+        self.config = Config.load_env_from_file(TEST_ENV_PATH)
+        self.config.docker_socket_url = f'unix://{self.socket_path}'
+        self.config.client_list_all_containers = True
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.directory.cleanup()
+
+    def test_collects_all_containers(self):
+        snapshot, errors = collect_snapshot(self.config)
+        self.assertEqual(errors, {})
+        self.assertEqual(snapshot.version['Version'], 'fake')
+        views = {view.name: view for view in snapshot.container_views}
+        self.assertEqual(list(views), ['fake-3', 'fake-2', 'fake-1', 'fake-0'])
+        self.assertEqual(views['fake-2'].image, IMAGE_TAG)
+        self.assertEqual(views['fake-2'].command, ['sleep', 'infinity'])
+        # The CPU usage comes from the counters of the sample before
+        self.assertAlmostEqual(views['fake-2'].cpu_stats.usage, 30.0)
+        self.assertEqual(views['fake-0'].memory_stats.usage, 1024 * 1024)
+        self.assertIsNone(views['fake-3'].cpu_stats)
+        self.assertEqual(self.daemon.request_counts['/containers/{id}/stats'], 3)
+
+    def test_stats_are_requested_concurrently(self):
+        for _ in range(40):
+            self.daemon.add_container(emit_event=False)
+        start = time.monotonic()
+        snapshot, _ = collect_snapshot(self.config)
+        self.assertLess(time.monotonic() - start, 3 * STATS_INTERVAL)
+        self.assertTrue(all(view.cpu_stats for view in snapshot.container_views if view.status == 'running'))
+
+        # At most `once_workers` requests at once
+        self.config.once_workers = 10
+        start = time.monotonic()
+        collect_snapshot(self.config)
+        self.assertGreaterEqual(time.monotonic() - start, 4 * STATS_INTERVAL)
+
+    def test_json_output(self):
+        output = io.StringIO()
+        self.assertEqual(run_once(self.config, 'json', output), 0)
+        result = json.loads(output.getvalue())
+        self.assertEqual(len(result['containers']), 4)
+        container = result['containers'][1]
+        self.assertEqual(container['name'], 'fake-2')
+        self.assertEqual(container['created_at'], '2021-10-01T00:00:02+00:00')
+        self.assertEqual(container['memory_stats']['usage'], 3 * 1024 * 1024)
+        self.assertNotIn('history', container)
+
+    def test_csv_output(self):
+        output = io.StringIO()
+        self.assertEqual(run_once(self.config, 'csv', output), 0)
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual(list(rows[0].keys()), CSV_COLUMNS)
+        self.assertEqual([row['cpu_percent'] for row in rows], ['', '30.00', '20.00', '10.00'])
+
+    def test_unreachable_host(self):
+        self.config.docker_hosts = f'local=unix://{self.socket_path},down=unix://{self.directory.name}/missing.sock'
+        snapshot, errors = collect_snapshot(self.config)
+        self.assertEqual(list(errors), ['down'])
+        self.assertEqual({view.host for view in snapshot.container_views}, {'local'})
+        self.assertEqual(set(snapshot.version['Hosts']), {'local'})
+        self.assertEqual(run_once(self.config, 'csv', io.StringIO()), 1)
+
+    def test_json_output_imports_neither_rich_nor_pydantic(self):
+        script = ("import runpy, sys\n"
+                  "sys.argv = ['cDock', '--once', '--format', 'json']\n"
+                  "try:\n"
+                  "    runpy.run_module('cDock', run_name='__main__')\n"
+                  "except SystemExit:\n"
+                  "    pass\n"
+                  "print(sorted(m for m in ('rich', 'pydantic') if m in sys.modules), file=sys.stderr)\n")
+        env = dict(os.environ, DOCKER_SOCKET_URL=self.config.docker_socket_url, PYTHONPATH=ROOT_PATH)
+        result = subprocess.run([sys.executable, '-c', script], env=env, cwd=self.directory.name,
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(len(json.loads(result.stdout)['containers']), 3)
+        self.assertEqual(result.stderr.strip().splitlines()[-1], '[]')
+
+    def test_once_output_does_not_import_the_streaming_machinery(self):
+        streaming = ['cDock.docker_client.docker_daemon_client', 'cDock.docker_client.multi_daemon_client',
+                     'cDock.docker_client.info_streamer', 'cDock.docker_client.stats_streamer',
+                     'cDock.docker_client.async_stats_streamer', 'cDock.docker_client.stream_supervisor',
+                     'cDock.history_store']
+        script = ("import sys\n"
+                  "import cDock.outputs.once\n"
+                  f"print([m for m in {streaming!r} if m in sys.modules])\n")
+        result = subprocess.run([sys.executable, '-c', script], env=dict(os.environ, PYTHONPATH=ROOT_PATH),
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.stdout.strip(), '[]', result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
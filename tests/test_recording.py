@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import unittest
+
+from docker.models.containers import Container
+
+from cDock.config import Config
+from cDock.docker_client import DockerDaemonClient
+from cDock.docker_client.recording import StreamRecorder, decode_stats, encode_stats, read_records, KIND_STATS
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+STATS = {
+    'read': '2021-10-01T12:00:01.5Z',
+    'cpu_stats': {'cpu_usage': {'total_usage': 2000}, 'system_cpu_usage': 20000, 'online_cpus': 2},
+    'precpu_stats': {'cpu_usage': {'total_usage': 1000}, 'system_cpu_usage': 10000},
+    'memory_stats': {'usage': 1024, 'limit': 4096},
+    'networks': {'eth0': {'rx_bytes': 10, 'tx_bytes': 20}},
+    'blkio_stats': {'io_service_bytes_recursive': [{'op': 'Read', 'value': 30}, {'op': 'Write', 'value': 40}]},
+}
+
+
+def make_attrs(container_id: str, status: str) -> dict:
+    return {'Id': container_id, 'Name': f'/{container_id}', 'Created': '2021-10-01T00:00:00.0Z',
+            'Image': 'sha256:1234', 'State': {'Status': status, 'StartedAt': '2021-10-01T00:00:00.0Z'},
+            'Config': {'Image': 'app:latest', 'Cmd': ['run']}}
+
+
+class TestRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'recording.bin')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_stats_round_trip(self):
+        decoded = decode_stats(encode_stats(STATS))
+        self.assertEqual(decoded['read'], '2021-10-01T12:00:01.500000Z')
+        for key in ['cpu_stats', 'precpu_stats', 'memory_stats', 'networks', 'blkio_stats']:
+            self.assertEqual(decoded[key], STATS[key])
+
+        decoded = decode_stats(encode_stats({'read': STATS['read'], 'cpu_stats': STATS['cpu_stats']}))
+        self.assertEqual(decoded['precpu_stats'], {})
+        self.assertNotIn('memory_stats', decoded)
+
+    def test_unchanged_container_list_is_recorded_once(self):
+        recorder = StreamRecorder(self.path)
+        containers = [Container(attrs=make_attrs('a', 'running'))]
+        recorder.record_container_list(containers)
+        recorder.record_container_list(containers)
+        recorder.record_stats('a', STATS)
+        recorder.close()
+
+        kinds = [kind for _, kind, _, _ in read_records(self.path)]
+        self.assertEqual(len(kinds), 2)
+        self.assertEqual(kinds[-1], KIND_STATS)
+
+    def test_replay(self):
+        recorder = StreamRecorder(self.path)
+        recorder.record_version({'Version': 'recorded'})
+        recorder.record_container_list([Container(attrs=make_attrs('a', 'running')),
+                                        Container(attrs=make_attrs('b', 'exited'))])
+        recorder.record_stats('a', STATS)
+        recorder.close()
+
+        config = Config.load_env_from_file(TEST_ENV_PATH)
+        config.replay_file = self.path
+        config.client_list_all_containers = True
+        client = DockerDaemonClient(config)
+        self.assertTrue(client.connect())
+        try:
+            stats = client.get_version_and_container_views()
+            self.assertEqual(stats['version'], {'Version': 'recorded'})
+            self.assertEqual([(v.name, v.status, v.image) for v in stats['container_views']],
+                             [('a', 'running', 'app:latest'), ('b', 'exited', 'app:latest')])
+
+            # The replayed stats sample arrives through the StatsStreamer
+            for _ in range(50):
+                view = client.get_version_and_container_views()['container_views'][0]
+                if view.memory_stats:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(view.memory_stats.usage, 1024)
+            self.assertAlmostEqual(view.cpu_stats.usage, 20.0)
+        finally:
+            client.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import os
+import unittest
+
+from rich.console import Console
+
+from cDock.config import Config
+from cDock.outputs.rich_stdout import cDockStandalone
+from cDock.outputs.screen import cDockRichScreen
+from cDock.snapshot import ContainerSnapshot
+
+TEST_ENV_PATH = os.path.join(os.path.dirname(__file__), "test.env")
+
+
+def make_views(count: int):
+    return [ContainerSnapshot(status='running', name=f'c{i}', id=f'c{i}', image='app:latest') for i in range(count)]
+
+
+class TestVirtualizedTable(unittest.TestCase):
+
+    def setUp(self):
+        self.screen = cDockRichScreen(Config.load_env_from_file(TEST_ENV_PATH))
+        self.screen.console = Console(file=io.StringIO(), width=120, height=16)
+        self.rows = self.screen.get_visible_row_count()
+        self.views = make_views(2000)
+
+    def test_only_visible_rows_are_laid_out(self):
+        self.screen.update_container_table(self.views, 0)
+        self.assertEqual(self.screen.container_table.row_count, self.rows)
+        self.assertEqual(self.screen.visible_views[0].id, 'c0')
+        self.assertTrue(self.screen.container_table.title.endswith(f"1-{self.rows} of 2000 ▼"))
+
+    def test_window_follows_selection(self):
+        self.screen.update_container_table(self.views, self.rows)
+        self.assertEqual(self.screen.scroll_offset, 1)
+        self.assertEqual(self.screen.visible_views[-1].id, f'c{self.rows}')
+
+        # Moving up within the window does not scroll
+        self.screen.update_container_table(self.views, 2)
+        self.assertEqual(self.screen.scroll_offset, 1)
+
+        self.screen.update_container_table(self.views, 1999)
+        self.assertEqual(self.screen.scroll_offset, 2000 - self.rows)
+        self.assertTrue(self.screen.container_table.title.endswith(f"▲ {2001 - self.rows}-2000 of 2000  "))
+
+    def test_window_stays_full_when_rows_disappear(self):
+        self.screen.update_container_table(self.views, 1999)
+        self.screen.update_container_table(self.views[:100], 99)
+        self.assertEqual(len(self.screen.visible_views), self.rows)
+        self.assertEqual(self.screen.scroll_offset, 100 - self.rows)
+
+    def test_no_indicator_when_all_rows_fit(self):
+        self.screen.update_container_table(self.views[:3], 2)
+        self.assertEqual(self.screen.container_table.title, "CONTAINERS (3) - cDock")
+        self.assertEqual(self.screen.container_table.row_count, 3)
+
+
+class TestKeyStrokes(unittest.TestCase):
+
+    def test_known_sequences(self):
+        self.assertEqual(cDockStandalone.split_key_strokes("\x1b[Aq\x1b[6~\x1b"), ['up', 'q', 'page_down', '\x1b'])
+
+    def test_unknown_sequences_are_dropped(self):
+        # SS3 up arrow, shift+right, F5, then the same sequence cut short at the end of the read
+        self.assertEqual(cDockStandalone.split_key_strokes("\x1bOAw\x1b[1;2Cs\x1b[15~a\x1b[1;"), ['w', 's', 'a'])
+
+
+if __name__ == "__main__":
+    unittest.main()
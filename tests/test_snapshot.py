@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from cDock.docker_client.metrics_engine import MetricsEngine
+from cDock.docker_client.stats_streamer import StatsStreamer
+from cDock.models import ContainerView
+from cDock.snapshot import ContainerDetails, ContainerSnapshot, CPUSnapshot, Snapshot, parse_docker_timestamp
+
+ATTRS = {
+    'Created': '2021-10-01T00:00:00.123456789Z',
+    'State': {'StartedAt': '2021-10-02T00:00:00Z'},
+    'Config': {'Entrypoint': ['/entrypoint.sh'], 'Cmd': ['serve'], 'ExposedPorts': {'80/tcp': {}}},
+}
+
+
+def make_sample(read: str, total_usage: int) -> dict:
+    return {
+        'read': read,
+        'cpu_stats': {'cpu_usage': {'total_usage': total_usage}, 'system_cpu_usage': 2000, 'online_cpus': 2},
+        'precpu_stats': {'cpu_usage': {'total_usage': 0}, 'system_cpu_usage': 1000},
+        'memory_stats': {'usage': 10, 'limit': 100},
+    }
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_parse_docker_timestamp(self):
+        self.assertEqual(parse_docker_timestamp('2021-10-01T00:00:00.123456789Z'),
+                         datetime(2021, 10, 1, 0, 0, 0, 123456, tzinfo=timezone.utc))
+        self.assertEqual(parse_docker_timestamp('0001-01-01T00:00:00Z').year, 1)
+
+    def test_container_details(self):
+        details = ContainerDetails(ATTRS)
+        self.assertEqual(details.command, ['/entrypoint.sh', 'serve'])
+        self.assertEqual(details.published_ports, ['80/tcp'])
+        self.assertTrue(details.is_current(ATTRS))
+        self.assertFalse(details.is_current(ATTRS | {'State': {'StartedAt': '2021-10-03T00:00:00Z'}}))
+
+    def test_to_model(self):
+        details = ContainerDetails(ATTRS)
+        view = ContainerSnapshot(status='running', name='web', id='a', image='nginx:latest',
+                                 created_at=details.created_at, cpu_stats=CPUSnapshot(usage=1.5, cores=2))
+        model = view.to_model()
+        self.assertIsInstance(model, ContainerView)
+        self.assertEqual(model.cpu_stats.usage, 1.5)
+        self.assertEqual(model.created_at, details.created_at)
+        self.assertEqual(Snapshot(None, [view]).to_models(), [model])
+
+    def test_records_have_no_dict(self):
+        with self.assertRaises(AttributeError):
+            CPUSnapshot(usage=1.0, cores=1).unknown = 1
+
+    def test_stats_computed_once_per_sample(self):
+        engine = MetricsEngine()
+        streamer = StatsStreamer(MagicMock())
+        streamer.stats = make_sample('2021-10-01T00:00:01Z', 500)
+        self.assertEqual(engine.update({'a': streamer}), ['a'])
+        first = engine.get_stats('a')
+        self.assertEqual(first[0], CPUSnapshot(usage=100.0, cores=2))
+        self.assertEqual(engine.update({'a': streamer}), [])
+        self.assertIs(engine.get_stats('a')[0], first[0])
+        self.assertEqual(len(streamer.history), 1)
+
+        streamer.stats = make_sample('2021-10-01T00:00:02Z', 250)
+        engine.update({'a': streamer})
+        self.assertEqual(engine.get_stats('a')[0].usage, 50.0)
+        self.assertEqual(len(streamer.history), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+from cDock.docker_client.stream_supervisor import StreamSupervisor
+
+
+class FakeStreamer:
+    def __init__(self):
+        self.last_sample_time = None
+        self.streaming = True
+        self.restarts = 0
+
+    def is_streaming(self) -> bool:
+        return self.streaming
+
+    def restart_stream(self) -> None:
+        self.restarts += 1
+        self.streaming = True
+
+
+class TestStreamSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.supervisor = StreamSupervisor(stale_after=5, backoff=1, backoff_max=8, max_reconnects=2)
+
+    def test_stale_stream_is_flagged_and_restarted(self):
+        streamer = FakeStreamer()
+        streamer.last_sample_time = 0
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=0), set())
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=5), set())
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=6), {'a'})
+        self.assertEqual(streamer.restarts, 1)
+
+        # Stale until the restarted stream delivers
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=7), {'a'})
+        streamer.last_sample_time = 7.5
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=8), set())
+        self.assertEqual(streamer.restarts, 1)
+
+    def test_age_counts_from_first_seen(self):
+        streamer = FakeStreamer()
+        self.supervisor.supervise({'a': streamer}, now=100)
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=104), set())
+        self.assertEqual(self.supervisor.supervise({'a': streamer}, now=106), {'a'})
+
+    @patch('random.uniform', lambda low, high: high)
+    def test_dead_stream_backs_off_exponentially(self):
+        streamer = FakeStreamer()
+        restart_times = []
+        for tick in range(0, 400):
+            now = tick / 10
+            streamer.streaming = False  # Dies right away, every time
+            self.supervisor.supervise({'a': streamer}, now=now)
+            if streamer.restarts > len(restart_times):
+                restart_times.append(now)
+        gaps = [round(b - a, 1) for a, b in zip(restart_times, restart_times[1:])]
+        self.assertEqual(gaps[:5], [1, 2, 4, 8, 8])
+
+    def test_backoff_is_jittered(self):
+        delays = {self.supervisor.get_backoff(3) for _ in range(20)}
+        self.assertTrue(all(2 <= delay <= 4 for delay in delays))
+        self.assertGreater(len(delays), 1)
+
+    def test_reconnects_are_capped(self):
+        streamers = {str(i): FakeStreamer() for i in range(6)}
+        for streamer in streamers.values():
+            streamer.streaming = False
+        self.supervisor.supervise(streamers, now=0)
+        self.assertEqual(sum(s.restarts for s in streamers.values()), 2)
+        self.assertEqual(self.supervisor.get_reconnect_count(), 2)
+
+        # Two streams come back, two more are restarted
+        for streamer in [s for s in streamers.values() if s.restarts]:
+            streamer.last_sample_time = 0.5
+        self.supervisor.supervise(streamers, now=1)
+        self.assertEqual(sum(s.restarts for s in streamers.values()), 4)
+
+        # Restarts which do not deliver release their slot after `stale_after`
+        self.supervisor.supervise(streamers, now=7)
+        self.assertEqual(sum(s.restarts for s in streamers.values()), 6)
+
+    def test_removed_streams_are_forgotten(self):
+        streamer = FakeStreamer()
+        streamer.streaming = False
+        self.supervisor.supervise({'a': streamer}, now=0)
+        self.supervisor.supervise({}, now=1)
+        self.assertEqual(self.supervisor.get_reconnect_count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
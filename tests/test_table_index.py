@@ -0,0 +1,94 @@
+import random
+import unittest
+from datetime import datetime, timezone
+
+from cDock.outputs.table_index import ContainerTableIndex
+from cDock.snapshot import ContainerSnapshot, CPUSnapshot, NetIOSnapshot
+
+
+def make_view(index: int, cpu: float = None, status: str = 'running', image: str = 'app:latest') -> ContainerSnapshot:
+    return ContainerSnapshot(status=status, name=f'web-{index}', id=f'{index:04d}', image=image,
+                             created_at=datetime.fromtimestamp(1633046400 + index, timezone.utc),
+                             cpu_stats=CPUSnapshot(usage=cpu, cores=2) if cpu is not None else None)
+
+
+def get_ids(index: ContainerTableIndex):
+    return [view.id for view in index.get_views()]
+
+
+class TestContainerTableIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ContainerTableIndex()
+        self.views = [make_view(i, cpu=float(i % 4)) for i in range(8)]
+        self.index.update(self.views)
+
+    def test_newest_first_by_default(self):
+        self.assertEqual(get_ids(self.index), [f'{i:04d}' for i in reversed(range(8))])
+
+    def test_sort_by_cpu_is_kept_up_to_date(self):
+        self.index.set_sort(ContainerTableIndex.SORT_CPU)
+        self.assertEqual(get_ids(self.index)[:2], ['0003', '0007'])
+
+        # Only the changed containers move
+        self.views[0] = make_view(0, cpu=50.0)
+        self.views[7] = make_view(7)
+        self.index.update(self.views)
+        ids = get_ids(self.index)
+        self.assertEqual(ids[:2], ['0000', '0003'])
+        self.assertEqual(ids[-1], '0007')
+        self.assertEqual([view.id for view in self.index.get_views(limit=3)], ids[:3])
+
+    def test_removed_and_added_containers(self):
+        self.index.set_sort(ContainerTableIndex.SORT_NAME)
+        self.index.update(self.views[2:] + [make_view(10)])
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual(get_ids(self.index), ['0010'] + [f'{i:04d}' for i in range(2, 8)])
+
+    def test_filter_by_name_image_or_status(self):
+        self.views[1] = make_view(1, status='paused')
+        self.views[2] = make_view(2, image='db:14')
+        self.index.update(self.views)
+
+        self.index.set_filter('PAUSED')
+        self.assertEqual(get_ids(self.index), ['0001'])
+        self.index.set_filter('db')
+        self.assertEqual(get_ids(self.index), ['0002'])
+        self.index.set_filter('web-3')
+        self.assertEqual(get_ids(self.index), ['0003'])
+
+        # A container starts matching as soon as its fields change
+        self.views[4] = make_view(4, image='db:15')
+        self.index.set_filter('db')
+        self.index.update(self.views)
+        self.assertEqual(get_ids(self.index), ['0004', '0002'])
+
+    def test_io_sort_sums_the_rates(self):
+        views = [make_view(0), make_view(1)]
+        views[0].net_io_stats = NetIOSnapshot(rx_rate=10.0, tx_rate=5.0)
+        self.index.set_sort(ContainerTableIndex.SORT_IO)
+        self.index.update(views)
+        self.assertEqual(get_ids(self.index), ['0000', '0001'])
+
+    def test_few_or_many_moves_give_the_sorted_order(self):
+        random.seed(3)
+        self.index.set_sort(ContainerTableIndex.SORT_CPU)
+        views = {i: make_view(i, cpu=random.uniform(0, 100)) for i in range(200)}
+        for changed in (2, 10, 100, 200):
+            for i in random.sample(range(300), changed):
+                if i in views and random.random() < 0.2:
+                    views.pop(i)
+                else:
+                    views[i] = make_view(i, cpu=random.choice([None, random.uniform(0, 100)]))
+            self.index.update(views.values())
+            expected = sorted(views.values(), key=lambda v: (v.cpu_stats is None,
+                                                             -v.cpu_stats.usage if v.cpu_stats else 0, v.id))
+            self.assertEqual(get_ids(self.index), [view.id for view in expected])
+
+    def test_unknown_sort(self):
+        with self.assertRaises(Exception):
+            self.index.set_sort('uptime')
+
+
+if __name__ == "__main__":
+    unittest.main()